@@ -56,6 +56,7 @@ DEBUG = False
 ALLOWED_HOSTS = ["socialbook-puxe.onrender.com", "localhost", "127.0.0.1"]
 
 INSTALLED_APPS = [
+    'daphne',  # ASGI runserver; must come before staticfiles
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -67,6 +68,7 @@ INSTALLED_APPS = [
     'cloudinary_storage',
     'allauth',
     'allauth.account',
+    'channels',
 ]
 SITE_ID = 1
 
@@ -80,6 +82,86 @@ CLOUDINARY_STORAGE = {
 # Supabase configuration
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
+SUPABASE_BUCKET_NAME = os.getenv('SUPABASE_BUCKET_NAME', 'media')
+SUPABASE_UPLOAD_TIMEOUT = 60  # seconds per request
+SUPABASE_RESUMABLE_THRESHOLD = 6 * 1024 * 1024  # bytes; larger uploads use resumable 6 MB chunks
+
+# Home timeline configuration (see socials/timeline.py)
+# Use 'socials.timeline.InMemoryTimelineBackend' for single-process local testing
+TIMELINE_BACKEND = os.getenv('TIMELINE_BACKEND', 'socials.timeline.DatabaseTimelineBackend')
+TIMELINE_FANOUT_MAX_FOLLOWERS = int(os.getenv('TIMELINE_FANOUT_MAX_FOLLOWERS', 5000))  # Above this, fan-out-on-read
+TIMELINE_MAX_LENGTH = 800
+
+# Write-behind like/comment counters (see socials/counters.py); unset = write straight to Post
+# 'socials.counters.RedisCounterBuffer' for multi-worker deployments, flushed by `manage.py flush_counters`
+# 'socials.counters.LocalCounterBuffer' for single-process local testing
+COUNTER_BUFFER_BACKEND = os.getenv('COUNTER_BUFFER_BACKEND') or None
+COUNTER_BUFFER_REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+COUNTER_BUFFER_FLUSH_INTERVAL = 5  # seconds
+
+# Background jobs (see socials/jobs.py)
+# Threads per web process that run queued jobs; set to 0 when running `manage.py run_jobs` separately
+JOBS_IN_PROCESS_WORKERS = int(os.getenv('JOBS_IN_PROCESS_WORKERS', 2))
+JOBS_POLL_INTERVAL = 2.0  # seconds
+JOBS_LOCK_TIMEOUT = 300  # seconds before a running job whose worker died is retried
+JOBS_RETENTION_DAYS = {'done': 7, 'failed': 30}  # Finished jobs kept this long; `manage.py prune_jobs --schedule`
+
+# Notifications of one type on one post within this window share a row ("alice and 41 others")
+NOTIFICATION_GROUP_WINDOW = 24 * 60 * 60  # seconds
+
+# Notification retention (see socials/retention.py): days since last activity, per type; None keeps forever
+NOTIFICATION_RETENTION_DAYS = {
+    'post': 30,
+    'like': 90,
+    'unlike': 14,
+    'comment': 180,
+    'follow': 180,
+    'unfollow': 14,
+}
+NOTIFICATION_ARCHIVE_DIR = os.getenv('NOTIFICATION_ARCHIVE_DIR') or None  # Monthly .jsonl.gz exports before purge
+
+# Sidebar context cache (see socials/sidebar.py)
+# 'socials.sidebar.SharedCache' uses the CACHES alias below and is shared by every worker
+SIDEBAR_CACHE_BACKEND = os.getenv('SIDEBAR_CACHE_BACKEND', 'socials.sidebar.LocalLRUCache')
+SIDEBAR_CACHE_ALIAS = 'default'
+SIDEBAR_CACHE_TTL = 60  # seconds
+SIDEBAR_CACHE_MAX_ENTRIES = 10000
+
+# Full-text search (see socials/search.py)
+# None picks FTS5 on SQLite and tsvector + trigram on Postgres
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND') or None
+SEARCH_PAGE_SIZE = 20
+
+# Username typeahead (see socials/typeahead.py); each process rebuilds its
+# in-memory index this often to pick up follower counts and other processes' signups
+TYPEAHEAD_REFRESH_INTERVAL = 10 * 60  # seconds
+
+# Where uploaded media is stored (see socials/storage.py): 'cloudinary', 'supabase',
+# 'local' (MEDIA_ROOT on this machine; offline load tests) or 'memory' (tests)
+MEDIA_STORAGE = os.getenv('MEDIA_STORAGE', 'cloudinary')
+MEDIA_STORAGE_TIMEOUT = 60  # seconds per storage call
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
+# Post media ingestion (see socials/media.py). Uploads wait in the spool until a
+# job sends them to MEDIA_STORAGE; the spool must be shared with `run_jobs` hosts.
+MEDIA_SPOOL_DIR = os.getenv('MEDIA_SPOOL_DIR', os.path.join(BASE_DIR, 'spool'))
+MEDIA_INGEST_ATTEMPTS = 5
+# Uploads with the same bytes share one remote object (MediaBlob); an unused
+# blob is deleted this long after its last reference goes, in case it comes back
+MEDIA_BLOB_GC_DELAY = 60 * 60  # seconds
+FILE_UPLOAD_HANDLERS = [
+    'socials.uploadhandlers.HashingMemoryFileUploadHandler',  # SHA-256 while the body streams in
+    'socials.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+
+# Resized image derivatives (see socials/images.py), rendered in this many processes
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+IMAGE_RENDER_TIMEOUT = 60  # seconds per image
+
+# Near-duplicate image lookup (see socials/neardup.py): perceptual hashes at most
+# this many bits apart (of 64) count as the same picture
+NEARDUP_DISTANCE = 8
+NEARDUP_REFRESH_INTERVAL = 30 * 60  # seconds
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -114,6 +196,21 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'socialapp.wsgi.application'
+ASGI_APPLICATION = 'socialapp.asgi.application'
+
+# Channels (live notifications over WebSockets). Redis is required when running
+# more than one ASGI process; the in-memory layer only reaches its own process.
+if os.getenv('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.getenv('REDIS_URL')]},
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+    }
 
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
@@ -251,9 +348,8 @@ if not DEBUG:
     STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 
-# Media files
+# Media files (MEDIA_ROOT is set with MEDIA_STORAGE above)
 MEDIA_URL = '/media/'
-# MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 SESSION_COOKIE_SECURE = True
 # CSRF Configuration
@@ -262,8 +358,11 @@ CSRF_COOKIE_HTTPONLY = False
 CSRF_USE_SESSIONS = False
 CSRF_COOKIE_SAMESITE = 'Lax'
 
-# Tell Django to use Cloudinary for media storage
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+# Django's default file storage goes through the same MEDIA_STORAGE backend
+STORAGES = {
+    'default': {'BACKEND': 'socials.storage.MediaStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
 
 import cloudinary
 cloudinary.config(
@@ -65,9 +65,9 @@ class FollowAdmin(admin.ModelAdmin):
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ('recipient', 'sender', 'notification_type', 'created_at')
+    list_display = ('recipient', 'sender', 'notification_type', 'actor_count', 'updated_at')
     list_filter = ('created_at', 'notification_type')
     search_fields = ('recipient__username', 'sender__username', 'notification_type')
-    readonly_fields = ('created_at',)
+    readonly_fields = ('created_at', 'updated_at', 'group_key', 'actor_count', 'sample_actor_ids')
     date_hierarchy = 'created_at'
     ordering = ['-created_at']
\ No newline at end of file
@@ -2,9 +2,14 @@ from django.apps import AppConfig
 
 
 class SocialsConfig(AppConfig):
+    default = True
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'socials'
 
+    def ready(self):
+        # Register background job handlers (see socials/jobs.py)
+        from . import emails, fanout, media, notifications, retention, suggestions, timeline  # noqa: F401
+
 class SampleMflixConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sample_mflix'
\ No newline at end of file
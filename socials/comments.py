@@ -0,0 +1,46 @@
+# comments.py
+"""
+Bounded comment previews for post lists.
+
+Feeds show only the latest few comments per post, loaded for the whole page
+in one windowed query, so a post with 50k comments costs the same as a post
+with three. The full thread lives on the post detail page.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment
+
+COMMENT_PREVIEW_SIZE = getattr(settings, 'COMMENT_PREVIEW_SIZE', 3)
+
+
+def latest_comments(post_ids, limit=COMMENT_PREVIEW_SIZE):
+    """Return {post_id: [comments oldest first]} holding the newest ``limit`` per post."""
+    if not post_ids:
+        return {}
+
+    ranked = Comment.objects.filter(post_id__in=post_ids).annotate(
+        rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('post_id')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        )
+    ).filter(rank__lte=limit).select_related('username', 'username__profile')
+
+    previews = defaultdict(list)
+    for comment in ranked:
+        previews[comment.post_id_id].append(comment)
+    for comments in previews.values():
+        comments.sort(key=lambda comment: (comment.created_at, comment.id))
+    return previews
+
+
+def attach_comment_previews(posts, limit=COMMENT_PREVIEW_SIZE):
+    """Set ``post.post_comments`` to a bounded preview on every post in ``posts``."""
+    previews = latest_comments([post.id for post in posts], limit=limit)
+    for post in posts:
+        post.post_comments = previews.get(post.id, [])
+    return posts
@@ -0,0 +1,72 @@
+# consumers.py
+import uuid
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .realtime import post_group, user_group
+
+# Post groups one socket may follow; a page of cards plus a few infinite-scroll pages
+MAX_POST_SUBSCRIPTIONS = 200
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live updates for one browser tab.
+
+    Server -> client: {"event": "notification" | "like_count" | "comment" | "media", ...}
+    Client -> server: {"action": "subscribe" | "unsubscribe", "post_ids": [...]}
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        self.user_group = user_group(user.id)
+        self.post_groups = set()
+        await self.channel_layer.group_add(self.user_group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if not hasattr(self, 'user_group'):
+            return
+        await self.channel_layer.group_discard(self.user_group, self.channel_name)
+        for group in self.post_groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('action')
+        post_ids = content.get('post_ids') or []
+        if not isinstance(post_ids, list):
+            return
+
+        if action == 'subscribe':
+            post_ids = await self.existing_post_ids(post_ids[:MAX_POST_SUBSCRIPTIONS])
+            for post_id in post_ids:
+                group = post_group(post_id)
+                if group in self.post_groups or len(self.post_groups) >= MAX_POST_SUBSCRIPTIONS:
+                    continue
+                self.post_groups.add(group)
+                await self.channel_layer.group_add(group, self.channel_name)
+        elif action == 'unsubscribe':
+            for post_id in post_ids:
+                group = post_group(post_id)
+                if group in self.post_groups:
+                    self.post_groups.discard(group)
+                    await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def push(self, message):
+        """Handler for group_send messages of type 'push' (see realtime.py)."""
+        await self.send_json({'event': message['event'], **message['data']})
+
+    @database_sync_to_async
+    def existing_post_ids(self, post_ids):
+        from .models import Post
+        valid = []
+        for post_id in post_ids:
+            try:
+                valid.append(uuid.UUID(str(post_id)))
+            except ValueError:
+                continue
+        return [str(pk) for pk in Post.objects.filter(pk__in=valid).values_list('pk', flat=True)]
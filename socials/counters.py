@@ -0,0 +1,325 @@
+# counters.py
+"""
+Write-behind buffering for hot Post counters.
+
+With ``COUNTER_BUFFER_BACKEND`` set, like and comment deltas are added to a
+shared buffer instead of updating the Post row on every request. A flusher
+periodically applies the summed deltas in batches, so a viral post takes one
+UPDATE per flush instead of one per like. Reads add the pending deltas to the
+persisted value, so counts shown to users stay correct between flushes.
+
+Backends:
+    socials.counters.LocalCounterBuffer  process-local, flushes itself on a
+                                         daemon thread (tests / single process)
+    socials.counters.RedisCounterBuffer  shared across workers, flushed by the
+                                         ``flush_counters`` management command
+"""
+import atexit
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import CounterFlush, Post
+
+logger = logging.getLogger(__name__)
+
+# Post columns that may be buffered
+COUNTER_FIELDS = ('no_of_likes', 'comment_count')
+FLUSH_INTERVAL = getattr(settings, 'COUNTER_BUFFER_FLUSH_INTERVAL', 5)
+FLUSH_BATCH_SIZE = getattr(settings, 'COUNTER_BUFFER_BATCH_SIZE', 500)
+
+
+# ----------------------------
+#  Backends
+# ----------------------------
+class LocalCounterBuffer:
+    """In-process buffer. Only correct when a single process serves writes."""
+
+    def __init__(self):
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def add(self, post_id, field, delta):
+        with self._lock:
+            self._pending[(str(post_id), field)] += delta
+        self._ensure_flusher()
+
+    def pending(self, post_ids):
+        wanted = {str(post_id) for post_id in post_ids}
+        with self._lock:
+            return {key: delta for key, delta in self._pending.items() if key[0] in wanted and delta}
+
+    def drain(self):
+        """Take every pending delta. Returns (token, {(post_id, field): delta})."""
+        with self._lock:
+            drained, self._pending = dict(self._pending), defaultdict(int)
+        return drained, drained
+
+    def record(self, token):
+        pass
+
+    def commit(self, token):
+        pass
+
+    def restore(self, token):
+        """Put drained deltas back after a failed flush."""
+        with self._lock:
+            for key, delta in token.items():
+                self._pending[key] += delta
+
+    def _ensure_flusher(self):
+        if self._flusher is not None or FLUSH_INTERVAL <= 0:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name='counter-flusher', daemon=True)
+                self._flusher.start()
+                atexit.register(flush, self)
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(FLUSH_INTERVAL):
+            try:
+                flush(self)
+            except Exception as e:
+                logger.error(f"Counter flush failed: {str(e)}")
+            finally:
+                close_old_connections()
+
+
+class RedisCounterBuffer:
+    """
+    Shared buffer in one Redis hash; HINCRBY keeps adds atomic across workers.
+
+    A flush RENAMEs the pending hash aside (atomic, new adds land in a fresh
+    hash) and only deletes it once the database UPDATEs committed, so a
+    crashed flusher leaves its deltas to be picked up by the next run.
+
+    Every flusher (``flush_counters`` and any app replica) drains all the
+    hashes set aside, so one flush at a time holds ``LOCK_KEY`` (SET NX PX)
+    from drain to commit. The lock expires after
+    ``COUNTER_BUFFER_FLUSH_LOCK_TIMEOUT`` seconds in case its holder dies,
+    so it only keeps flushers out of each other's way: what makes a hash
+    apply exactly once is its CounterFlush row, inserted in the same
+    transaction as the UPDATEs. A hash already recorded (its flusher died
+    after committing, or outlived the lock) is dropped instead of applied,
+    and reads stop counting it once the row commits.
+    """
+
+    PENDING_KEY = 'socials:counters:pending'
+    FLUSHING_SET = 'socials:counters:flushing'
+    LOCK_KEY = 'socials:counters:flush-lock'
+    LOCK_TIMEOUT = getattr(settings, 'COUNTER_BUFFER_FLUSH_LOCK_TIMEOUT', 60)  # seconds
+    RECORD_RETENTION = timedelta(days=1)
+
+    def __init__(self):
+        import redis
+        url = getattr(settings, 'COUNTER_BUFFER_REDIS_URL', 'redis://localhost:6379/0')
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+
+    @staticmethod
+    def _field(post_id, field):
+        return f"{post_id}|{field}"
+
+    def add(self, post_id, field, delta):
+        self._redis.hincrby(self.PENDING_KEY, self._field(post_id, field), delta)
+
+    def pending(self, post_ids):
+        keys = [(str(post_id), field) for post_id in post_ids for field in COUNTER_FIELDS]
+        if not keys:
+            return {}
+        names = [self._field(*key) for key in keys]
+        deltas = defaultdict(int)
+        # Include any flush still in flight so counts never dip mid-flush, but
+        # not one whose UPDATEs committed already (they are in the row now)
+        in_flight = self._redis.smembers(self.FLUSHING_SET)
+        if in_flight:
+            in_flight -= set(CounterFlush.objects.filter(key__in=in_flight).values_list('key', flat=True))
+        for hash_key in [self.PENDING_KEY, *in_flight]:
+            for key, value in zip(keys, self._redis.hmget(hash_key, names)):
+                if value:
+                    deltas[key] += int(value)
+        return {key: delta for key, delta in deltas.items() if delta}
+
+    def drain(self):
+        lock = self._redis.lock(self.LOCK_KEY, timeout=self.LOCK_TIMEOUT, blocking=False)
+        if not lock.acquire():
+            return None, {}  # Another flusher is mid-flush; its deltas are not ours to apply
+        try:
+            flushing = f"{self.PENDING_KEY}:{uuid.uuid4().hex}"
+            if self._redis.exists(self.PENDING_KEY):
+                pipe = self._redis.pipeline()
+                pipe.sadd(self.FLUSHING_SET, flushing)
+                pipe.rename(self.PENDING_KEY, flushing)
+                pipe.execute()
+            # Also pick up hashes left behind by a flusher that died mid-way,
+            # unless it got as far as committing them
+            hash_keys = list(self._redis.smembers(self.FLUSHING_SET))
+            applied = set(CounterFlush.objects.filter(key__in=hash_keys).values_list('key', flat=True))
+            if applied:
+                self._forget(applied)
+                hash_keys = [hash_key for hash_key in hash_keys if hash_key not in applied]
+            drained = defaultdict(int)
+            for hash_key in hash_keys:
+                for name, value in self._redis.hgetall(hash_key).items():
+                    post_id, field = name.split('|', 1)
+                    drained[(post_id, field)] += int(value)
+        except Exception:
+            self._release(lock)
+            raise
+        return (lock, hash_keys), dict(drained)
+
+    def record(self, token):
+        """
+        Inside the flush transaction: claim the drained hashes. A flusher that
+        already applied one (this one's lock expired) makes the insert fail,
+        rolling the flush back before anything is applied twice.
+        """
+        if token is not None:
+            CounterFlush.objects.bulk_create([CounterFlush(key=hash_key) for hash_key in token[1]])
+
+    def commit(self, token):
+        if token is None:
+            return
+        lock, hash_keys = token
+        try:
+            if hash_keys:
+                self._forget(hash_keys)
+        finally:
+            self._release(lock)
+
+    def _forget(self, hash_keys):
+        """
+        Drop applied hashes from Redis. Their CounterFlush rows outlive them
+        by RECORD_RETENTION, long past any lock, so a flusher still holding
+        a copy cannot apply it again.
+        """
+        pipe = self._redis.pipeline()
+        pipe.delete(*hash_keys)
+        pipe.srem(self.FLUSHING_SET, *hash_keys)
+        pipe.execute()
+        CounterFlush.objects.filter(applied_at__lt=timezone.now() - self.RECORD_RETENTION).delete()
+
+    def restore(self, token):
+        # The drained hashes are still in place and will be retried next flush
+        if token is not None:
+            self._release(token[0])
+
+    def _release(self, lock):
+        from redis.exceptions import LockError
+        try:
+            lock.release()
+        except LockError:
+            # Expired mid-flush: another flusher may have applied the same deltas
+            logger.error(f"Counter flush outlived its {self.LOCK_TIMEOUT}s lock; raise COUNTER_BUFFER_FLUSH_LOCK_TIMEOUT")
+
+
+_buffer = None
+_buffer_loaded = False
+
+
+def get_buffer():
+    """Return the configured buffer, or None when buffering is disabled."""
+    global _buffer, _buffer_loaded
+    if not _buffer_loaded:
+        path = getattr(settings, 'COUNTER_BUFFER_BACKEND', None)
+        _buffer = import_string(path)() if path else None
+        _buffer_loaded = True
+    return _buffer
+
+
+def is_enabled():
+    return get_buffer() is not None
+
+
+# ----------------------------
+#  Write / read helpers
+# ----------------------------
+def add_delta(post_id, field, delta):
+    """
+    Record a counter change. Buffers it when enabled, otherwise applies it
+    straight to the row with an F() update.
+    """
+    buffer = get_buffer()
+    if buffer is not None:
+        # Only buffer once the surrounding transaction (if any) has committed
+        transaction.on_commit(lambda: buffer.add(post_id, field, delta))
+        return
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(**{f'{field}__gt': 0})
+    posts.update(**{field: F(field) + delta})
+
+
+def merge_pending(posts):
+    """Add buffered deltas to the counters of already-loaded posts."""
+    buffer = get_buffer()
+    if buffer is None or not posts:
+        return posts
+    by_id = {str(post.pk): post for post in posts}
+    for (post_id, field), delta in buffer.pending(by_id.keys()).items():
+        post = by_id[post_id]
+        setattr(post, field, max(0, getattr(post, field) + delta))
+    return posts
+
+
+def current_value(post_id, field):
+    """Persisted value of one counter plus anything still buffered."""
+    value = Post.objects.filter(pk=post_id).values_list(field, flat=True).first() or 0
+    buffer = get_buffer()
+    if buffer is not None:
+        value += buffer.pending([post_id]).get((str(post_id), field), 0)
+    return max(0, value)
+
+
+# ----------------------------
+#  Flushing
+# ----------------------------
+def flush(buffer=None, batch_size=FLUSH_BATCH_SIZE):
+    """Apply every pending delta to Post in batched UPDATEs. Returns rows touched."""
+    buffer = buffer or get_buffer()
+    if buffer is None:
+        return 0
+    token, deltas = buffer.drain()
+    if not deltas:
+        buffer.commit(token)
+        return 0
+
+    by_field = defaultdict(dict)
+    for (post_id, field), delta in deltas.items():
+        if delta and field in COUNTER_FIELDS:
+            by_field[field][post_id] = delta
+
+    updated = 0
+    try:
+        with transaction.atomic():
+            buffer.record(token)  # Fails if these deltas were applied already
+            for field, field_deltas in by_field.items():
+                items = list(field_deltas.items())
+                for start in range(0, len(items), batch_size):
+                    batch = items[start:start + batch_size]
+                    # One UPDATE per batch: each row gets its own summed delta
+                    delta_expr = Case(
+                        *[When(pk=post_id, then=Value(delta)) for post_id, delta in batch],
+                        default=Value(0),
+                        output_field=IntegerField(),
+                    )
+                    updated += Post.objects.filter(pk__in=[post_id for post_id, _ in batch]).update(
+                        **{field: F(field) + delta_expr}
+                    )
+    except Exception:
+        buffer.restore(token)
+        raise
+    buffer.commit(token)
+
+    logger.debug(f"Flushed {len(deltas)} counter deltas ({updated} rows)")
+    return updated
@@ -0,0 +1,24 @@
+# emails.py
+"""Outgoing email, sent from job workers rather than the request thread."""
+from django.core.mail import EmailMessage
+from django.template.loader import render_to_string
+
+from .jobs import enqueue, task
+
+
+def queue_otp_email(email, otp_code):
+    """Queue the signup OTP email; resubmitting the same code does not send twice."""
+    enqueue('emails.send_otp', {'email': email, 'otp_code': otp_code}, key=f"otp:{email}:{otp_code}")
+
+
+@task('emails.send_otp')
+def send_otp_email(email, otp_code):
+    html_message = render_to_string('emails/otp_email.html', {'otp': otp_code})
+    email_message = EmailMessage(
+        subject="Your OTP Code",
+        body=html_message,
+        from_email=None,  # Uses DEFAULT_FROM_EMAIL from settings
+        to=[email]
+    )
+    email_message.content_subtype = "html"  # Send as HTML
+    email_message.send()
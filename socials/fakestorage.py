@@ -0,0 +1,318 @@
+# fakestorage.py
+"""
+An in-process stand-in for the Supabase Storage HTTP API, for tests and
+benchmarks that must not touch the network.
+
+It speaks the subset the upload code uses:
+
+    POST  /storage/v1/object/<bucket>/<path>         single-request upload
+                                                     (Content-Length or chunked)
+    HEAD  /storage/v1/object/<bucket>/<path>         existence check
+    DELETE /storage/v1/object/<bucket>/<path>        remove an object
+    POST  /storage/v1/upload/resumable               TUS 1.0.0 create
+    HEAD  /storage/v1/upload/resumable/<id>          TUS offset probe
+    PATCH /storage/v1/upload/resumable/<id>          TUS chunk append
+    GET   /storage/v1/object/public/<bucket>/<path>  read back an object
+
+and counts what it receives, so callers can assert on bytes transferred and
+requests made. ``fail_next_patch`` makes the next PATCH die half way (the
+connection is dropped after reading part of the chunk) to exercise resume.
+
+    with FakeStorageServer() as server:
+        client = make_storage_client(server.url, 'key')
+        ...
+        server.stats['bytes_received']
+
+``MemoryStorage`` is the ``memory`` media storage backend (see storage.py):
+set ``MEDIA_STORAGE = 'memory'`` and uploads are hashed and kept in memory
+instead of sent anywhere.
+"""
+import base64
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from .storage import Storage
+
+OBJECT_PREFIX = '/storage/v1/object/'
+PUBLIC_PREFIX = '/storage/v1/object/public/'
+RESUMABLE_PREFIX = '/storage/v1/upload/resumable'
+READ_SIZE = 64 * 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so connection reuse is visible in the stats
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def storage(self):
+        return self.server.storage
+
+    def _reply(self, status, headers=None, body=b''):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _copy(self, sink, length):
+        while length > 0:
+            piece = self.rfile.read(min(length, READ_SIZE))
+            if not piece:
+                break
+            sink.write(piece)
+            length -= len(piece)
+            self.storage.count(bytes_received=len(piece))
+
+    def _read_body(self, sink, limit=None):
+        """Stream the request body into ``sink``, decoding chunked transfer encoding."""
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                self._copy(sink, size)
+                self.rfile.readline()
+        else:
+            length = int(self.headers.get('Content-Length') or 0)
+            self._copy(sink, length if limit is None else min(length, limit))
+        return sink
+
+    def do_POST(self):
+        self.storage.count(requests=1)
+        if self.path.startswith(RESUMABLE_PREFIX):
+            metadata = {}
+            for item in self.headers.get('Upload-Metadata', '').split(','):
+                if item.strip():
+                    key, _, value = item.strip().partition(' ')
+                    metadata[key] = base64.b64decode(value).decode()
+            upload_id = uuid.uuid4().hex
+            self.storage.resumable[upload_id] = {
+                'key': f"{metadata['bucketName']}/{metadata['objectName']}",
+                'length': int(self.headers['Upload-Length']),
+                'sink': self.storage.sink(),
+            }
+            host = self.headers.get('Host')
+            return self._reply(201, {'Location': f"http://{host}{RESUMABLE_PREFIX}/{upload_id}", 'Tus-Resumable': '1.0.0'})
+
+        if self.path.startswith(OBJECT_PREFIX):
+            key = unquote(self.path[len(OBJECT_PREFIX):])
+            sink = self._read_body(self.storage.sink())
+            if not self.storage.put(key, sink, upsert=self.headers.get('x-upsert') == 'true'):
+                return self._reply(409, body=b'{"statusCode":"409","error":"Duplicate","message":"The resource already exists"}')
+            return self._reply(200, {'Content-Type': 'application/json'}, f'{{"Key": "{key}"}}'.encode())
+        self._reply(404)
+
+    def do_HEAD(self):
+        self.storage.count(requests=1)
+        if self.path.startswith(OBJECT_PREFIX):
+            key = unquote(self.path[len(OBJECT_PREFIX):])
+            return self._reply(200 if key in self.storage.digests else 404)
+        upload = self.storage.resumable.get(self.path.rsplit('/', 1)[-1])
+        if upload is None:
+            return self._reply(404)
+        self._reply(200, {'Upload-Offset': str(upload['sink'].size), 'Upload-Length': str(upload['length']),
+                          'Tus-Resumable': '1.0.0', 'Cache-Control': 'no-store'})
+
+    def do_DELETE(self):
+        self.storage.count(requests=1)
+        if self.path.startswith(OBJECT_PREFIX):
+            key = unquote(self.path[len(OBJECT_PREFIX):])
+            if self.storage.remove(key):
+                return self._reply(200, {'Content-Type': 'application/json'}, b'{"message":"Successfully deleted"}')
+        self._reply(404)
+
+    def do_PATCH(self):
+        self.storage.count(requests=1)
+        upload_id = self.path.rsplit('/', 1)[-1]
+        upload = self.storage.resumable.get(upload_id)
+        if upload is None:
+            return self._reply(404)
+        if int(self.headers['Upload-Offset']) != upload['sink'].size:
+            return self._reply(409, {'Upload-Offset': str(upload['sink'].size)})
+
+        if self.storage.take_failure():
+            # Keep half the chunk, then drop the connection like a flaky network would
+            length = int(self.headers.get('Content-Length') or 0)
+            self._read_body(upload['sink'], limit=length // 2)
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+
+        self._read_body(upload['sink'])
+        offset = upload['sink'].size
+        if offset >= upload['length']:
+            self.storage.resumable.pop(upload_id, None)
+            self.storage.put(upload['key'], upload['sink'], upsert=True)
+        self._reply(204, {'Upload-Offset': str(offset), 'Tus-Resumable': '1.0.0'})
+
+    def do_GET(self):
+        self.storage.count(requests=1)
+        if self.path.startswith(PUBLIC_PREFIX):
+            body = self.storage.objects.get(unquote(self.path[len(PUBLIC_PREFIX):]))
+            if body is not None:
+                return self._reply(200, {'Content-Type': 'application/octet-stream'}, body)
+        self._reply(404)
+
+
+class _Sink:
+    """Receives an object's bytes: always hashed and counted, kept only if asked."""
+
+    def __init__(self, keep):
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.data = bytearray() if keep else None
+
+    def write(self, piece):
+        self.digest.update(piece)
+        self.size += len(piece)
+        if self.data is not None:
+            self.data += piece
+
+
+class FakeStorage:
+    """Objects and counters shared by the handler threads."""
+
+    def __init__(self, keep_objects=True):
+        self.keep_objects = keep_objects
+        self.objects = {}  # "<bucket>/<path>" -> bytes (b'' unless keep_objects)
+        self.digests = {}  # "<bucket>/<path>" -> sha256 hex, always kept
+        self.resumable = {}
+        self.stats = {'requests': 0, 'bytes_received': 0, 'objects': 0, 'connections': 0}
+        self.fail_patches = 0
+        self._lock = threading.Lock()
+
+    def count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self.stats[name] += delta
+
+    def sink(self):
+        return _Sink(self.keep_objects)
+
+    def put(self, key, sink, upsert=False):
+        with self._lock:
+            if key in self.digests and not upsert:
+                return False
+            self.digests[key] = sink.digest.hexdigest()
+            self.objects[key] = bytes(sink.data) if sink.data is not None else b''
+            self.stats['objects'] += 1
+            return True
+
+    def remove(self, key):
+        with self._lock:
+            self.objects.pop(key, None)
+            return self.digests.pop(key, None) is not None
+
+    def take_failure(self):
+        with self._lock:
+            if self.fail_patches:
+                self.fail_patches -= 1
+                return True
+            return False
+
+
+class FakeStorageServer:
+    """Serves a FakeStorage on 127.0.0.1 from a background thread."""
+
+    def __init__(self, keep_objects=True):
+        self.storage = FakeStorage(keep_objects)
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.storage = self.storage
+        original = self._server.process_request
+
+        def process_request(request, client_address):
+            self.storage.count(connections=1)
+            original(request, client_address)
+
+        self._server.process_request = process_request
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self):
+        return self.storage.stats
+
+    def fail_next_patch(self, times=1):
+        self.storage.fail_patches += times
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-storage', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class MemoryStorage(Storage):
+    """
+    The ``memory`` storage backend. Objects live in the class-level
+    ``objects`` dict (name -> {'sha256', 'size', 'resource_type'}) so tests
+    can inspect them whichever instance did the upload. ``delay`` simulates
+    a slow network; ``fail_next(times)`` makes saves raise.
+    """
+    name = 'memory'
+    base_url = 'https://media.invalid/'
+    objects = {}
+    delay = 0.0
+    failures = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.objects.clear()
+            cls.delay = 0.0
+            cls.failures = 0
+
+    @classmethod
+    def fail_next(cls, times=1):
+        with cls._lock:
+            cls.failures += times
+
+    def _save(self, file, folder, resource_type):
+        with self._lock:
+            if self.failures:
+                type(self).failures -= 1
+                raise ConnectionError("Simulated upload failure")
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in file.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        if self.delay:
+            time.sleep(self.delay)
+        stem, ext = os.path.splitext(os.path.basename(file.name or ''))
+        name = f"{folder}/{stem or 'upload'}_{uuid.uuid4().hex[:8]}{ext.lower()}"
+        with self._lock:
+            self.objects[name] = {'sha256': digest.hexdigest(), 'size': size, 'resource_type': resource_type}
+        return name
+
+    def _delete(self, name):
+        with self._lock:
+            self.objects.pop(name, None)
+
+    def url(self, name):
+        return f"{self.base_url}{name}"
@@ -0,0 +1,151 @@
+# fanout.py
+"""
+Bulk "new post" notifications for an author's followers.
+
+Followers are walked in follower_id order in fixed-size chunks. Each chunk is
+one ``bulk_create`` that skips rows already covered by the Notification
+group_key, committed in the same transaction as the checkpoint. A run
+that dies part-way resumes after the last committed chunk (``resume_fanouts``
+command) without duplicating or skipping anyone.
+
+A runner claims the fan-out with a conditional UPDATE on the status and
+``updated_at`` it read, and every checkpoint moves ``updated_at`` forward
+under the same guard. A fan-out is only taken over once it has gone
+``NOTIFICATION_FANOUT_STALE_AFTER`` seconds without a checkpoint, and a
+runner that was taken over stops at its next chunk instead of sending
+that chunk a second time.
+
+``schedule_post_fanout`` queues the work as a job (see jobs.py), so
+``upload`` returns immediately.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .jobs import enqueue, task
+from .models import Follow, Notification, NotificationFanout, Profile
+from .sidebar import invalidate as invalidate_sidebar
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = getattr(settings, 'NOTIFICATION_FANOUT_CHUNK_SIZE', 1000)
+STALE_AFTER = getattr(settings, 'NOTIFICATION_FANOUT_STALE_AFTER', 10 * 60)  # Seconds without a checkpoint
+
+
+class FanoutLost(Exception):
+    """Another runner claimed the fan-out after this one went quiet for STALE_AFTER."""
+
+
+def schedule_post_fanout(post):
+    """Record a fan-out checkpoint for ``post`` and queue it."""
+    fanout, _ = NotificationFanout.objects.get_or_create(post=post)
+    enqueue('notifications.post_fanout', {'fanout_id': fanout.pk}, key=f"post-fanout:{post.pk}")
+    return fanout
+
+
+def claim_fanout(fanout_id, stale_after=STALE_AFTER):
+    """
+    Take the fan-out for this runner: returns it marked running, or None if
+    it is done or another runner checkpointed it within ``stale_after`` seconds.
+    """
+    fanout = NotificationFanout.objects.select_related('post').get(pk=fanout_id)
+    now = timezone.now()
+    if fanout.status == 'done':
+        return None
+    if fanout.status == 'running' and fanout.updated_at >= now - timedelta(seconds=stale_after):
+        return None
+    # Conditional UPDATE on the state just read: of two runners, only one flips it
+    claimed = NotificationFanout.objects.filter(
+        pk=fanout.pk, status=fanout.status, updated_at=fanout.updated_at
+    ).update(status='running', error='', updated_at=now)
+    if not claimed:
+        return None
+    fanout.status, fanout.updated_at = 'running', now
+    return fanout
+
+
+def _checkpoint(fanout, **fields):
+    """Update the claimed fan-out, raising FanoutLost if another runner took it over."""
+    now = timezone.now()
+    if not NotificationFanout.objects.filter(pk=fanout.pk, updated_at=fanout.updated_at).update(
+        updated_at=now, **fields
+    ):
+        raise FanoutLost(f"Fan-out {fanout.pk} was claimed by another runner")
+    fanout.updated_at = now
+
+
+@task('notifications.post_fanout')
+def run_fanout(fanout_id, chunk_size=CHUNK_SIZE, stale_after=STALE_AFTER):
+    """
+    Notify every follower not yet covered by the checkpoint. Returns
+    notifications sent, or None if the fan-out is done or held by another runner.
+    """
+    fanout = claim_fanout(fanout_id, stale_after)
+    if fanout is None:
+        return None
+
+    post = fanout.post
+    followers = Follow.objects.filter(following_id=post.user_id).order_by('follower_id')
+    sent = 0
+
+    try:
+        while True:
+            follower_ids = list(
+                followers.filter(follower_id__gt=fanout.last_follower_id)
+                .values_list('follower_id', flat=True)[:chunk_size]
+            )
+            if not follower_ids:
+                break
+
+            keys = {
+                follower_id: Notification.make_group_key(follower_id, 'post', post.pk)
+                for follower_id in follower_ids
+            }
+            with transaction.atomic():
+                # Followers already notified by an earlier, interrupted run
+                existing = set(
+                    Notification.objects.filter(group_key__in=keys.values())
+                    .values_list('recipient_id', flat=True)
+                )
+                new_ids = [follower_id for follower_id in follower_ids if follower_id not in existing]
+                Notification.objects.bulk_create([
+                    Notification(
+                        recipient_id=follower_id,
+                        sender_id=post.user_id,
+                        notification_type='post',
+                        post=post,
+                        group_key=keys[follower_id],
+                        sample_actor_ids=[post.user_id],
+                    )
+                    for follower_id in new_ids
+                ], ignore_conflicts=True)
+                Profile.objects.filter(user_id__in=new_ids).update(
+                    unread_notifications=F('unread_notifications') + 1
+                )
+                invalidate_sidebar(*new_ids)
+                # Rolls the chunk back if another runner took over meanwhile
+                _checkpoint(
+                    fanout,
+                    last_follower_id=follower_ids[-1],
+                    sent_count=fanout.sent_count + len(new_ids),
+                )
+                fanout.last_follower_id = follower_ids[-1]
+                fanout.sent_count += len(new_ids)
+            sent += len(new_ids)
+        _checkpoint(fanout, status='done')
+    except FanoutLost as e:
+        logger.warning(f"Stopping notification fan-out for post {post.id} after {sent}: {str(e)}")
+        return sent
+    except Exception as e:
+        logger.error(f"Notification fan-out for post {post.id} failed after {fanout.sent_count}: {str(e)}")
+        NotificationFanout.objects.filter(pk=fanout.pk, updated_at=fanout.updated_at).update(
+            status='failed', error=str(e), updated_at=timezone.now()
+        )
+        raise
+
+    logger.info(f"Notified {fanout.sent_count} followers about post {post.id}")
+    return sent
@@ -0,0 +1,68 @@
+# follows.py
+"""
+Race-free follow toggling, keyed by user id.
+
+Like likes.py, one transaction either deletes the Follow row or inserts it,
+but it starts by locking both users' profiles. Profile counters move with
+the Follow row via the signals in models.py, and ``QuerySet.delete()`` sends
+``post_delete`` for every row it collected, even one a concurrent request
+deleted first; with the pair locked, the second of two concurrent toggles
+only sees the first one's outcome, so each change moves the counters once.
+Timeline and notification work is queued only when this call actually
+changed something.
+"""
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+
+from . import timeline
+from .models import Follow, Profile
+from .notifications import create_follow_notification, create_unfollow_notification
+
+FollowResult = namedtuple('FollowResult', ['following', 'follower_count', 'changed'])
+
+
+def toggle_follow(follower, following_id):
+    """
+    Follow user ``following_id`` if ``follower`` does not yet, otherwise unfollow.
+
+    Returns:
+        FollowResult: the new state, the target's follower count, and whether
+        this call changed anything. None if the target does not exist.
+    """
+    if following_id == follower.pk:
+        raise ValueError("Users cannot follow themselves")
+
+    with transaction.atomic():
+        # Lowest user id first, so opposite toggles between two users cannot deadlock
+        locked = list(
+            Profile.objects.select_for_update()
+            .filter(user_id__in=[follower.pk, following_id])
+            .order_by('user_id')
+            .values_list('user_id', flat=True)
+        )
+        if following_id not in locked:
+            return None
+
+        deleted, _ = Follow.objects.filter(follower=follower, following_id=following_id).delete()
+        if deleted:
+            following, changed = False, True
+        else:
+            try:
+                # Savepoint so a duplicate insert does not poison the outer transaction
+                with transaction.atomic():
+                    Follow.objects.create(follower=follower, following_id=following_id)
+                following, changed = True, True
+            except IntegrityError:
+                # Only without the follower's profile to lock (a half-created account)
+                following, changed = True, False
+
+        if changed:
+            timeline.schedule_follow_change(follower.pk, following_id)
+            if following:
+                create_follow_notification(following_id, follower)
+            else:
+                create_unfollow_notification(following_id, follower)
+
+    follower_count = Profile.objects.filter(user_id=following_id).values_list('follower_count', flat=True).first()
+    return FollowResult(following=following, follower_count=follower_count or 0, changed=changed)
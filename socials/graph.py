@@ -0,0 +1,170 @@
+# graph.py
+"""
+Follow-graph engine for "people you may know".
+
+The Follow table is exported into compressed sparse row (CSR) adjacency
+arrays: ``out_indptr``/``out_indices`` for who each user follows and
+``in_indptr``/``in_indices`` for who follows them. Users are numbered
+densely by position in the sorted ``user_ids`` array, and neighbour lists
+are int32, so a graph of millions of follows fits in tens of megabytes.
+
+For one user, candidates are:
+    * friends of friends: everyone followed by someone the user follows,
+      scored by how many such paths there are (mutual connections)
+    * followers the user does not follow back
+topped up with the most-followed accounts when the graph has nothing to say.
+
+This module needs NumPy and is only imported by the precompute job and
+command; pages read the results from the Suggestion table (suggestions.py).
+"""
+import itertools
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Follow, Suggestion
+from .sidebar import invalidate as invalidate_sidebar
+
+STORED_SUGGESTIONS = 20  # Per user; more than the sidebar shows so follows made since can be skipped
+FOLLOWS_YOU_WEIGHT = 2.0  # A follower not yet followed back counts as two mutual connections
+POPULARITY_WEIGHT = 0.1  # Times log1p(followers); breaks ties toward established accounts
+
+
+class FollowGraph:
+    """Immutable CSR snapshot of the follow graph."""
+
+    def __init__(self, user_ids, followers, followings):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.size = len(self.user_ids)
+        src = np.searchsorted(self.user_ids, followers).astype(np.int32)
+        dst = np.searchsorted(self.user_ids, followings).astype(np.int32)
+        self.out_indptr, self.out_indices = self._csr(src, dst)
+        self.in_indptr, self.in_indices = self._csr(dst, src)
+        self.in_degree = np.diff(self.in_indptr)
+        self.popularity = POPULARITY_WEIGHT * np.log1p(self.in_degree)
+        # Most-followed first, for topping up short lists
+        self.popular = np.argsort(-self.in_degree, kind='stable')[:STORED_SUGGESTIONS * 5]
+
+    def _csr(self, rows, cols):
+        order = np.argsort(rows, kind='stable')
+        indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.size), out=indptr[1:])
+        return indptr, cols[order]
+
+    @classmethod
+    def from_db(cls, chunk_size=10000):
+        user_ids = np.fromiter(
+            User.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=chunk_size),
+            dtype=np.int64,
+        )
+        edges = np.fromiter(
+            itertools.chain.from_iterable(
+                Follow.objects.values_list('follower_id', 'following_id').iterator(chunk_size=chunk_size)
+            ),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        # Drop edges to users created after the user snapshot
+        known = np.isin(edges, user_ids).all(axis=1)
+        edges = edges[known]
+        return cls(user_ids, edges[:, 0], edges[:, 1])
+
+    @property
+    def edge_count(self):
+        return len(self.out_indices)
+
+    def position(self, user_id):
+        i = int(np.searchsorted(self.user_ids, user_id))
+        if i >= self.size or self.user_ids[i] != user_id:
+            raise KeyError(user_id)
+        return i
+
+    @staticmethod
+    def gather(indptr, indices, rows):
+        """Concatenated neighbour lists of ``rows``, without a Python loop."""
+        starts = indptr[rows]
+        lengths = indptr[np.asarray(rows) + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return indices[:0]
+        # Offset of each output slot within its source row, shifted to that row's start
+        shifts = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return indices[np.arange(total) + shifts]
+
+    def suggest(self, user_id, limit=STORED_SUGGESTIONS):
+        """Ranked ``[(user_id, score, mutual_count, follows_you), ...]`` for one user."""
+        u = self.position(user_id)
+        following = self.out_indices[self.out_indptr[u]:self.out_indptr[u + 1]]
+        followers = self.in_indices[self.in_indptr[u]:self.in_indptr[u + 1]]
+
+        fof, mutual = np.unique(self.gather(self.out_indptr, self.out_indices, following), return_counts=True)
+        candidates = np.union1d(fof, followers)
+        mutual_count = np.zeros(len(candidates), dtype=np.int64)
+        mutual_count[np.searchsorted(candidates, fof)] = mutual
+        follows_you = np.isin(candidates, followers)
+
+        # Never suggest yourself or someone already followed
+        keep = (candidates != u) & ~np.isin(candidates, following)
+        candidates, mutual_count, follows_you = candidates[keep], mutual_count[keep], follows_you[keep]
+        scores = mutual_count + FOLLOWS_YOU_WEIGHT * follows_you + self.popularity[candidates]
+
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+            candidates, scores = candidates[top], scores[top]
+            mutual_count, follows_you = mutual_count[top], follows_you[top]
+        order = np.argsort(-scores, kind='stable')
+        ranked = [
+            (int(self.user_ids[c]), float(s), int(m), bool(f))
+            for c, s, m, f in zip(candidates[order], scores[order], mutual_count[order], follows_you[order])
+        ]
+
+        if len(ranked) < limit:
+            taken = set(candidates.tolist()) | set(following.tolist()) | {u}
+            for c in self.popular:
+                if len(ranked) >= limit:
+                    break
+                if int(c) not in taken:
+                    ranked.append((int(self.user_ids[c]), float(self.popularity[c]), 0, False))
+        return ranked
+
+
+def precompute_suggestions(graph=None, user_ids=None, batch_size=500, limit=STORED_SUGGESTIONS):
+    """
+    Rewrite the Suggestion rows for every user (or ``user_ids``) from one
+    graph snapshot, one transaction per batch. Returns users processed.
+    """
+    graph = graph or FollowGraph.from_db()
+    targets = graph.user_ids if user_ids is None else np.intersect1d(graph.user_ids, user_ids)
+    now = timezone.now()
+    done = 0
+
+    for start in range(0, len(targets), batch_size):
+        batch = [int(user_id) for user_id in targets[start:start + batch_size]]
+        ranked = {user_id: graph.suggest(user_id, limit) for user_id in batch}
+        # Skip users deleted since the snapshot, on either side
+        referenced = set(batch) | {row[0] for rows in ranked.values() for row in rows}
+        existing = set(User.objects.filter(id__in=referenced).values_list('id', flat=True))
+        rows = [
+            Suggestion(
+                user_id=user_id, suggested_id=suggested_id, score=score,
+                mutual_count=mutual_count, follows_you=follows_you, computed_at=now,
+            )
+            for user_id, suggestions in ranked.items() if user_id in existing
+            for suggested_id, score, mutual_count, follows_you in suggestions if suggested_id in existing
+        ]
+        with transaction.atomic():
+            Suggestion.objects.filter(user_id__in=batch).delete()
+            Suggestion.objects.bulk_create(rows, batch_size=1000)
+            invalidate_sidebar(*batch)
+        done += len(batch)
+    return done
+
+
+def describe(graph):
+    """One-line summary for command output."""
+    density = graph.edge_count / max(1, graph.size)
+    size_mb = sum(a.nbytes for a in (graph.out_indptr, graph.out_indices, graph.in_indptr, graph.in_indices)) / 2 ** 20
+    return (f"{graph.size} users, {graph.edge_count} follows ({density:.1f} per user), "
+            f"CSR {size_mb:.1f} MB, max followers {int(graph.in_degree.max(initial=0))}")
+
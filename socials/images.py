@@ -0,0 +1,169 @@
+# images.py
+"""
+Fixed-size image derivatives, rendered with Pillow in a process pool.
+
+Originals are whatever the user uploaded (often a 4000px phone photo), and
+pages used to show them as-is in 32px avatars and 600px feed cards. Each
+image upload now also gets a few resized copies:
+
+    avatar  96x96 square crop   sidebar, notification and post-header avatars
+    grid   320x320 square crop  large avatars, thumbnails
+    card   640px wide           feed cards
+    full  1280px wide           post pages, high-DPI cards
+
+each as WebP plus a JPEG fallback. Nothing is upscaled, EXIF orientation is
+applied and metadata is dropped. Resizing is CPU-bound, so ``render`` runs in
+a ``ProcessPoolExecutor`` (``IMAGE_WORKERS`` processes) rather than on the
+job threads, where the GIL would serialize it with everything else.
+
+``phash`` computes the 64-bit perceptual hash used for near-duplicate
+lookups (see neardup.py) on the same pool.
+
+This module only depends on Pillow, numpy and settings, so pool processes
+can import it without setting up Django; media.py uploads the results.
+"""
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from django.conf import settings
+from PIL import Image, ImageOps
+
+WORKERS = getattr(settings, 'IMAGE_WORKERS', 2)
+RENDER_TIMEOUT = getattr(settings, 'IMAGE_RENDER_TIMEOUT', 60)  # Seconds per image
+MAX_PIXELS = getattr(settings, 'IMAGE_MAX_PIXELS', 50_000_000)  # Refuse decompression bombs
+
+# name -> (width, height); a height means a centred square crop, None keeps the aspect ratio
+VARIANTS = {
+    'avatar': (96, 96),
+    'grid': (320, 320),
+    'card': (640, None),
+    'full': (1280, None),
+}
+POST_VARIANTS = ('grid', 'card', 'full')
+PROFILE_VARIANTS = ('avatar', 'grid')
+
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+
+
+def _resize(image, width, height):
+    if height is not None:
+        size = min(width, image.width, image.height)
+        return ImageOps.fit(image, (size, size), Image.LANCZOS)
+    if image.width <= width:
+        return image.copy()
+    return image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+
+
+def _flatten(image):
+    """JPEG has no alpha channel: composite transparent images onto white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+# pHash: the lowest 8x8 DCT frequencies of a 32x32 greyscale thumbnail
+HASH_SAMPLE = 32
+HASH_SIZE = 8
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis: ``M @ x`` transforms the columns of ``x``."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT = _dct_matrix(HASH_SAMPLE)
+
+
+def phash(path):
+    """
+    64-bit perceptual hash of the image at ``path``, as an unsigned int.
+    Each bit says whether one low-frequency DCT coefficient is above the
+    median of the others, so re-encoding, resizing and mild edits flip only
+    a few bits. Animated images are hashed on their first frame.
+    """
+    with Image.open(path) as source:
+        source.draft('L', (HASH_SAMPLE * 4, HASH_SAMPLE * 4))  # JPEGs decode at reduced scale
+        image = ImageOps.exif_transpose(source).convert('L')
+    pixels = np.asarray(image.resize((HASH_SAMPLE, HASH_SAMPLE), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    bits = low > np.median(low[1:])  # The DC term is overall brightness: left out of the median
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def render(path, variants=POST_VARIANTS):
+    """
+    Render ``variants`` of the image at ``path``. Returns
+    ``{name: {'width', 'height', 'webp': bytes, 'jpeg': bytes}}``, or ``{}``
+    for animated images, which are left to play from the original.
+    """
+    with Image.open(path) as source:
+        if getattr(source, 'is_animated', False):
+            return {}
+        has_alpha = source.mode in ('RGBA', 'LA') or 'transparency' in source.info
+        image = ImageOps.exif_transpose(source).convert('RGBA' if has_alpha else 'RGB')
+
+    results = {}
+    for name in variants:
+        resized = _resize(image, *VARIANTS[name])
+        encoded = {'width': resized.width, 'height': resized.height}
+        for fmt, options in FORMATS.items():
+            buffer = io.BytesIO()
+            (resized if fmt == 'webp' else _flatten(resized)).save(buffer, **options)
+            encoded[fmt] = buffer.getvalue()
+        results[name] = encoded
+    return results
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn, not fork: the parent runs job and server threads mid-flight
+                _pool = ProcessPoolExecutor(
+                    max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn')
+                )
+    return _pool
+
+
+def run_in_pool(fn, *args):
+    """``fn(*args)`` on the shared process pool, waiting up to RENDER_TIMEOUT."""
+    global _pool
+    pool = get_pool()
+    try:
+        return pool.submit(fn, *args).result(timeout=RENDER_TIMEOUT)
+    except BrokenProcessPool:
+        # A worker died (OOM on a huge image); start a fresh pool for the next caller
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        pool.shutdown(wait=False)
+        raise
+
+
+def render_in_pool(path, variants=POST_VARIANTS):
+    return run_in_pool(render, path, variants)
+
+
+def phash_in_pool(path):
+    return run_in_pool(phash, path)
@@ -0,0 +1,287 @@
+# jobs.py
+"""
+A small database-backed job queue for request side effects.
+
+Views call ``enqueue()`` instead of sending email or writing notifications
+inline. The Job row is written in the request's transaction, so a job exists
+if and only if the request committed. Workers claim due jobs, run the
+registered handler on a thread pool, and retry failures with exponential
+backoff until ``max_attempts``.
+
+Jobs run in two places:
+    * in-process: ``JOBS_IN_PROCESS_WORKERS`` threads inside each web process,
+      woken as soon as a job commits (the default, no extra service needed)
+    * ``manage.py run_jobs``: a dedicated worker process (set
+      ``JOBS_IN_PROCESS_WORKERS = 0`` on the web processes when using it)
+
+Handlers must be idempotent: a job whose worker died mid-run is retried once
+its lock expires. ``idempotency_key`` deduplicates enqueues of the same work.
+
+Finished jobs are kept for ``JOBS_RETENTION_DAYS`` (per status) for metrics
+and debugging, then deleted in batches by a daily job that reschedules
+itself (``manage.py prune_jobs --schedule`` starts it).
+"""
+import logging
+import os
+import random
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Avg, Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+IN_PROCESS_WORKERS = getattr(settings, 'JOBS_IN_PROCESS_WORKERS', 2)
+POLL_INTERVAL = getattr(settings, 'JOBS_POLL_INTERVAL', 2.0)
+LOCK_TIMEOUT = getattr(settings, 'JOBS_LOCK_TIMEOUT', 300)  # Seconds before a running job is reclaimed
+BACKOFF_BASE = getattr(settings, 'JOBS_BACKOFF_BASE', 5)  # Seconds; doubles per attempt
+BACKOFF_MAX = getattr(settings, 'JOBS_BACKOFF_MAX', 3600)
+DEFAULT_RETENTION_DAYS = {'done': 7, 'failed': 30}
+RETENTION_DAYS = {**DEFAULT_RETENTION_DAYS, **getattr(settings, 'JOBS_RETENTION_DAYS', {})}
+PRUNE_BATCH_SIZE = 1000
+PRUNE_INTERVAL = 24 * 60 * 60  # seconds between scheduled prunes
+
+_registry = {}
+
+
+# ----------------------------
+#  Registration + enqueue
+# ----------------------------
+def task(name):
+    """Register a handler: ``@task('emails.send_otp') def send_otp(email, code): ...``"""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, key=None, delay=0, max_attempts=5):
+    """
+    Queue ``name`` to run with ``payload`` as keyword arguments.
+
+    ``key`` makes the enqueue idempotent: a second job with the same key is
+    not created and the existing one is returned.
+    """
+    if name not in _registry:
+        raise ValueError(f"Unknown job: {name}")
+    fields = {
+        'name': name,
+        'payload': payload or {},
+        'max_attempts': max_attempts,
+        'run_at': timezone.now() + timedelta(seconds=delay),
+    }
+    if key is None:
+        job = Job.objects.create(**fields)
+    else:
+        try:
+            with transaction.atomic():
+                job = Job.objects.create(idempotency_key=key, **fields)
+        except IntegrityError:
+            return Job.objects.get(idempotency_key=key)
+
+    if IN_PROCESS_WORKERS > 0:
+        transaction.on_commit(_wake_in_process_worker)
+    return job
+
+
+# ----------------------------
+#  Claiming + running
+# ----------------------------
+def backoff_seconds(attempts):
+    """Exponential backoff with jitter, capped at BACKOFF_MAX."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def requeue_stale():
+    """
+    Put back jobs running longer than LOCK_TIMEOUT (their worker died mid-run),
+    or fail them if that run was their last attempt.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', started_at__lt=now - timedelta(seconds=LOCK_TIMEOUT))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', last_error="Worker stopped before the last attempt finished",
+        finished_at=now, locked_by='',
+    )
+    if failed:
+        logger.error(f"Failed {failed} jobs whose worker died on their last attempt")
+    return stale.update(status='queued', locked_by='')
+
+
+def claim(worker_id, limit):
+    """Atomically take up to ``limit`` due jobs for ``worker_id``."""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status='queued', run_at__lte=now)
+        .order_by('run_at', 'id')
+        .values_list('id', flat=True)[:limit * 2]
+    )
+    claimed = []
+    for job_id in candidates:
+        # Conditional UPDATE: only one worker can flip a given row to running
+        if Job.objects.filter(pk=job_id, status='queued').update(
+            status='running', locked_by=worker_id, started_at=now, attempts=F('attempts') + 1
+        ):
+            claimed.append(job_id)
+            if len(claimed) >= limit:
+                break
+    return list(Job.objects.filter(pk__in=claimed))
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome."""
+    handler = _registry.get(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for {job.name}")
+        handler(**job.payload)
+    except Exception as e:
+        if job.attempts >= job.max_attempts:
+            logger.error(f"Job {job} failed permanently after {job.attempts} attempts: {str(e)}")
+            Job.objects.filter(pk=job.pk).update(
+                status='failed', last_error=str(e), finished_at=timezone.now(), locked_by=''
+            )
+        else:
+            delay = backoff_seconds(job.attempts)
+            logger.warning(f"Job {job} failed (attempt {job.attempts}), retrying in {delay:.0f}s: {str(e)}")
+            Job.objects.filter(pk=job.pk).update(
+                status='queued', last_error=str(e), locked_by='',
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+        return False
+    Job.objects.filter(pk=job.pk).update(status='done', finished_at=timezone.now(), locked_by='')
+    return True
+
+
+class Worker:
+    """Polls for due jobs and runs them on a thread pool."""
+
+    def __init__(self, threads=4, poll_interval=POLL_INTERVAL, worker_id=None):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='job')
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def _run(self, job):
+        try:
+            return run_job(job)
+        finally:
+            close_old_connections()
+
+    def run_once(self):
+        """Claim and run one batch of due jobs. Returns how many ran."""
+        requeue_stale()
+        jobs = claim(self.worker_id, self.threads)
+        list(self._pool.map(self._run, jobs))
+        close_old_connections()
+        return len(jobs)
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue  # More may be waiting; don't sleep
+            except Exception as e:
+                logger.error(f"Job worker {self.worker_id} error: {str(e)}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._pool.shutdown(wait=True)
+
+
+_in_process_worker = None
+_in_process_lock = threading.Lock()
+
+
+def _wake_in_process_worker():
+    global _in_process_worker
+    if _in_process_worker is None:
+        with _in_process_lock:
+            if _in_process_worker is None:
+                _in_process_worker = Worker(threads=IN_PROCESS_WORKERS)
+                threading.Thread(
+                    target=_in_process_worker.run_forever, name='job-worker', daemon=True
+                ).start()
+    _in_process_worker.wake()
+
+
+# ----------------------------
+#  Retention
+# ----------------------------
+def prune_finished(batch_size=PRUNE_BATCH_SIZE, now=None):
+    """Delete done and failed jobs past their status's retention, in primary-key batches."""
+    now = now or timezone.now()
+    pruned = 0
+    for status, days in RETENTION_DAYS.items():
+        if days is None:
+            continue
+        expired = Job.objects.filter(status=status, finished_at__lt=now - timedelta(days=days))
+        while True:
+            pks = list(expired.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            pruned += Job.objects.filter(pk__in=pks).delete()[0]
+    logger.info(f"Pruned {pruned} finished jobs")
+    return pruned
+
+
+def schedule_prune(delay=0):
+    """Queue the next daily prune; one per day however often this is called."""
+    run_day = (timezone.now() + timedelta(seconds=delay)).date()
+    enqueue('jobs.prune', key=f"jobs-prune:{run_day.isoformat()}", delay=delay)
+
+
+@task('jobs.prune')
+def prune_job():
+    try:
+        prune_finished()
+    finally:
+        schedule_prune(delay=PRUNE_INTERVAL)
+
+
+# ----------------------------
+#  Metrics
+# ----------------------------
+def queue_metrics(window_minutes=15):
+    """Queue depth per status and wait/run latency over recently finished jobs."""
+    now = timezone.now()
+    depth = dict(Job.objects.values_list('status').annotate(n=Count('id')).order_by())
+    oldest_due = Job.objects.filter(status='queued', run_at__lte=now).aggregate(oldest=Min('run_at'))['oldest']
+
+    recent = Job.objects.filter(status='done', finished_at__gte=now - timedelta(minutes=window_minutes))
+    timings = recent.aggregate(
+        wait=Avg(F('started_at') - F('created_at')),
+        run=Avg(F('finished_at') - F('started_at')),
+        completed=Count('id'),
+    )
+
+    def seconds(value):
+        return round(value.total_seconds(), 3) if value is not None else None
+
+    return {
+        'depth': {status: depth.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+        'oldest_due_age_seconds': seconds(now - oldest_due) if oldest_due else 0,
+        'window_minutes': window_minutes,
+        'completed': timings['completed'],
+        'avg_wait_seconds': seconds(timings['wait']),
+        'avg_run_seconds': seconds(timings['run']),
+        'failed_by_name': dict(
+            Job.objects.filter(status='failed').values_list('name').annotate(n=Count('id')).order_by()
+        ),
+    }
@@ -0,0 +1,52 @@
+# likes.py
+"""
+Race-free like toggling.
+
+The toggle runs in one transaction. The unlike path is a single DELETE whose
+row count says whether a like existed. The like path is an INSERT that
+tolerates a concurrent duplicate through the unique (post_id, username)
+constraint. The counter moves with an ``F()`` UPDATE of the no_of_likes
+column only (or a buffered delta, see counters.py), so concurrent toggles
+can never lose an update the way the old read-modify-write ``post.save()``
+did.
+"""
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+
+from . import counters
+from .models import LikePost
+
+LikeResult = namedtuple('LikeResult', ['liked', 'like_count', 'changed'])
+
+
+def toggle_like(post, user):
+    """
+    Like ``post`` if ``user`` has not liked it yet, otherwise unlike it.
+
+    Returns:
+        LikeResult: the new like state, the persisted like count, and whether
+        this call actually changed anything (False if a concurrent request
+        got there first).
+    """
+    with transaction.atomic():
+        deleted, _ = LikePost.objects.filter(post_id=post, username=user).delete()
+        if deleted:
+            liked, delta = False, -1
+        else:
+            try:
+                # Savepoint so a duplicate insert does not poison the outer transaction
+                with transaction.atomic():
+                    LikePost.objects.create(post_id=post, username=user)
+                liked, delta = True, 1
+            except IntegrityError:
+                # A concurrent request liked it between our DELETE and INSERT
+                liked, delta = True, 0
+
+        if delta:
+            # F() update of no_of_likes, or a buffered delta when write-behind is on
+            counters.add_delta(post.pk, 'no_of_likes', delta)
+
+    like_count = counters.current_value(post.pk, 'no_of_likes')
+    post.no_of_likes = like_count
+    return LikeResult(liked=liked, like_count=like_count, changed=bool(delta))
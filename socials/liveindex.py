@@ -0,0 +1,89 @@
+# liveindex.py
+"""
+Process-local in-memory indexes kept in step with the database.
+
+The typeahead and the near-duplicate image index are both rebuilt from the
+database rather than persisted: ``LiveIndex`` builds one on first use,
+rebuilds it on a background thread every ``refresh_interval`` seconds (or
+sooner when ``needs_rebuild`` says so), and applies changes as their
+transactions commit. Changes that commit while a rebuild runs are replayed
+onto the new index before it replaces the old one, so none is lost.
+"""
+import logging
+import threading
+import time
+
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class LiveIndex:
+    """
+    ``build()`` returns a fresh index from the database; ``apply(index,
+    *change)`` applies one change recorded with ``record(*change)``.
+    """
+
+    def __init__(self, name, build, apply, refresh_interval, needs_rebuild=None):
+        self.name = name
+        self.build = build
+        self.apply = apply
+        self.refresh_interval = refresh_interval
+        self.needs_rebuild = needs_rebuild
+        self._index = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._pending = []  # Changes seen while a rebuild runs, replayed onto the new index
+
+    def get(self):
+        """The process's index, building it on first use and refreshing it in the background."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    started = time.perf_counter()
+                    index = self.build()
+                    self._index, self._built_at = index, time.monotonic()
+                    logger.info(
+                        f"Built {self.name} index of {len(index)} entries in {time.perf_counter() - started:.2f}s"
+                    )
+        elif time.monotonic() - self._built_at > self.refresh_interval or (
+            self.needs_rebuild is not None and self.needs_rebuild(self._index)
+        ):
+            self._start_rebuild()
+        return self._index
+
+    def _start_rebuild(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, name=f"{self.name}-rebuild", daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            index = self.build()
+            with self._lock:
+                for change in self._pending:
+                    self.apply(index, *change)
+                self._pending.clear()
+                self._index, self._built_at = index, time.monotonic()
+        except Exception as e:
+            logger.warning(f"Rebuilding the {self.name} index failed: {str(e)}")
+            with self._lock:
+                self._pending.clear()  # Already applied to the index still being served
+            self._built_at = time.monotonic()  # Serve the old index until the next interval
+        finally:
+            self._rebuilding = False
+            close_old_connections()
+
+    def record(self, *change):
+        """Apply ``change`` once the current transaction commits; rolled-back changes never arrive."""
+        def apply():
+            with self._lock:
+                if self._rebuilding:
+                    self._pending.append(change)
+            if self._index is not None:
+                self.apply(self._index, *change)
+
+        transaction.on_commit(apply)
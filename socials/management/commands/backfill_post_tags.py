@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from socials.tags import backfill_post_tags
+
+
+class Command(BaseCommand):
+    help = "Parse hashtags and @mentions out of every post caption into the PostTag table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Posts per write transaction")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        posts, tags = backfill_post_tags(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {tags} tags across {posts} posts in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw, ImageFilter
+
+from socials import images
+
+# Typical phone camera outputs
+SIZES = [(4032, 3024), (3024, 4032), (4000, 3000), (1920, 1080), (1080, 1350)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the image derivative pipeline on synthetic photos: render throughput serial vs "
+        "the process pool, and bytes per feed page with originals vs derivatives."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=10, help="Image posts per feed page")
+        parser.add_argument('--workers', type=int, default=images.WORKERS)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def photo(self, rng, path):
+        """A photo-like JPEG: smooth gradients, shapes, blur and sensor noise."""
+        width, height = rng.choice(SIZES)
+        image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+        tint = Image.new('RGB', (width, height), tuple(rng.randrange(256) for _ in range(3)))
+        image = Image.blend(image, tint, 0.6)
+        draw = ImageDraw.Draw(image)
+        for _ in range(40):
+            x, y = rng.randrange(width), rng.randrange(height)
+            r = rng.randrange(50, width // 4)
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+        image = image.filter(ImageFilter.GaussianBlur(6))
+        noise = Image.effect_noise((width, height), 24).convert('RGB')
+        image = Image.blend(image, noise, 0.12)
+        image.save(path, 'JPEG', quality=90)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        variants = tuple(images.VARIANTS)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for i in range(options['images']):
+                path = os.path.join(directory, f"photo{i}.jpg")
+                self.photo(rng, path)
+                paths.append(path)
+            originals = [os.path.getsize(path) for path in paths]
+            self.stdout.write(
+                f"Generated {len(paths)} photos, median original {statistics.median(originals) / 1024:.0f} KB"
+            )
+
+            started = time.perf_counter()
+            rendered = [images.render(path, variants) for path in paths]
+            serial = time.perf_counter() - started
+            self.stdout.write(f"Serial: {len(paths) / serial:.1f} images/s")
+
+            with ProcessPoolExecutor(options['workers'], mp_context=multiprocessing.get_context('spawn')) as pool:
+                list(pool.map(images.render, paths[:options['workers']], [variants] * options['workers']))  # Warm the workers up
+                started = time.perf_counter()
+                list(pool.map(images.render, paths, [variants] * len(paths)))
+                pooled = time.perf_counter() - started
+            self.stdout.write(
+                f"Pool ({options['workers']} processes): {len(paths) / pooled:.1f} images/s "
+                f"({serial / pooled:.1f}x serial)"
+            )
+
+        for name in variants:
+            for fmt in images.FORMATS:
+                sizes = [len(result[name][fmt]) for result in rendered]
+                self.stdout.write(f"  {name:>5} {fmt:<4} median {statistics.median(sizes) / 1024:6.1f} KB")
+
+        # A feed page: each card's image plus a 32px author avatar (also a full photo before)
+        page = options['page_size']
+        page_before = sum(originals[i % len(originals)] * 2 for i in range(page))
+        page_after = sum(
+            len(rendered[i % len(rendered)]['card']['webp']) + len(rendered[i % len(rendered)]['avatar']['webp'])
+            for i in range(page)
+        )
+        ratio = page_before / page_after
+        self.stdout.write(
+            f"Feed page of {page} image posts: {page_before / 1024 / 1024:.1f} MB originals -> "
+            f"{page_after / 1024:.0f} KB derivatives ({ratio:.0f}x smaller)"
+        )
+        verdict = self.style.SUCCESS("PASS") if ratio >= 10 else self.style.ERROR("FAIL")
+        self.stdout.write(f"{verdict}: feed page bytes {ratio:.0f}x smaller (target >= 10x)")
@@ -0,0 +1,92 @@
+import os
+import time
+import tracemalloc
+
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.core.management.base import BaseCommand
+
+from socials.fakestorage import FakeStorageServer
+from socials.utils import make_storage_client, upload_to_supabase
+
+
+def disk_io():
+    """(read_bytes, write_bytes) this process has caused at the block layer, where /proc allows."""
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(': ') for line in f.read().splitlines())
+        return int(fields['rchar']), int(fields['wchar'])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Upload synthetic files to a local fake Supabase Storage server and report bytes "
+        "copied, peak Python memory and throughput for the streaming and resumable paths."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,12,48', help="Comma-separated file sizes in MB")
+        parser.add_argument('--flaky', action='store_true',
+                            help="Drop the connection during one chunk of each resumable upload")
+
+    def make_upload(self, size):
+        """A Django upload object like request.FILES gives: in memory when small, spooled to disk when large."""
+        data = os.urandom(1024 * 1024)
+        if size <= 2.5 * 1024 * 1024:
+            from io import BytesIO
+            buffer = BytesIO(data * (size // len(data)) + data[:size % len(data)])
+            return InMemoryUploadedFile(buffer, 'file', 'clip.mp4', 'video/mp4', size, None)
+        upload = TemporaryUploadedFile('clip.mp4', 'video/mp4', size, None)
+        written = 0
+        while written < size:
+            written += upload.write(data[:size - written])
+        upload.seek(0)
+        return upload
+
+    def run(self, client, server, upload, resumable):
+        received = server.stats['bytes_received']
+        requests = server.stats['requests']
+        read_before, write_before = disk_io()
+        tracemalloc.start()
+        started = time.perf_counter()
+        upload_to_supabase(upload, 'post', resumable=resumable, client=client)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        read_after, write_after = disk_io()
+        return {
+            'sent': server.stats['bytes_received'] - received,
+            'requests': server.stats['requests'] - requests,
+            'written': write_after - write_before,
+            'peak': peak,
+            'elapsed': elapsed,
+        }
+
+    def handle(self, *args, **options):
+        with FakeStorageServer(keep_objects=False) as server:
+            client = make_storage_client(server.url, 'bench')
+            self.stdout.write(
+                f"{'size MB':>8} {'mode':>10} {'sent MB':>8} {'reqs':>5} {'written MB':>10} "
+                f"{'peak MB':>8} {'MB/s':>7}"
+            )
+            for size_mb in (float(size) for size in options['sizes'].split(',')):
+                size = int(size_mb * 1024 * 1024)
+                for resumable in (False, True):
+                    if resumable and options['flaky']:
+                        server.fail_next_patch()
+                    upload = self.make_upload(size)
+                    try:
+                        result = self.run(client, server, upload, resumable)
+                    finally:
+                        upload.close()
+                    self.stdout.write(
+                        f"{size_mb:>8.1f} {'resumable' if resumable else 'stream':>10} "
+                        f"{result['sent'] / 2 ** 20:>8.1f} {result['requests']:>5} "
+                        f"{result['written'] / 2 ** 20:>10.2f} {result['peak'] / 2 ** 20:>8.2f} "
+                        f"{size_mb / max(result['elapsed'], 1e-9):>7.0f}"
+                    )
+            self.stdout.write(
+                f"{server.stats['objects']} objects stored over {server.stats['connections']} connections"
+            )
+            client.close()
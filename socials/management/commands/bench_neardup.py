@@ -0,0 +1,86 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from socials import neardup
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark near-duplicate lookups over synthetic perceptual hashes: the multi-index "
+        "table against a linear scan, checking both return the same matches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashes', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--distances', type=int, nargs='+', default=[4, 8, 12])
+        parser.add_argument('--copies', type=int, default=5,
+                            help="Near-duplicates planted around each query image")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def flip(self, rng, value, bits):
+        """``value`` with ``bits`` distinct random bits flipped."""
+        for bit in rng.choice(64, size=bits, replace=False):
+            value ^= np.uint64(1) << np.uint64(bit)
+        return value
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        total, copies = options['hashes'], options['copies']
+        max_k = max(options['distances'])
+
+        # Random hashes, plus a cluster of edited copies around each query image
+        hashes = rng.integers(0, 2 ** 64, size=total, dtype=np.uint64)
+        queries = hashes[:options['queries']].copy()
+        slot = options['queries']
+        for query in queries:
+            for _ in range(copies):
+                hashes[slot] = self.flip(rng, query, int(rng.integers(0, max_k + 1)))
+                slot += 1
+
+        started = time.perf_counter()
+        index = neardup.HammingIndex(hashes, np.arange(total, dtype=np.int64))
+        build = time.perf_counter() - started
+        table_bytes = sum(array.nbytes for table in index.tables for array in table)
+        self.stdout.write(
+            f"Built index of {total:,} hashes in {build:.2f}s "
+            f"({(table_bytes + index.hashes.nbytes) / 1024 / 1024:.0f} MB)"
+        )
+
+        passed = True
+        for k in options['distances']:
+            indexed, scanned, candidates = [], [], []
+            mismatches = found = 0
+            for query in queries:
+                started = time.perf_counter()
+                results = index.search(int(query), k)
+                indexed.append(time.perf_counter() - started)
+                candidates.append(len(index.candidates(query, k // neardup.CHUNKS)))
+
+                started = time.perf_counter()
+                distances = np.bitwise_count(hashes ^ query)
+                expected = np.flatnonzero(distances <= k)
+                scanned.append(time.perf_counter() - started)
+
+                found += len(results)
+                if sorted(item_id for _, item_id in results) != expected.tolist():
+                    mismatches += 1
+
+            p50 = statistics.median(indexed) * 1000
+            p99 = sorted(indexed)[int(len(indexed) * 0.99)] * 1000
+            scan = statistics.median(scanned) * 1000
+            self.stdout.write(
+                f"k={k:>2}: index p50 {p50:.2f} ms p99 {p99:.2f} ms, linear scan p50 {scan:.2f} ms "
+                f"({scan / p50:.0f}x), {statistics.median(candidates):,.0f} candidates checked, "
+                f"{found / len(queries):.1f} matches per query, {mismatches} mismatches"
+            )
+            if mismatches or (k <= neardup.DISTANCE and p50 >= scan):
+                passed = False
+
+        verdict = self.style.SUCCESS("PASS") if passed else self.style.ERROR("FAIL")
+        self.stdout.write(
+            f"{verdict}: exact results, and faster than a linear scan up to k={neardup.DISTANCE}"
+        )
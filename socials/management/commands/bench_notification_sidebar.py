@@ -0,0 +1,70 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from socials import retention, sidebar
+from socials.models import Notification
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the sidebar notification query as one user's history grows, "
+        "then purge with the retention policy and measure again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help="Comma-separated notification history sizes to measure")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keep', action='store_true', help="Keep the generated users and notifications")
+
+    def measure(self, user, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            sidebar.recent_notifications(user)  # The sidebar's own loader, bypassing its cache
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        prefix = f"bench_{int(time.time())}"
+        recipient = User.objects.create(username=f"{prefix}_recipient")
+        sender = User.objects.create(username=f"{prefix}_sender")
+        now = timezone.now()
+
+        self.stdout.write(f"{'rows':>10} {'sidebar ms':>12}")
+        written = 0
+        try:
+            for size in sizes:
+                while written < size:
+                    batch = min(5000, size - written)
+                    # Spread history over a year so the purge has something to do
+                    Notification.objects.bulk_create([
+                        Notification(
+                            recipient=recipient, sender=sender, notification_type='follow',
+                            group_key=f"{prefix}:{written + i}", is_read=True,
+                            updated_at=now - timedelta(minutes=(written + i) * 525600 // size),
+                        )
+                        for i in range(batch)
+                    ])
+                    written += batch
+                self.stdout.write(f"{size:>10} {self.measure(recipient, options['repeat']):>12.2f}")
+
+            started = time.perf_counter()
+            purged = retention.purge_expired(
+                archive_dir=None, queryset=Notification.objects.filter(recipient=recipient)
+            )
+            remaining = Notification.objects.filter(recipient=recipient).count()
+            self.stdout.write(
+                f"Purged {purged} rows in {time.perf_counter() - started:.2f}s; "
+                f"{remaining} rows left, sidebar {self.measure(recipient, options['repeat']):.2f} ms"
+            )
+        finally:
+            if not options['keep']:
+                Notification.objects.filter(recipient=recipient).delete()
+                User.objects.filter(username__startswith=prefix).delete()
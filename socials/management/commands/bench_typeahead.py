@@ -0,0 +1,111 @@
+import random
+import resource
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from socials.typeahead import MAX_RESULTS, PrefixIndex
+
+FIRST = [
+    'ada', 'ade', 'ali', 'amara', 'ben', 'chi', 'chris', 'dan', 'david', 'emeka', 'emma', 'fola', 'grace',
+    'ife', 'james', 'john', 'joy', 'kemi', 'leo', 'mary', 'mike', 'mo', 'ngozi', 'paul', 'sam', 'sara',
+    'segun', 'tobi', 'tolu', 'uche', 'victor', 'zainab',
+]
+LAST = [
+    'adams', 'bello', 'brown', 'cole', 'davies', 'eze', 'james', 'johnson', 'kalu', 'lee', 'martins',
+    'musa', 'nwosu', 'obi', 'okafor', 'ola', 'smith', 'taylor', 'uzo', 'west', 'williams', 'young',
+]
+SEPARATORS = ['', '', '_', '.']
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the username typeahead index on synthetic usernames: build time, memory, "
+        "lookup latency percentiles and incremental update cost."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=20000)
+        parser.add_argument('--updates', type=int, default=1000)
+        parser.add_argument('--verify', type=int, default=200,
+                            help="Check this many lookups against a brute-force ranking")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def usernames(self, count, rng):
+        seen = set()
+        while len(seen) < count:
+            name = f"{rng.choice(FIRST)}{rng.choice(SEPARATORS)}{rng.choice(LAST)}{rng.randrange(100000)}"
+            if rng.random() < 0.1:
+                name = name.capitalize()
+            if name not in seen:
+                seen.add(name)
+                yield name
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        rows = [
+            (user_id, username, int(rng.paretovariate(1.2)) - 1)  # Heavy-tailed follower counts
+            for user_id, username in enumerate(self.usernames(options['users'], rng), start=1)
+        ]
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        index = PrefixIndex(rows)
+        build_seconds = time.perf_counter() - started
+        rss_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+        self.stdout.write(
+            f"Built index of {len(index)} users in {build_seconds:.2f}s "
+            f"({len(index.cache)} cached prefixes, ~{rss_mb:.0f} MB peak growth)"
+        )
+
+        # Prefixes people actually type: the first 1-8 characters of real usernames
+        queries = []
+        for _ in range(options['queries']):
+            username = rows[rng.randrange(len(rows))][1]
+            queries.append(username[:rng.randint(1, min(8, len(username)))])
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.suggest(query)
+            timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        p99 = timings[int(len(timings) * 0.99)]
+        self.stdout.write(
+            f"Lookups: p50 {statistics.median(timings):.1f} us, p99 {p99:.1f} us, max {timings[-1]:.1f} us"
+        )
+
+        mismatches = 0
+        for query in queries[:options['verify']]:
+            key = query.lower()
+            expected = sorted(
+                (-count, username.lower(), user_id) for user_id, username, count in rows
+                if username.lower().startswith(key)
+            )[:MAX_RESULTS]
+            got = index.suggest(query)
+            # The exact-match promotion reorders the head; compare as sets of user ids
+            if {row[2] for row in expected} != {row[0] for row in got} and not any(
+                username.lower() == key for _, username, _ in got
+            ):
+                mismatches += 1
+        self.stdout.write(f"Verified {min(options['verify'], len(queries))} lookups: {mismatches} mismatches")
+
+        next_id = len(rows) + 1
+        adds, removes = [], []
+        for username in self.usernames(options['updates'], random.Random(options['seed'] + 1)):
+            started = time.perf_counter()
+            index.add(next_id, f"new_{username}", rng.randrange(1000))
+            adds.append((time.perf_counter() - started) * 1e6)
+            victim = rows[rng.randrange(len(rows))][0]
+            started = time.perf_counter()
+            index.remove(victim)
+            removes.append((time.perf_counter() - started) * 1e6)
+            next_id += 1
+        self.stdout.write(
+            f"Updates: add p50 {statistics.median(adds):.0f} us, remove p50 {statistics.median(removes):.0f} us, "
+            f"remove max {max(removes):.0f} us"
+        )
+
+        verdict = self.style.SUCCESS("PASS") if p99 < 1000 else self.style.ERROR("FAIL")
+        self.stdout.write(f"{verdict}: p99 lookup {p99:.1f} us (target < 1000 us)")
@@ -0,0 +1,81 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.template import Context, Template
+
+from socials.models import LikePost, Post
+from socials.querysets import with_viewer_state
+
+LEGACY_TEMPLATE = Template(
+    "{% load socials_extras %}{% for post in posts %}{{ post.id|isin:liked_post_ids }}{% endfor %}"
+)
+ANNOTATED_TEMPLATE = Template(
+    "{% for post in posts %}{{ post.is_liked }}{{ post.is_saved }}{% endfor %}"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark rendering liked state for one feed page as the viewer's like "
+        "history grows: the old full-history `isin` filter vs per-page EXISTS annotations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000,300000',
+                            help="Comma-separated like-history sizes to measure")
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--keep', action='store_true', help="Keep the generated users and posts")
+
+    def measure(self, render, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        page_size = options['page_size']
+        prefix = f"bench_{int(time.time())}"
+        author = User.objects.create(username=f"{prefix}_author")
+        viewer = User.objects.create(username=f"{prefix}_viewer")
+
+        self.stdout.write(f"{'likes':>10} {'legacy ms':>12} {'annotated ms':>14}")
+        liked = 0
+        try:
+            for size in sizes:
+                # Grow the viewer's history: one liked post per like
+                while liked < size:
+                    batch = min(5000, size - liked)
+                    posts = Post.objects.bulk_create([
+                        Post(user=author, caption=f"bench {liked + i}") for i in range(batch)
+                    ])
+                    LikePost.objects.bulk_create([LikePost(post_id=post, username=viewer) for post in posts])
+                    liked += batch
+
+                page = Post.objects.filter(user=author).order_by('-created_at', '-id')
+
+                def legacy():
+                    liked_post_ids = LikePost.objects.filter(username=viewer).values_list('post_id', flat=True)
+                    LEGACY_TEMPLATE.render(Context({
+                        'posts': list(page[:page_size]),
+                        'liked_post_ids': liked_post_ids,
+                    }))
+
+                def annotated():
+                    ANNOTATED_TEMPLATE.render(Context({
+                        'posts': list(with_viewer_state(page, viewer)[:page_size]),
+                    }))
+
+                self.stdout.write(
+                    f"{size:>10} {self.measure(legacy, options['repeat']):>12.2f} "
+                    f"{self.measure(annotated, options['repeat']):>14.2f}"
+                )
+        finally:
+            if not options['keep']:
+                Post.objects.filter(user=author).delete()
+                User.objects.filter(username__startswith=prefix).delete()
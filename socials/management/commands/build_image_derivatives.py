@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import CharField
+from django.db.models.functions import Cast
+
+from socials import images, media
+from socials.models import Post, Profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Render and upload resized derivatives for image posts and profile pictures "
+        "that have none yet (uploaded before the derivative pipeline existed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=['posts', 'profiles', 'all'], default='all')
+        parser.add_argument('--limit', type=int, default=None, help="Stop after this many images")
+
+    def build(self, url, name, folder, variants):
+        path = media.download(url)
+        try:
+            derivatives, _ = media.make_derivatives(path, name, folder, variants)
+            return {variant: entry for variant, entry in derivatives.items() if entry}
+        finally:
+            media.discard(path)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        limit = options['limit']
+        done = failed = 0
+
+        if options['kind'] in ('posts', 'all'):
+            # Shared blobs get theirs from the upload jobs (see media.ensure_derivatives)
+            posts = Post.objects.filter(
+                media_type='image', media_status='ready', media_derivatives={}, media_blob=None,
+            ).exclude(media=None)
+            for post in posts.only('id', 'media').iterator():
+                if limit is not None and done + failed >= limit:
+                    break
+                try:
+                    derivatives = self.build(post.media.url, post.media.name, media.FOLDER, images.POST_VARIANTS)
+                except Exception as e:
+                    self.stderr.write(f"Post {post.id}: {str(e)}")
+                    derivatives = {}
+                if derivatives:
+                    Post.objects.filter(pk=post.pk).update(media_derivatives=derivatives)
+                    done += 1
+                else:
+                    failed += 1
+
+        if options['kind'] in ('profiles', 'all'):
+            built = {}  # Most profiles still share the default picture; render it once
+            field = Profile._meta.get_field('profilepic')
+            # The stored string, so the update below only lands if the picture is unchanged
+            rows = (
+                Profile.objects.filter(profilepic_derivatives={}, profilepic_blob=None)
+                .annotate(raw=Cast('profilepic', CharField()))
+                .values_list('id', 'raw')
+            )
+            for profile_id, value in rows.iterator():
+                if limit is not None and done + failed >= limit:
+                    break
+                if not value:
+                    continue
+                try:
+                    if value not in built:
+                        picture = field.to_python(value)
+                        built[value] = self.build(picture.url, picture.name,
+                                                  'profile_pics', images.PROFILE_VARIANTS)
+                    derivatives = built[value]
+                except Exception as e:
+                    self.stderr.write(f"Profile {profile_id}: {str(e)}")
+                    derivatives = {}
+                if derivatives:
+                    Profile.objects.filter(pk=profile_id, profilepic=value).update(profilepic_derivatives=derivatives)
+                    done += 1
+                else:
+                    failed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Built derivatives for {done} images ({failed} failed) in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from socials import images, media, neardup
+from socials.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute perceptual hashes for image posts that have none yet (uploaded before "
+        "near-duplicate detection existed), then build the near-duplicate index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help="Stop after this many posts")
+        parser.add_argument('--batch-size', type=int, default=images.WORKERS * 4,
+                            help="Images downloaded and hashed on the process pool at a time")
+
+    def hash_batch(self, batch, hashed):
+        """Hash the distinct media in ``batch`` [(post_id, media)], then store every post's hash."""
+        paths = {}
+        for _, picture in batch:
+            value = picture.get_prep_value()
+            if value in hashed or value in paths:
+                continue
+            try:
+                paths[value] = media.download(picture.url)
+            except Exception as e:
+                self.stderr.write(f"{picture}: {str(e)}")
+                hashed[value] = None
+        try:
+            pool = images.get_pool()
+            futures = {value: pool.submit(images.phash, path) for value, path in paths.items()}
+            for value, future in futures.items():
+                try:
+                    hashed[value] = future.result(timeout=images.RENDER_TIMEOUT)
+                except Exception as e:
+                    self.stderr.write(f"{value}: {str(e)}")
+                    hashed[value] = None
+        finally:
+            for path in paths.values():
+                media.discard(path)
+
+        done = 0
+        for post_id, picture in batch:
+            phash = hashed[picture.get_prep_value()]
+            if phash is not None:
+                Post.objects.filter(pk=post_id, media_phash=None).update(media_phash=neardup.to_signed(phash))
+                done += 1
+        return done
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        limit = options['limit']
+        hashed = {}  # Stored media value -> hash; reposts of one upload share their media
+        done = seen = 0
+        posts = Post.objects.filter(
+            media_type='image', media_status='ready', media_phash=None,
+        ).exclude(media=None).values_list('id', 'media')
+
+        batch = []
+        for row in posts.iterator():
+            if limit is not None and seen >= limit:
+                break
+            seen += 1
+            batch.append(row)
+            if len(batch) >= options['batch_size']:
+                done += self.hash_batch(batch, hashed)
+                batch = []
+        if batch:
+            done += self.hash_batch(batch, hashed)
+        self.stdout.write(
+            f"Hashed {done} image posts ({seen - done} failed) in {time.perf_counter() - started:.1f}s"
+        )
+
+        started = time.perf_counter()
+        index = neardup.HammingIndex.from_db()
+        self.stdout.write(self.style.SUCCESS(
+            f"Built near-duplicate index of {len(index)} hashes in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Build the follow graph and precompute friends-of-friends suggestions for every user."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Only this user id (repeatable)")
+        parser.add_argument('--batch-size', type=int, default=500, help="Users per write transaction")
+        parser.add_argument('--schedule', action='store_true',
+                            help="Queue the self-rescheduling daily job instead of running now")
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            from socials.suggestions import schedule_refresh
+            schedule_refresh()
+            self.stdout.write(self.style.SUCCESS("Daily suggestion refresh scheduled"))
+            return
+
+        try:
+            from socials.graph import FollowGraph, describe, precompute_suggestions
+        except ImportError as e:
+            raise CommandError(f"Suggestions need NumPy: {str(e)}")
+
+        started = time.perf_counter()
+        graph = FollowGraph.from_db()
+        self.stdout.write(f"Loaded graph in {time.perf_counter() - started:.2f}s: {describe(graph)}")
+
+        started = time.perf_counter()
+        done = precompute_suggestions(graph, user_ids=options['user_ids'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Suggestions for {done} users in {elapsed:.2f}s ({done / max(elapsed, 1e-9):.0f} users/s)"
+        ))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from socials import counters
+
+
+class Command(BaseCommand):
+    help = "Apply buffered like/comment counter deltas to Post in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running, flushing every N seconds (default: flush once)")
+        parser.add_argument('--batch-size', type=int, default=counters.FLUSH_BATCH_SIZE,
+                            help="Posts per UPDATE statement")
+
+    def handle(self, *args, **options):
+        if not counters.is_enabled():
+            raise CommandError("COUNTER_BUFFER_BACKEND is not configured")
+
+        while True:
+            started = time.perf_counter()
+            rows = counters.flush(batch_size=options['batch_size'])
+            if rows or not options['interval']:
+                self.stdout.write(f"Flushed counters for {rows} posts in {time.perf_counter() - started:.3f}s")
+            if not options['interval']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
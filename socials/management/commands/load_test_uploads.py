@@ -0,0 +1,126 @@
+import io
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client
+from PIL import Image
+
+from socials import jobs, storage
+from socials.models import Post
+
+OFFLINE_BACKENDS = ('local', 'memory')
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the media upload path end to end: concurrent POST /upload requests, then the "
+        "ingest jobs (spool, storage, derivatives, hashes). Run with MEDIA_STORAGE=local (or "
+        "memory) to keep it off the network; reports request latency and storage metrics."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uploads', type=int, default=100)
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent uploading clients")
+        parser.add_argument('--workers', type=int, default=2, help="Job worker threads draining the ingest queue")
+        parser.add_argument('--size', type=int, default=1600, help="Width of the generated photos in pixels")
+        parser.add_argument('--remote', action='store_true',
+                            help="Allow a networked MEDIA_STORAGE (cloudinary, supabase)")
+        parser.add_argument('--keep', action='store_true', help="Keep the generated users and posts")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def photo(self, rng, width):
+        """A distinct noisy JPEG, so content dedupe does not short-circuit the upload."""
+        height = width * 3 // 4
+        image = Image.effect_noise((width // 8, height // 8), 64).convert('RGB').resize((width, height))
+        tint = Image.new('RGB', (width, height), tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        Image.blend(image, tint, 0.5).save(buffer, 'JPEG', quality=85)
+        return buffer.getvalue()
+
+    def handle(self, *args, **options):
+        backend = storage.DEFAULT_BACKEND
+        if backend not in OFFLINE_BACKENDS and not options['remote']:
+            raise CommandError(f"MEDIA_STORAGE is '{backend}'; set it to 'local' or 'memory', or pass --remote")
+
+        rng = random.Random(options['seed'])
+        photos = [self.photo(rng, options['size']) for _ in range(options['uploads'])]
+        self.stdout.write(
+            f"Generated {len(photos)} photos, median {statistics.median(map(len, photos)) / 1024:.0f} KB; "
+            f"storing to '{backend}'"
+        )
+
+        prefix = f"loadtest_{int(time.time())}_"
+        users = [
+            User.objects.create_user(f"{prefix}{i}", password=None) for i in range(options['threads'])
+        ]
+        clients = []
+        for user in users:  # Serially: logins write last_login and the search index
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(user)
+            clients.append(client)
+        storage.reset_stats()
+        latencies = []
+        errors = []
+
+        def client_loop(index):
+            client = clients[index]
+            try:
+                for n in range(index, len(photos), len(users)):
+                    upload = SimpleUploadedFile(f"photo{n}.jpg", photos[n], content_type='image/jpeg')
+                    started = time.perf_counter()
+                    response = client.post('/upload', {'caption': f"load test {n}", 'image_upload': upload})
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code != 302:
+                        errors.append(f"upload {n}: HTTP {response.status_code}")
+            except Exception as e:
+                errors.append(str(e))
+            finally:
+                close_old_connections()
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(users)) as pool:
+            list(pool.map(client_loop, range(len(users))))
+        requests_elapsed = time.perf_counter() - started
+        latencies.sort()
+        self.stdout.write(
+            f"Requests: {len(latencies)} in {requests_elapsed:.2f}s ({len(latencies) / requests_elapsed:.1f}/s), "
+            f"p50 {statistics.median(latencies) * 1000:.0f} ms, "
+            f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.0f} ms, "
+            f"{len(errors)} errors"
+        )
+
+        started = time.perf_counter()
+        worker = jobs.Worker(threads=options['workers'])
+        while worker.run_once():
+            pass
+        ingest_elapsed = time.perf_counter() - started
+        posts = Post.objects.filter(user__in=users)
+        statuses = {status: posts.filter(media_status=status).count() for status in ('pending', 'ready', 'failed')}
+        self.stdout.write(
+            f"Ingest: {statuses['ready']} ready, {statuses['pending']} pending, {statuses['failed']} failed "
+            f"in {ingest_elapsed:.2f}s ({statuses['ready'] / ingest_elapsed:.1f} posts/s)"
+        )
+
+        for name, operations in storage.stats()['backends'].items():
+            for operation, entry in operations.items():
+                self.stdout.write(
+                    f"  {name} {operation}: {entry['calls']} calls, {entry['errors']} errors, "
+                    f"{entry['bytes'] / 1024 / 1024:.1f} MB, p50 {entry['p50_ms']} ms, p99 {entry['p99_ms']} ms"
+                )
+        for error in errors[:5]:
+            self.stderr.write(error)
+
+        if not options['keep']:
+            posts.delete()
+            User.objects.filter(username__startswith=prefix).delete()
+
+        ok = not errors and statuses['ready'] == len(photos)
+        verdict = self.style.SUCCESS("PASS") if ok else self.style.ERROR("FAIL")
+        self.stdout.write(f"{verdict}: {statuses['ready']}/{len(photos)} uploads ingested")
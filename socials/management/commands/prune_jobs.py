@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from socials import jobs
+
+
+class Command(BaseCommand):
+    help = "Delete finished background jobs past their retention, in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=jobs.PRUNE_BATCH_SIZE)
+        parser.add_argument('--schedule', action='store_true',
+                            help="Queue the self-rescheduling daily prune job instead of pruning now")
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            jobs.schedule_prune()
+            self.stdout.write(self.style.SUCCESS("Daily job prune scheduled"))
+            return
+
+        for status, days in jobs.RETENTION_DAYS.items():
+            self.stdout.write(f"  {status:<10} {'keep forever' if days is None else f'{days} days'}")
+
+        pruned = jobs.prune_finished(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} jobs"))
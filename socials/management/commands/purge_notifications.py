@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from socials import retention
+
+
+class Command(BaseCommand):
+    help = "Delete notifications past their per-type retention, in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=retention.BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to sleep between batches")
+        parser.add_argument('--archive-dir', default=retention.ARCHIVE_DIR,
+                            help="Append purged rows to monthly .jsonl.gz files here first")
+        parser.add_argument('--dry-run', action='store_true', help="Only count expired rows")
+        parser.add_argument('--schedule', action='store_true',
+                            help="Queue the self-rescheduling daily purge job instead of purging now")
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            retention.schedule_purge()
+            self.stdout.write(self.style.SUCCESS("Daily notification purge scheduled"))
+            return
+
+        for notification_type, days in retention.RETENTION_DAYS.items():
+            self.stdout.write(f"  {notification_type:<10} {'keep forever' if days is None else f'{days} days'}")
+
+        purged = retention.purge_expired(
+            batch_size=options['batch_size'],
+            archive_dir=options['archive_dir'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+        )
+        verb = "Would purge" if options['dry_run'] else "Purged"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {purged} notifications"))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from socials.search import get_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild every search document and the full-text index from the Profile and Post tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per bulk insert")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users, posts = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {users} users and {posts} posts with {type(get_backend()).__name__} "
+            f"in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,38 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from socials import timeline
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized home timelines from Follow and Post."
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help="Only rebuild these users (default: everyone)")
+        parser.add_argument('--length', type=int, default=timeline.MAX_LENGTH,
+                            help="Posts to keep per timeline")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Users loaded per batch")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        total_users = 0
+        total_entries = 0
+        last_id = 0
+        while True:
+            # Walk users by primary key so memory stays flat on large tables
+            batch = list(users.filter(id__gt=last_id).values_list('id', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            for user_id in batch:
+                total_entries += timeline.rebuild_timeline(user_id, length=options['length'])
+            total_users += len(batch)
+            last_id = batch[-1]
+            self.stdout.write(f"Rebuilt {total_users} timelines ({total_entries} entries)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {total_users} timelines, {total_entries} entries"
+        ))
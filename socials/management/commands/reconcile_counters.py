@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from socials.notifications import recount_unread_notifications
+from socials.profiles import recount_profile_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized Profile counters from their source tables and fix any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Only this user id (repeatable)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it")
+        parser.add_argument('--verbose-drift', action='store_true', help="List every drifted value")
+
+    def handle(self, *args, **options):
+        drift = recount_profile_counters(
+            options['user_ids'], batch_size=options['batch_size'], dry_run=options['dry_run']
+        )
+        verb = "found" if options['dry_run'] else "fixed"
+        for field, rows in drift.items():
+            self.stdout.write(f"{field}: {verb} {len(rows)} drifted profiles")
+            if options['verbose_drift']:
+                for user_id, stored, actual in rows:
+                    self.stdout.write(f"  user {user_id}: {stored} -> {actual}")
+
+        if not options['dry_run']:
+            fixed = recount_unread_notifications(options['user_ids'], batch_size=options['batch_size'])
+            self.stdout.write(f"unread_notifications: fixed {fixed} drifted profiles")
+        self.stdout.write(self.style.SUCCESS("Done"))
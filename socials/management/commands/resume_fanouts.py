@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from socials.fanout import CHUNK_SIZE, STALE_AFTER, run_fanout
+from socials.models import NotificationFanout
+
+
+class Command(BaseCommand):
+    help = "Resume new-post notification fan-outs that failed or were interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=STALE_AFTER // 60,
+                            help="Treat 'running'/'pending' fan-outs untouched this long as interrupted")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        stale_before = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        fanouts = NotificationFanout.objects.filter(
+            Q(status='failed') | Q(status__in=['pending', 'running'], updated_at__lt=stale_before)
+        ).order_by('created_at').values_list('pk', flat=True)
+
+        resumed = 0
+        for fanout_id in fanouts:
+            try:
+                sent = run_fanout(
+                    fanout_id, chunk_size=options['chunk_size'], stale_after=options['stale_minutes'] * 60,
+                )
+                if sent is None:
+                    self.stdout.write(f"Fan-out {fanout_id}: finished or picked up by another runner")
+                    continue
+                self.stdout.write(f"Fan-out {fanout_id}: sent {sent} more notifications")
+                resumed += 1
+            except Exception as e:
+                self.stderr.write(f"Fan-out {fanout_id} failed again: {str(e)}")
+
+        self.stdout.write(self.style.SUCCESS(f"Resumed {resumed} fan-outs"))
@@ -0,0 +1,40 @@
+import json
+import signal
+
+from django.core.management.base import BaseCommand
+
+from socials import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (emails, notifications, timeline fan-out)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help="Jobs run concurrently")
+        parser.add_argument('--poll-interval', type=float, default=jobs.POLL_INTERVAL,
+                            help="Seconds to wait when the queue is empty")
+        parser.add_argument('--once', action='store_true', help="Drain due jobs and exit")
+        parser.add_argument('--stats', action='store_true', help="Print queue metrics and exit")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(jobs.queue_metrics(), indent=2))
+            return
+
+        worker = jobs.Worker(threads=options['threads'], poll_interval=options['poll_interval'])
+
+        if options['once']:
+            total = 0
+            while True:
+                ran = worker.run_once()
+                if not ran:
+                    break
+                total += ran
+            self.stdout.write(self.style.SUCCESS(f"Ran {total} jobs"))
+            return
+
+        # Finish in-flight jobs on SIGTERM/SIGINT instead of abandoning them mid-run
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        signal.signal(signal.SIGINT, lambda *_: worker.stop())
+        self.stdout.write(f"Job worker {worker.worker_id} started with {options['threads']} threads")
+        worker.run_forever()
@@ -0,0 +1,73 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+
+from socials import counters
+from socials.likes import toggle_like
+from socials.models import LikePost, Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent like toggles at one hot post and check that "
+        "Post.no_of_likes equals the LikePost row count afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help="Distinct users toggling")
+        parser.add_argument('--toggles', type=int, default=1000, help="Total toggle calls")
+        parser.add_argument('--threads', type=int, default=16, help="Concurrent worker threads")
+        parser.add_argument('--keep', action='store_true', help="Keep the generated users and post")
+
+    def handle(self, *args, **options):
+        prefix = f"stress_{int(time.time())}_"
+        User.objects.bulk_create([
+            User(username=f"{prefix}{i}") for i in range(options['users'])
+        ])
+        users = list(User.objects.filter(username__startswith=prefix))
+        post = Post.objects.create(user=users[0], caption="stress test post")
+
+        errors = []
+
+        def worker(user):
+            try:
+                for attempt in range(5):
+                    try:
+                        return toggle_like(post, user)
+                    except OperationalError as exc:
+                        # SQLite serializes writers; back off and retry on "database is locked"
+                        if 'locked' not in str(exc):
+                            raise
+                        time.sleep(0.01 * (attempt + 1))
+                raise OperationalError("database stayed locked")
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(worker, (random.choice(users) for _ in range(options['toggles']))))
+        elapsed = time.perf_counter() - started
+
+        counters.flush()  # No-op unless write-behind counters are enabled
+        post.refresh_from_db()
+        rows = LikePost.objects.filter(post_id=post).count()
+        self.stdout.write(
+            f"{options['toggles']} toggles by {len(users)} users on {options['threads']} threads "
+            f"in {elapsed:.2f}s ({len(errors)} errors)"
+        )
+        self.stdout.write(f"no_of_likes={post.no_of_likes} LikePost rows={rows}")
+
+        if not options['keep']:
+            post.delete()
+            User.objects.filter(username__startswith=prefix).delete()
+
+        if post.no_of_likes != rows:
+            raise CommandError("Counter drifted from the LikePost row count")
+        self.stdout.write(self.style.SUCCESS("Counter matches LikePost rows"))
@@ -0,0 +1,411 @@
+# media.py
+"""
+Post media ingestion, off the request path.
+
+Pushing a photo or video to Cloudinary takes seconds, so ``upload`` no longer
+does it inside the request. The view spools the file to ``MEDIA_SPOOL_DIR``
+and creates the post with ``media_status='pending'``; a ``media.ingest`` job
+then uploads the spooled file, fills in ``Post.media`` and removes the spool
+copy. Until then the post card renders a placeholder, which open pages swap
+for the real media when the ``media`` push arrives.
+
+The spool must be readable by whichever process runs jobs: local disk is
+enough for the in-process workers, a shared volume is needed when
+``manage.py run_jobs`` runs on another host.
+
+Image uploads also get resized derivatives (images.py), rendered on the
+process pool after the original is live and stored as URLs in
+``Post.media_derivatives`` / ``Profile.profilepic_derivatives``.
+
+Uploads are deduplicated by content: each remote object is a MediaBlob keyed
+by the SHA-256 of its bytes (hashed while Django reads the request, see
+uploadhandlers.py). A repost, meme or re-uploaded avatar points at the
+existing object and its derivatives instead of being uploaded again. Blobs
+are reference counted by the Post/Profile delete signals and collected,
+remote objects included, BLOB_GC_DELAY after the last reference goes.
+
+Objects are written to the ``MEDIA_STORAGE`` backend (storage.py) and
+deleted from whichever backend holds them.
+"""
+import hashlib
+import logging
+import os
+import uuid
+
+import httpx
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.move import file_move_safe
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import images, neardup, realtime, storage
+from .jobs import enqueue, task
+from .models import Job, MediaBlob, Post, Profile
+
+logger = logging.getLogger(__name__)
+
+SPOOL_DIR = str(getattr(settings, 'MEDIA_SPOOL_DIR', os.path.join(settings.BASE_DIR, 'spool')))
+INGEST_ATTEMPTS = getattr(settings, 'MEDIA_INGEST_ATTEMPTS', 5)
+BLOB_GC_DELAY = getattr(settings, 'MEDIA_BLOB_GC_DELAY', 60 * 60)  # Seconds an unreferenced blob is kept
+FOLDER = 'post_media'  # Same folder as the MediaField on Post
+
+
+# ----------------------------
+#  Spool
+# ----------------------------
+def spool(upload, move=True):
+    """
+    Keep an uploaded file in the spool until its job runs; returns the path.
+    Large uploads Django already wrote to a temp file are moved, not copied,
+    unless ``move`` is False because the caller still needs ``upload``.
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    ext = os.path.splitext(upload.name)[1].lower()
+    path = os.path.join(SPOOL_DIR, f"{uuid.uuid4().hex}{ext}")
+    if move and hasattr(upload, 'temporary_file_path'):
+        file_move_safe(upload.temporary_file_path(), path, allow_overwrite=True)
+    else:
+        with open(path, 'wb') as out:
+            for chunk in upload.chunks():
+                out.write(chunk)
+    return path
+
+
+def download(url, timeout=60):
+    """Stream a remote original (an image uploaded before this pipeline) into the spool."""
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    ext = os.path.splitext(url.split('?')[0])[1].lower()[:8]
+    path = os.path.join(SPOOL_DIR, f"{uuid.uuid4().hex}{ext}")
+    try:
+        with httpx.stream('GET', url, timeout=timeout, follow_redirects=True) as response:
+            response.raise_for_status()
+            with open(path, 'wb') as out:
+                for chunk in response.iter_bytes():
+                    out.write(chunk)
+    except Exception:
+        discard(path)
+        raise
+    return path
+
+
+def discard(path):
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# ----------------------------
+#  Shared blobs
+# ----------------------------
+def content_hash(upload):
+    """
+    SHA-256 of an uploaded file. The hashing upload handlers compute it while
+    Django reads the request body; anything else is hashed here in one pass.
+    """
+    if not getattr(upload, 'sha256', None):
+        digest = hashlib.sha256()
+        for chunk in upload.chunks():
+            digest.update(chunk)
+        upload.sha256 = digest.hexdigest()
+    return upload.sha256
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_blob(sha256):
+    return MediaBlob.objects.filter(sha256=sha256).first()
+
+
+def acquire(blob):
+    """Take a reference to ``blob``; False if it was collected in the meantime."""
+    return bool(MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1))
+
+
+def release(blob_id):
+    """Drop a reference; the blob is collected BLOB_GC_DELAY after its last one goes."""
+    MediaBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') - 1)
+    schedule_collect(blob_id)
+
+
+def schedule_collect(blob_id):
+    enqueue('media.collect_blob', {'blob_id': blob_id}, delay=BLOB_GC_DELAY)
+
+
+def store_blob(sha256, size, resource, media_type):
+    """
+    Record a freshly uploaded object as the blob for ``sha256``. Returns
+    (blob, created); if a concurrent upload of the same bytes got there
+    first, its blob is returned and the caller should drop its own copy.
+    """
+    try:
+        with transaction.atomic():
+            blob = MediaBlob.objects.create(
+                sha256=sha256, size=size, resource=resource.get_prep_value(), media_type=media_type,
+            )
+    except IntegrityError:
+        return MediaBlob.objects.get(sha256=sha256), False
+    # Collected unless something takes a reference first (covers a worker dying right here)
+    schedule_collect(blob.pk)
+    return blob, True
+
+
+def destroy(*values):
+    """Delete remote objects, logging rather than raising: an orphan only costs storage."""
+    for value in values:
+        stored = storage.resolve(value)
+        try:
+            storage.delete(stored)
+        except Exception as e:
+            logger.warning(f"Could not delete remote media {stored}: {str(e)}")
+
+
+@task('media.collect_blob')
+def collect_blob(blob_id):
+    blob = MediaBlob.objects.filter(pk=blob_id, ref_count__lte=0).first()
+    if blob is None:
+        return  # Gone already, or referenced again
+    references = (
+        Post.objects.filter(media_blob_id=blob_id).count()
+        + Profile.objects.filter(profilepic_blob_id=blob_id).count()
+    )
+    if references:
+        logger.warning(f"Media blob {blob_id} has {references} references but ref_count {blob.ref_count}; repairing")
+        MediaBlob.objects.filter(pk=blob_id).update(ref_count=references)
+        return
+    # Conditional delete: an upload may have acquired it since the read above
+    if MediaBlob.objects.filter(pk=blob_id, ref_count__lte=0).delete()[0]:
+        logger.info(f"Collected media blob {blob.sha256[:12]} ({blob.size} bytes)")
+        destroy(blob.resource, *blob.derivative_resources)
+
+
+# ----------------------------
+#  Derivatives
+# ----------------------------
+def make_derivatives(path, filename, folder, variants):
+    """
+    Render ``variants`` of the image at ``path`` on the process pool and
+    upload them. Returns ({variant: {width, height, webp, jpeg}}, resources)
+    with URLs and the stored values of the uploaded objects. A variant that
+    cannot be rendered maps to None, so it is not attempted again; ({}, [])
+    means the upload failed and may be retried.
+    """
+    try:
+        rendered = images.render_in_pool(path, variants)
+    except Exception as e:
+        logger.warning(f"Could not render derivatives of {filename}: {str(e)}")
+        rendered = {}
+
+    stem = os.path.splitext(os.path.basename(filename))[0] or 'image'
+    backend = storage.get_storage()
+    derivatives = {name: None for name in variants}
+    resources = []
+    try:
+        for name, encoded in rendered.items():
+            entry = {'width': encoded['width'], 'height': encoded['height']}
+            for fmt in images.FORMATS:
+                resource = backend.save(
+                    ContentFile(encoded[fmt], name=f"{stem}_{name}.{fmt}"), folder, resource_type='image'
+                )
+                resources.append(resource.get_prep_value())
+                entry[fmt] = resource.url
+            derivatives[name] = entry
+    except Exception as e:
+        logger.warning(f"Could not upload derivatives of {filename}: {str(e)}")
+        destroy(*resources)
+        return {}, []
+    return derivatives, resources
+
+
+def derivatives_for(blob, variants):
+    """The rendered subset of ``blob``'s derivatives a Post or Profile shows."""
+    return {name: blob.derivatives[name] for name in variants if blob.derivatives.get(name)}
+
+
+def ensure_derivatives(blob, path, filename, folder, variants):
+    """
+    Render whichever ``variants`` ``blob`` has not got yet from the original
+    at ``path``, then copy its derivatives to every Post and Profile sharing it.
+    """
+    missing = [name for name in variants if name not in blob.derivatives]
+    if missing:
+        rendered, resources = make_derivatives(path, filename, folder, missing)
+        with transaction.atomic():
+            locked = MediaBlob.objects.select_for_update().filter(pk=blob.pk).first()
+            if locked is None:
+                destroy(*resources)  # Collected while we rendered
+                return
+            locked.derivatives = {**rendered, **locked.derivatives}
+            locked.derivative_resources = locked.derivative_resources + resources
+            locked.save(update_fields=['derivatives', 'derivative_resources'])
+        blob = locked
+    Post.objects.filter(media_blob=blob).update(media_derivatives=derivatives_for(blob, images.POST_VARIANTS))
+    Profile.objects.filter(profilepic_blob=blob).update(
+        profilepic_derivatives=derivatives_for(blob, images.PROFILE_VARIANTS)
+    )
+
+
+# ----------------------------
+#  Profile pictures
+# ----------------------------
+def prepare_profile_picture(upload):
+    """
+    Take a reference to the blob holding ``upload``'s bytes, uploading them
+    first if they are new. Runs before the transaction that saves the
+    profile, so no transaction waits on storage; pass the blob to
+    assign_profile_picture() inside it, or to release() if it rolls back
+    (an upload nobody ends up using is then collected like any other blob).
+    """
+    sha256 = content_hash(upload)
+    blob = find_blob(sha256)
+    if blob is not None and acquire(blob):
+        return blob
+    resource = Profile._meta.get_field('profilepic').upload(upload)
+    blob, created = store_blob(sha256, upload.size, resource, 'image')
+    if not created and blob.resource != resource.get_prep_value():
+        destroy(resource)  # Lost the race to an identical upload; use its copy
+    if not acquire(blob):
+        raise RuntimeError(f"Media blob {blob.pk} was collected while uploading a profile picture")
+    return blob
+
+
+def assign_profile_picture(profile, blob, upload):
+    """
+    Point ``profile`` at ``blob`` (from prepare_profile_picture) inside the
+    transaction that saves it. Its previous picture is released, and
+    derivatives queued, once that transaction commits.
+    """
+    previous = profile.profilepic_blob_id
+    profile.profilepic = blob.resource
+    profile.profilepic_blob = blob
+    profile.profilepic_derivatives = derivatives_for(blob, images.PROFILE_VARIANTS)
+    if previous:
+        # The same picture again still drops one reference: prepare took a new one
+        transaction.on_commit(lambda: release(previous))
+
+    if any(name not in blob.derivatives for name in images.PROFILE_VARIANTS):
+        def queue_derivatives():
+            enqueue('media.profile_derivatives', {
+                'profile_id': profile.pk,
+                'profilepic': blob.resource,
+                'path': spool(upload, move=False),
+                'filename': upload.name,
+            })
+
+        transaction.on_commit(queue_derivatives)
+
+
+@task('media.profile_derivatives')
+def profile_derivatives(profile_id, profilepic, path, filename):
+    profile = Profile.objects.filter(pk=profile_id, profilepic=profilepic).select_related('profilepic_blob').first()
+    # Skipped if the picture changed since; the newer upload has its own job
+    if profile is not None and profile.profilepic_blob is not None and os.path.exists(path):
+        ensure_derivatives(profile.profilepic_blob, path, filename, 'profile_pics', images.PROFILE_VARIANTS)
+    discard(path)
+
+
+# ----------------------------
+#  Ingestion
+# ----------------------------
+def ingest_key(post_id):
+    return f"media:{post_id}"
+
+
+def schedule_ingest(post, path, filename, sha256=None):
+    """Queue the upload of ``post``'s spooled media; call inside the post's transaction."""
+    enqueue(
+        'media.ingest',
+        {'post_id': str(post.pk), 'path': path, 'filename': filename, 'sha256': sha256},
+        key=ingest_key(post.pk),
+        max_attempts=INGEST_ATTEMPTS,
+    )
+
+
+def push_media(post):
+    realtime.push(realtime.post_group(post.pk), 'media', {
+        'post_id': str(post.pk),
+        'media_status': post.media_status,
+        'media_type': post.media_type,
+        'url': post.media.url if post.media else '',
+    })
+
+
+def _last_attempt(post_id):
+    attempts = Job.objects.filter(idempotency_key=ingest_key(post_id)).values_list(
+        'attempts', 'max_attempts'
+    ).first()
+    return attempts is None or attempts[0] >= attempts[1]
+
+
+def _fail(post, path, reason):
+    logger.error(f"Media for post {post.pk} could not be ingested: {reason}")
+    if Post.objects.filter(pk=post.pk, media_status='pending').update(media_status='failed'):
+        post.media_status = 'failed'
+        push_media(post)
+    discard(path)
+
+
+@task('media.ingest')
+def ingest(post_id, path, filename, sha256=None):
+    post = Post.objects.filter(pk=post_id).only('id', 'media', 'media_type', 'media_status').first()
+    if post is None or post.media_status != 'pending':
+        discard(path)  # Post deleted, or a retry of a job that already finished
+        return
+    if not os.path.exists(path):
+        return _fail(post, path, f"spooled file {path} is missing")
+
+    # Same bytes as an earlier upload: point at that object instead of uploading again
+    sha256 = sha256 or file_hash(path)
+    blob = find_blob(sha256)
+    if blob is None:
+        try:
+            with open(path, 'rb') as f:
+                resource = storage.get_storage().save(
+                    File(f, name=filename), FOLDER, resource_type=post.media_type or 'auto'
+                )
+        except Exception as e:
+            if _last_attempt(post_id):
+                _fail(post, path, str(e))
+            raise
+        blob, created = store_blob(sha256, os.path.getsize(path), resource, post.media_type)
+        if not created and blob.resource != resource.get_prep_value():
+            destroy(resource)
+
+    phash = None
+    if post.media_type == 'image':
+        try:
+            phash = images.phash_in_pool(path)
+        except Exception as e:
+            logger.warning(f"Could not hash the image of post {post_id}: {str(e)}")
+
+    with transaction.atomic():
+        if not acquire(blob):
+            raise RuntimeError(f"Media blob {blob.pk} was collected during ingestion")  # Retried
+        # Conditional update: the post may have been deleted while we uploaded
+        updated = Post.objects.filter(pk=post_id, media_status='pending').update(
+            media=blob.resource, media_blob=blob, media_status='ready',
+            media_derivatives=derivatives_for(blob, images.POST_VARIANTS),
+            media_phash=None if phash is None else neardup.to_signed(phash),
+        )
+        if not updated:
+            logger.info(f"Post {post_id} went away during its media upload")
+            release(blob.pk)
+        elif phash is not None:
+            neardup.post_hashed(post.pk, phash)
+
+    if updated:
+        post.media, post.media_status = blob.resource, 'ready'
+        push_media(post)
+        if post.media_type == 'image':
+            ensure_derivatives(blob, path, filename, FOLDER, images.POST_VARIANTS)
+    discard(path)
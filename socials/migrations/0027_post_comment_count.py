@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 16:59
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_count(apps, schema_editor):
+    Post = apps.get_model('socials', 'Post')
+    Comment = apps.get_model('socials', 'Comment')
+    counts = Comment.objects.filter(post_id=OuterRef('pk')).order_by().values('post_id').annotate(n=Count('id')).values('n')
+    Post.objects.update(comment_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socials', '0026_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_comment_count, migrations.RunPython.noop),
+    ]
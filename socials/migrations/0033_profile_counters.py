@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 17:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_profile_counters(apps, schema_editor):
+    Profile = apps.get_model('socials', 'Profile')
+    Post = apps.get_model('socials', 'Post')
+    Follow = apps.get_model('socials', 'Follow')
+
+    def count(model, field):
+        return Coalesce(Subquery(
+            model.objects.filter(**{field: OuterRef('user_id')})
+            .order_by().values(field).annotate(n=Count('pk')).values('n')
+        ), 0)
+
+    Profile.objects.update(
+        post_count=count(Post, 'user_id'),
+        follower_count=count(Follow, 'following_id'),
+        following_count=count(Follow, 'follower_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socials', '0032_notification_retention_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='follower_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='post_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_profile_counters, migrations.RunPython.noop),
+    ]
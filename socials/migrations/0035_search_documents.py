@@ -0,0 +1,82 @@
+# Generated by Django 5.2 on 2026-10-18 17:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+FTS_TABLE = 'socials_search_fts'
+
+
+def create_search_index(apps, schema_editor):
+    """Vendor-specific full-text structures over socials_searchdocument (see socials/search.py)."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "ALTER TABLE socials_searchdocument ADD COLUMN vector tsvector GENERATED ALWAYS AS "
+            "(setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')) STORED"
+        )
+        schema_editor.execute("CREATE INDEX socials_searchdocument_vector_idx ON socials_searchdocument USING GIN (vector)")
+        schema_editor.execute(
+            "CREATE INDEX socials_searchdocument_title_trgm_idx ON socials_searchdocument USING GIN (title gin_trgm_ops)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    # On Postgres the column and indexes go with the table
+
+
+def backfill_search_documents(apps, schema_editor):
+    Profile = apps.get_model('socials', 'Profile')
+    Post = apps.get_model('socials', 'Post')
+    SearchDocument = apps.get_model('socials', 'SearchDocument')
+
+    documents = []
+    for profile in Profile.objects.select_related('user').iterator(chunk_size=1000):
+        body = ' '.join(filter(None, [profile.occupation, profile.works_at, profile.location, profile.bio]))
+        documents.append(SearchDocument(
+            key=f"user:{profile.user_id}", kind='user', user_id=profile.user_id,
+            title=profile.user.username, body=body,
+        ))
+    for post_id, user_id, caption in Post.objects.values_list('id', 'user_id', 'caption').iterator(chunk_size=1000):
+        documents.append(SearchDocument(
+            key=f"post:{post_id}", kind='post', user_id=user_id, post_id=post_id, body=caption or '',
+        ))
+    SearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, body) SELECT id, title, body FROM socials_searchdocument"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socials', '0034_suggestions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=60, unique=True)),
+                ('kind', models.CharField(choices=[('user', 'User'), ('post', 'Post')], max_length=10)),
+                ('title', models.CharField(blank=True, max_length=150)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('post', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='socials.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 17:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socials', '0035_search_documents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('hashtag', 'Hashtag'), ('mention', 'Mention')], max_length=10)),
+                ('tag', models.CharField(max_length=150)),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to='socials.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'tag', '-created_at', '-post'], name='socials_pos_kind_18cb7c_idx')],
+                'unique_together': {('post', 'kind', 'tag')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socials', '0037_post_media_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='media_derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='profilepic_derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 17:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socials', '0038_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('resource', models.CharField(max_length=255)),
+                ('media_type', models.CharField(blank=True, default='', max_length=10)),
+                ('derivatives', models.JSONField(blank=True, default=dict)),
+                ('derivative_resources', models.JSONField(blank=True, default=list)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='media_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='socials.mediablob'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='profilepic_blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='socials.mediablob'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socials', '0039_media_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='media_phash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
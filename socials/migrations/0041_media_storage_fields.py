@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 17:53
+
+import socials.models
+import socials.storage
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socials', '0040_post_media_phash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='media',
+            field=socials.storage.MediaField(blank=True, folder='post_media', null=True, validators=[socials.models.validate_media_file], verbose_name='media'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='cover_photo',
+            field=socials.storage.MediaField(blank=True, folder='cover_photos', null=True, resource_type='image', verbose_name='cover_photo'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='profilepic',
+            field=socials.storage.MediaField(default='https://res.cloudinary.com/dou9magab/image/upload/v1756479692/user2_pd3xii.jpg', folder='profile_pics', resource_type='image', verbose_name='profilepic'),
+        ),
+    ]
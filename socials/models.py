@@ -1,10 +1,11 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 import uuid
 import os
-from cloudinary.models import CloudinaryField
 from django.utils import timezone
+from .storage import MediaField
 
 class OTP(models.Model):
     email = models.EmailField(unique=True)
@@ -24,22 +25,58 @@ class Profile(models.Model):
     works_at = models.CharField(max_length=100, blank=True)
     occupation = models.CharField(max_length=100, blank=True)
     bio = models.TextField(blank=True) 
-    profilepic = CloudinaryField('profilepic', folder='profile_pics', default='https://res.cloudinary.com/dou9magab/image/upload/v1756479692/user2_pd3xii.jpg')
-    cover_photo = CloudinaryField('cover_photo', folder='cover_photos', blank=True, null=True)
+    profilepic = MediaField('profilepic', folder='profile_pics', resource_type='image', default='https://res.cloudinary.com/dou9magab/image/upload/v1756479692/user2_pd3xii.jpg')
+    # Resized copies of profilepic, {variant: {width, height, webp, jpeg}} (see socials/images.py)
+    profilepic_derivatives = models.JSONField(default=dict, blank=True)
+    # Shared, reference-counted copy of profilepic's bytes (see socials/media.py)
+    profilepic_blob = models.ForeignKey('MediaBlob', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    cover_photo = MediaField('cover_photo', folder='cover_photos', resource_type='image', blank=True, null=True)
     location = models.CharField(max_length=100, blank=True)
     saved_posts = models.ManyToManyField('Post', blank=True, related_name='saved_by')
+    unread_notifications = models.IntegerField(default=0)  # Maintained by socials.notifications
+    # Maintained by the Post/Follow signals below; see socials.profiles for repair
+    post_count = models.IntegerField(default=0)
+    follower_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+
+    # Denormalized counters only ever change through F() updates; a plain
+    # save() of a stale instance must not write them back
+    COUNTER_FIELDS = ('unread_notifications', 'post_count', 'follower_count', 'following_count')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-follower_count']),  # Popular accounts, for suggestion fallback
+        ]
 
     def __str__(self):
         return str(self.user.id)
 
+    def save(self, *args, **kwargs):
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv']
+
+
+def media_type_for(name):
+    """'image' or 'video' from a file name's extension, '' if it is neither"""
+    ext = os.path.splitext(name or '')[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return 'image'
+    if ext in VIDEO_EXTENSIONS:
+        return 'video'
+    return ''
+
 
 def validate_media_file(value):
     """Validate that the uploaded file is an image or video"""
-    valid_image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
-    valid_video_extensions = ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv']
-    
-    ext = os.path.splitext(value.name)[1].lower()
-    if ext not in valid_image_extensions + valid_video_extensions:
+    if not media_type_for(value.name):
         raise ValidationError('Only image and video files are allowed.')
 
 class Post(models.Model):
@@ -47,14 +84,26 @@ class Post(models.Model):
         ('image', 'Image'),
         ('video', 'Video'),
     ]
+    MEDIA_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     caption = models.TextField()
-    media = CloudinaryField('media', folder='post_media', validators=[validate_media_file], null=True, blank=True)
+    media = MediaField('media', folder='post_media', validators=[validate_media_file], null=True, blank=True)
     media_type = models.CharField(max_length=10, choices=MEDIA_TYPE_CHOICES, blank=True, default="")
+    # 'pending' while a media.ingest job uploads the spooled file (see media.py)
+    media_status = models.CharField(max_length=10, choices=MEDIA_STATUS_CHOICES, default='ready')
+    media_derivatives = models.JSONField(default=dict, blank=True)  # Resized copies of image media
+    media_blob = models.ForeignKey('MediaBlob', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # 64-bit perceptual hash of image media, stored as a signed bigint (see neardup.py)
+    media_phash = models.BigIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)  # Add index for ordering
     no_of_likes = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)  # Denormalized, kept in sync by Comment signals
 
     class Meta:
         ordering = ['-created_at']  # Default ordering
@@ -68,24 +117,41 @@ class Post(models.Model):
         """Automatically determine media type based on file extension"""
         if self.media:
             # Try to get file extension robustly
-            ext = None
+            name = None
             if hasattr(self.media, 'name') and self.media.name:
-                ext = os.path.splitext(self.media.name)[1].lower()
+                name = self.media.name
             elif hasattr(self.media, 'url') and self.media.url:
-                ext = os.path.splitext(self.media.url)[1].lower()
-            elif hasattr(self.media, 'public_id') and self.media.public_id:
-                ext = os.path.splitext(str(self.media.public_id))[1].lower()
-            image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
-            video_extensions = ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv']
-            if ext in image_extensions:
-                self.media_type = 'image'
-            elif ext in video_extensions:
-                self.media_type = 'video'
+                name = self.media.url
+            self.media_type = media_type_for(name) or self.media_type
         super().save(*args, **kwargs)
 
+        # Hashtags and @mentions are parsed once here, not on every read
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'caption' in update_fields:
+            from .tags import sync_post_tags
+            sync_post_tags(self)
+
     def __str__(self):
         return str(self.user.id)
 
+class MediaBlob(models.Model):
+    """
+    One uploaded object, shared by every Post and Profile whose upload had
+    the same bytes. ``ref_count`` is how many rows point at it; when it drops
+    to zero a media.collect_blob job deletes the row and the remote objects.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    resource = models.CharField(max_length=255)  # MediaField value, e.g. "image/upload/v1/post_media/x.jpg"
+    media_type = models.CharField(max_length=10, blank=True, default="")
+    derivatives = models.JSONField(default=dict, blank=True)  # Union of the variants rendered so far
+    derivative_resources = models.JSONField(default=list, blank=True)  # Removed along with the blob
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
 class LikePost(models.Model):
     post_id = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
     username = models.ForeignKey(User, on_delete=models.CASCADE, related_name='liked_by')
@@ -101,6 +167,27 @@ class LikePost(models.Model):
     def __str__(self):
         return self.username
 
+class PostTag(models.Model):
+    """A hashtag or @mention in a post's caption, maintained by Post.save (see socials.tags)."""
+    KIND_CHOICES = [
+        ('hashtag', 'Hashtag'),
+        ('mention', 'Mention'),
+    ]
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='tags')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    tag = models.CharField(max_length=150)  # Lowercased, without the leading # or @
+    created_at = models.DateTimeField()  # Copy of post.created_at so tag feeds never sort on the Post table
+
+    class Meta:
+        unique_together = ('post', 'kind', 'tag')
+        indexes = [
+            models.Index(fields=['kind', 'tag', '-created_at', '-post']),  # Tag feed range scan
+        ]
+
+    def __str__(self):
+        return f"{'#' if self.kind == 'hashtag' else '@'}{self.tag} on {self.post_id}"
+
 class Comment(models.Model):
     post_id = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     username = models.ForeignKey(User, on_delete=models.CASCADE, related_name='commented_by')
@@ -135,7 +222,7 @@ class Follow(models.Model):
 
 
 # Signal to automatically create profile when user is created
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 @receiver(post_save, sender=User)
@@ -145,15 +232,120 @@ def create_user_profile(sender, instance, created, **kwargs):
         Profile.objects.get_or_create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Save the profile when user is saved"""
+def save_user_profile(sender, instance, update_fields=None, **kwargs):
+    """Save the profile when user is saved (logins only save last_login)"""
     if hasattr(instance, 'profile'):
-        instance.profile.save()
+        if update_fields is None or 'username' in update_fields:
+            instance.profile.save()
     else:
         # Create profile if it doesn't exist
         Profile.objects.get_or_create(user=instance)
 
+@receiver(post_save, sender=User)
+def index_username(sender, instance, update_fields=None, **kwargs):
+    """Keep the username typeahead current (logins only save last_login)"""
+    if update_fields is None or 'username' in update_fields:
+        from .typeahead import user_saved
+        user_saved(instance)
+
+@receiver(post_delete, sender=User)
+def unindex_username(sender, instance, **kwargs):
+    """Drop deleted users from the username typeahead"""
+    from .typeahead import user_deleted
+    user_deleted(instance.pk)
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    """Keep Post.comment_count in step with new comments"""
+    if created:
+        from .counters import add_delta
+        add_delta(instance.post_id_id, 'comment_count', 1)
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    """Keep Post.comment_count in step with deleted comments"""
+    from .counters import add_delta
+    add_delta(instance.post_id_id, 'comment_count', -1)
+
+@receiver(post_save, sender=Profile)
+def index_profile(sender, instance, update_fields=None, **kwargs):
+    """Keep the user's search document current (User saves re-save the profile)"""
+    from .search import PROFILE_TEXT_FIELDS, index_user
+    if update_fields is None or set(update_fields) & set(PROFILE_TEXT_FIELDS):
+        index_user(instance.user, instance)
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    """Keep the post's search document current when its caption may have changed"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or 'caption' in update_fields:
+        from .search import index_post as index
+        index(instance)
+
+def adjust_profile_counter(user_id, field, delta):
+    Profile.objects.filter(user_id=user_id).update(**{field: models.F(field) + delta})
+
+@receiver(post_save, sender=Post)
+def increment_post_count(sender, instance, created, **kwargs):
+    """Keep Profile.post_count in step with new posts"""
+    if created:
+        adjust_profile_counter(instance.user_id, 'post_count', 1)
+
+@receiver(post_delete, sender=Post)
+def decrement_post_count(sender, instance, **kwargs):
+    """Keep Profile.post_count in step with deleted posts"""
+    adjust_profile_counter(instance.user_id, 'post_count', -1)
+
+@receiver(post_delete, sender=Post)
+def release_post_media(sender, instance, **kwargs):
+    """Drop the post's reference to its shared media; the last one removes it"""
+    if instance.media_blob_id:
+        from .media import release
+        release(instance.media_blob_id)
+
+@receiver(post_delete, sender=Post)
+def unindex_post_image(sender, instance, **kwargs):
+    """Stop offering the post as a near-duplicate"""
+    if instance.media_phash is not None:
+        from .neardup import post_deleted
+        post_deleted(instance.pk)
+
+@receiver(post_delete, sender=Profile)
+def release_profile_picture(sender, instance, **kwargs):
+    """Drop the profile's reference to its shared picture"""
+    if instance.profilepic_blob_id:
+        from .media import release
+        release(instance.profilepic_blob_id)
+
+@receiver(post_save, sender=Follow)
+def increment_follow_counts(sender, instance, created, **kwargs):
+    """Keep follower/following counts in step with new follows"""
+    if created:
+        from .sidebar import invalidate
+        adjust_profile_counter(instance.follower_id, 'following_count', 1)
+        adjust_profile_counter(instance.following_id, 'follower_count', 1)
+        invalidate(instance.follower_id)  # Suggestions skip followed accounts
+
+@receiver(post_delete, sender=Follow)
+def decrement_follow_counts(sender, instance, **kwargs):
+    """Keep follower/following counts in step with unfollows"""
+    from .sidebar import invalidate
+    from .timeline import follower_removed
+    adjust_profile_counter(instance.follower_id, 'following_count', -1)
+    adjust_profile_counter(instance.following_id, 'follower_count', -1)
+    invalidate(instance.follower_id)
+    follower_removed(instance.following_id)  # May bring a read-merged author back to fan-out
+
 class Notification(models.Model):
+    """
+    One sidebar entry, aggregated at write time.
+
+    Actions of the same type on the same post (or profile, for follows)
+    within ``GROUP_WINDOW`` seconds coalesce into one row: ``sender`` is the
+    latest actor, ``actor_count`` how many distinct actors there were, and
+    ``sample_actor_ids`` the most recent few. ``group_key`` identifies the
+    (recipient, type, post, time bucket) a row collects.
+    """
     NOTIFICATION_TYPES = [
         ('like', 'Like'),
         ('unlike', 'Unlike'),
@@ -162,6 +354,9 @@ class Notification(models.Model):
         ('unfollow', 'Unfollow'),
         ('post', 'New Post'),
     ]
+    GROUP_WINDOW = getattr(settings, 'NOTIFICATION_GROUP_WINDOW', 24 * 60 * 60)  # seconds
+    UNBUCKETED_TYPES = ('post',)  # One per (recipient, post), however late the fan-out runs
+    SAMPLE_SIZE = 3
     
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_notifications')
@@ -170,11 +365,161 @@ class Notification(models.Model):
     comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)  # Latest actor joined the group
+    group_key = models.CharField(max_length=120, unique=True, null=True, blank=True)
+    actor_count = models.PositiveIntegerField(default=1)
+    sample_actor_ids = models.JSONField(default=list, blank=True)
     
     class Meta:
-        ordering = ['-created_at']
-        # Prevent duplicate notifications for the same action
-        unique_together = ['recipient', 'sender', 'notification_type', 'post']
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['recipient', '-updated_at']),  # Sidebar
+            models.Index(fields=['recipient', 'is_read', '-updated_at']),  # Mark all read, unread lists
+            models.Index(fields=['notification_type', 'updated_at']),  # Retention purge (see retention.py)
+        ]
     
     def __str__(self):
-        return f"{self.sender.username} -> {self.recipient.username}: {self.notification_type}"
\ No newline at end of file
+        return f"{self.sender.username} -> {self.recipient.username}: {self.notification_type} x{self.actor_count}"
+
+    @property
+    def other_actor_count(self):
+        return max(0, self.actor_count - 1)
+
+    @classmethod
+    def make_group_key(cls, recipient_id, notification_type, post_id=None, when=None):
+        """Key of the group an action at ``when`` (default now) belongs to."""
+        if notification_type in cls.UNBUCKETED_TYPES:
+            bucket = ''
+        else:
+            when = when or timezone.now()
+            bucket = int(when.timestamp()) // cls.GROUP_WINDOW
+        return f"{recipient_id}:{notification_type}:{post_id or '-'}:{bucket}"
+
+class Suggestion(models.Model):
+    """A precomputed "people you may know" entry (see socials.graph)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='suggestions')
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name='suggested_to')
+    score = models.FloatField()
+    mutual_count = models.IntegerField(default=0)  # Followed by this many people the user follows
+    follows_you = models.BooleanField(default=False)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'suggested')
+        indexes = [
+            models.Index(fields=['user', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.suggested_id} for {self.user_id} ({self.score:.2f})"
+
+class SearchDocument(models.Model):
+    """
+    Searchable text for one user (username + profile fields) or one post
+    (caption). The full-text index over these rows is owned by the
+    socials.search backend: an FTS5 table on SQLite, a tsvector column on
+    Postgres.
+    """
+    KIND_CHOICES = [
+        ('user', 'User'),
+        ('post', 'Post'),
+    ]
+
+    key = models.CharField(max_length=60, unique=True)  # "user:<id>" or "post:<uuid>"
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')  # The user, or the post's author
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, null=True, blank=True, related_name='search_document')
+    title = models.CharField(max_length=150, blank=True)  # Username; ranked above body matches
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.key
+
+@receiver(post_delete, sender=SearchDocument)
+def unindex_document(sender, instance, **kwargs):
+    """Drop the document from the full-text index (also runs on user/post cascades)"""
+    from .search import get_backend
+    get_backend().remove([instance.pk])
+
+class TimelineEntry(models.Model):
+    """A post materialized into a follower's home timeline (fan-out-on-write)."""
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    created_at = models.DateTimeField()  # Copy of post.created_at so reads never touch the Post table
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ('owner', 'post')  # A post appears once per timeline
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post']),  # Range scan per reader
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} in timeline of {self.owner_id}"
+
+
+class NotificationFanout(models.Model):
+    """Checkpoint for notifying an author's followers about a new post."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='notification_fanout')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+    last_follower_id = models.BigIntegerField(default=0)  # Followers are walked in id order
+    sent_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Fan-out of {self.post_id}: {self.status} ({self.sent_count} sent)"
+
+
+class Job(models.Model):
+    """A queued side effect (email, notification, fan-out) run by socials.jobs workers."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)  # Registered task name
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)  # Not before; pushed back on retry
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at']),  # Worker claim scan
+            models.Index(fields=['status', 'finished_at']),  # Metrics and pruning (jobs.prune_finished)
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class CounterFlush(models.Model):
+    """
+    A drained write-behind counter hash (see counters.RedisCounterBuffer)
+    whose deltas are applied to Post. Written in the same transaction as
+    the UPDATEs, so a hash is applied at most once however its flush ends.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    applied_at = models.DateTimeField(auto_now_add=True, db_index=True)  # Pruned a day later
+
+    def __str__(self):
+        return self.key
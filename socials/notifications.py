@@ -0,0 +1,214 @@
+# notifications.py
+"""
+Helpers that create Notification rows for user actions.
+
+Actions are aggregated as they are written: a like from 42 people on one
+post within the grouping window is one row ("alice and 41 others liked
+your post"), not 42. See ``Notification`` for the grouping key.
+
+Views call the ``create_*_notification`` helpers, which only enqueue a job;
+the row is written by ``write_notification`` on a job worker so requests
+never wait on notification writes, then pushed to the recipient's open tabs
+(see realtime.py).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .fanout import schedule_post_fanout
+from .jobs import enqueue, task
+from .models import Notification, Profile
+from .realtime import push_notification
+from .sidebar import invalidate as invalidate_sidebar
+
+
+# Notification Helper Functions
+def create_notification(recipient, sender, notification_type, post=None, comment=None):
+    """Queue a notification; repeats from the same actor fold into one group."""
+    # Users or user IDs are accepted, so callers holding only post.user_id skip a query
+    recipient_id = getattr(recipient, 'pk', recipient)
+    sender_id = getattr(sender, 'pk', sender)
+    if recipient_id == sender_id:
+        return  # Don't notify users about their own actions
+
+    enqueue('notifications.create', {
+        'recipient_id': recipient_id,
+        'sender_id': sender_id,
+        'notification_type': notification_type,
+        'post_id': str(post.pk) if post else None,
+        'comment_id': comment.pk if comment else None,
+        'occurred_at': timezone.now().isoformat(),  # Bucket by action time, not job run time
+    })
+
+@task('notifications.create')
+def write_notification(recipient_id, sender_id, notification_type, post_id=None, comment_id=None, occurred_at=None):
+    """
+    Fold a queued action into its notification group, creating the group if needed.
+
+    Distinct actors are counted once per group as long as they are still in
+    the recent-actor sample; a repeat from an actor who has dropped out of
+    the sample (e.g. unlike/like again much later in a busy window) counts again.
+    """
+    when = parse_datetime(occurred_at) if occurred_at else timezone.now()
+    key = Notification.make_group_key(recipient_id, notification_type, post_id, when)
+
+    try:
+        with transaction.atomic():
+            group = _fold_into_group(key, recipient_id, sender_id, notification_type, post_id, comment_id, when)
+    except IntegrityError:
+        # The post, comment or a user was deleted while the job was queued
+        return
+    invalidate_sidebar(recipient_id)
+    push_notification(group)
+
+def _fold_into_group(key, recipient_id, sender_id, notification_type, post_id, comment_id, when):
+    group = Notification.objects.select_for_update().filter(group_key=key).first()
+    if group is None:
+        try:
+            with transaction.atomic():
+                notification = Notification.objects.create(
+                    recipient_id=recipient_id,
+                    sender_id=sender_id,
+                    notification_type=notification_type,
+                    post_id=post_id,
+                    comment_id=comment_id,
+                    group_key=key,
+                    updated_at=when,
+                    sample_actor_ids=[sender_id],
+                )
+                adjust_unread(recipient_id, 1)
+                return notification
+        except IntegrityError:
+            # A concurrent writer opened the group first
+            group = Notification.objects.select_for_update().filter(group_key=key).first()
+            if group is None:
+                raise
+
+    sample = [actor for actor in group.sample_actor_ids if actor != sender_id]
+    if len(sample) == len(group.sample_actor_ids):
+        group.actor_count += 1  # New actor for this group
+    group.sample_actor_ids = [sender_id] + sample[:Notification.SAMPLE_SIZE - 1]
+    group.sender_id = sender_id
+    group.comment_id = comment_id or group.comment_id
+    group.updated_at = max(group.updated_at, when)
+    if group.is_read:
+        group.is_read = False  # New activity on a group the user had already seen
+        adjust_unread(recipient_id, 1)
+    group.save(update_fields=['actor_count', 'sample_actor_ids', 'sender', 'comment', 'updated_at', 'is_read'])
+    return group
+
+
+# ----------------------------
+#  Unread counter
+# ----------------------------
+# Profile.unread_notifications moves by exactly the number of rows each
+# statement flips, in the same transaction, so the badge never needs a
+# COUNT(*) over the notifications table.
+def adjust_unread(user_id, delta):
+    Profile.objects.filter(user_id=user_id).update(
+        unread_notifications=F('unread_notifications') + delta
+    )
+
+def unread_notification_count(user):
+    """Badge count for ``user``; reads Profile only."""
+    count = Profile.objects.filter(user=user).values_list('unread_notifications', flat=True).first()
+    return max(0, count or 0)
+
+def mark_notifications_read(user, notification_id=None):
+    """Mark one or all of ``user``'s notifications read in one UPDATE. Returns rows changed."""
+    unread = Notification.objects.filter(recipient=user, is_read=False)
+    if notification_id is not None:
+        unread = unread.filter(pk=notification_id)
+    with transaction.atomic():
+        marked = unread.update(is_read=True)
+        if marked:
+            adjust_unread(user.pk, -marked)
+            invalidate_sidebar(user.pk)
+    return marked
+
+def delete_notifications(queryset):
+    """Delete notifications, taking unread ones off their recipients' counters. Returns rows deleted."""
+    with transaction.atomic():
+        rows = list(queryset.select_for_update().values_list('pk', 'recipient_id', 'is_read'))
+        if not rows:
+            return 0
+        Notification.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+        unread = {}
+        for _, recipient_id, is_read in rows:
+            if not is_read:
+                unread[recipient_id] = unread.get(recipient_id, 0) + 1
+        for recipient_id, n in unread.items():
+            adjust_unread(recipient_id, -n)
+        invalidate_sidebar(*{recipient_id for _, recipient_id, _ in rows})
+    return len(rows)
+
+def recount_unread_notifications(user_ids=None, batch_size=1000):
+    """Rebuild counters from the notifications table to repair drift. Returns profiles fixed."""
+    profiles = Profile.objects.order_by('user_id')
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    fixed = 0
+    last_id = 0
+    while True:
+        batch = dict(profiles.filter(user_id__gt=last_id).values_list('user_id', 'unread_notifications')[:batch_size])
+        if not batch:
+            return fixed
+        actual = dict(
+            Notification.objects.filter(recipient_id__in=batch, is_read=False)
+            .values_list('recipient_id').annotate(n=Count('id')).order_by()
+        )
+        for user_id, stored in batch.items():
+            if actual.get(user_id, 0) != stored:
+                Profile.objects.filter(user_id=user_id).update(unread_notifications=actual.get(user_id, 0))
+                fixed += 1
+        last_id = max(batch)
+
+def create_post_notification(post):
+    """Create notification when a new post is created - notify followers."""
+    # Chunked bulk inserts with a resumable checkpoint, run after the response
+    schedule_post_fanout(post)
+
+def create_like_notification(post, user):
+    """Create notification when someone likes a post."""
+    create_notification(
+        recipient=post.user_id,
+        sender=user,
+        notification_type='like',
+        post=post
+    )
+
+def create_unlike_notification(post, user):
+    """Create notification when someone unlikes a post."""
+    create_notification(
+        recipient=post.user_id,
+        sender=user,
+        notification_type='unlike',
+        post=post
+    )
+
+def create_comment_notification(post, user, comment):
+    """Create notification when someone comments on a post."""
+    create_notification(
+        recipient=post.user_id,
+        sender=user,
+        notification_type='comment',
+        post=post,
+        comment=comment
+    )
+
+def create_follow_notification(following_user, follower_user):
+    """Create notification when someone follows a user."""
+    create_notification(
+        recipient=following_user,
+        sender=follower_user,
+        notification_type='follow'
+    )
+
+def create_unfollow_notification(following_user, follower_user):
+    """Create notification when someone unfollows a user."""
+    create_notification(
+        recipient=following_user,
+        sender=follower_user,
+        notification_type='unfollow'
+    )
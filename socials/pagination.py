@@ -0,0 +1,74 @@
+# pagination.py
+"""
+Keyset (cursor) pagination over (created_at, id).
+
+Every page is a bounded index seek: "rows strictly older than the last row
+of the previous page", so page 500 costs the same as page 1, unlike OFFSET.
+Cursors are opaque url-safe strings so clients never build them by hand.
+"""
+import base64
+import binascii
+import uuid
+from datetime import datetime
+
+from django.db.models import Q
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+
+def encode_cursor(created_at, pk):
+    """Encode the sort key of the last row on a page."""
+    raw = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, pk_type=uuid.UUID):
+    """Decode a cursor into (created_at, pk); return None if it is missing or invalid."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        created_at, pk = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), pk_type(pk)
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def keyset_before(cursor, time_field='created_at', id_field='id', inclusive=False):
+    """Q filter for rows strictly after ``cursor`` in (-time, -id) order."""
+    created_at, pk = cursor
+    id_lookup = f'{id_field}__lte' if inclusive else f'{id_field}__lt'
+    return Q(**{f'{time_field}__lt': created_at}) | Q(**{time_field: created_at, id_lookup: pk})
+
+
+def clamp_page_size(value, default=PAGE_SIZE):
+    """Parse a client-supplied page size, keeping it within MAX_PAGE_SIZE."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_page(queryset, cursor=None, limit=PAGE_SIZE, time_field='created_at', id_field='id'):
+    """
+    Return one page of ``queryset`` newest first.
+
+    Returns:
+        (rows, next_cursor): next_cursor is None on the last page
+    """
+    if cursor is not None:
+        queryset = queryset.filter(keyset_before(cursor, time_field, id_field))
+    # Fetch one extra row to learn whether another page exists
+    rows = list(queryset.order_by(f'-{time_field}', f'-{id_field}')[:limit + 1])
+    return page_from_rows(rows, limit, time_field, id_field)
+
+
+def page_from_rows(rows, limit, time_field='created_at', id_field='id'):
+    """Split ``limit + 1`` fetched rows into (page, next_cursor)."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, time_field), getattr(last, id_field))
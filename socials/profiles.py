@@ -0,0 +1,59 @@
+# profiles.py
+"""
+Denormalized Profile counters: ``post_count``, ``follower_count`` and
+``following_count``.
+
+They are kept current by the Post and Follow signals in models.py, which run
+in the same transaction as the row they count. ``recount_profile_counters``
+recomputes them from the source tables in batches (``manage.py
+reconcile_counters``) to repair drift from raw SQL, bulk operations that
+skip signals, or restores.
+"""
+from django.db.models import Count
+
+from .models import Follow, Post, Profile
+
+PROFILE_COUNTERS = {
+    # counter field: (model, field grouped on)
+    'post_count': (Post, 'user_id'),
+    'follower_count': (Follow, 'following_id'),
+    'following_count': (Follow, 'follower_id'),
+}
+
+
+def recount_profile_counters(user_ids=None, batch_size=1000, dry_run=False):
+    """
+    Recompute the counters for every profile (or ``user_ids``).
+
+    Returns ``{field: [(user_id, stored, actual), ...]}`` for every drifted
+    value; with ``dry_run`` nothing is written.
+    """
+    profiles = Profile.objects.order_by('user_id')
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    drift = {field: [] for field in PROFILE_COUNTERS}
+    last_id = 0
+
+    while True:
+        batch = list(profiles.filter(user_id__gt=last_id).values('user_id', *PROFILE_COUNTERS)[:batch_size])
+        if not batch:
+            return drift
+        last_id = batch[-1]['user_id']
+        ids = [row['user_id'] for row in batch]
+
+        actual = {}
+        for field, (model, group_field) in PROFILE_COUNTERS.items():
+            actual[field] = dict(
+                model.objects.filter(**{f"{group_field}__in": ids})
+                .values_list(group_field).annotate(n=Count('pk')).order_by()
+            )
+
+        for row in batch:
+            changes = {}
+            for field in PROFILE_COUNTERS:
+                value = actual[field].get(row['user_id'], 0)
+                if value != row[field]:
+                    drift[field].append((row['user_id'], row[field], value))
+                    changes[field] = value
+            if changes and not dry_run:
+                Profile.objects.filter(user_id=row['user_id']).update(**changes)
@@ -0,0 +1,28 @@
+# querysets.py
+"""
+Per-viewer state for post lists.
+
+``with_viewer_state`` adds ``is_liked`` and ``is_saved`` booleans to a Post
+queryset as correlated ``EXISTS`` subqueries. Each one is a probe on the
+(post, user) index for the rows actually on the page, so the cost does not
+depend on how many posts the viewer has liked or saved overall.
+"""
+from django.db.models import Exists, OuterRef, Value
+
+from .models import LikePost, Profile
+
+
+def viewer_state_annotations(user):
+    """Annotation kwargs for ``Post.objects.annotate(**...)``."""
+    if user is None or not user.is_authenticated:
+        return {'is_liked': Value(False), 'is_saved': Value(False)}
+    saved_through = Profile.saved_posts.through
+    return {
+        'is_liked': Exists(LikePost.objects.filter(post_id=OuterRef('pk'), username=user)),
+        'is_saved': Exists(saved_through.objects.filter(post_id=OuterRef('pk'), profile__user=user)),
+    }
+
+
+def with_viewer_state(queryset, user):
+    """Annotate a Post queryset with ``is_liked`` / ``is_saved`` for ``user``."""
+    return queryset.annotate(**viewer_state_annotations(user))
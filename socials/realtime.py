@@ -0,0 +1,59 @@
+# realtime.py
+"""
+Server-side pushes to connected WebSocket clients (see consumers.py).
+
+Every browser tab joins ``user_<id>`` for its own notifications and
+``post_<id>`` for each post card on screen. Helpers here send to those
+groups after the surrounding transaction commits and never raise: a push
+is a nicety, and failing to deliver it must not fail the request or job.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.template.loader import render_to_string
+
+logger = logging.getLogger(__name__)
+
+
+def user_group(user_id):
+    return f"user_{user_id}"
+
+
+def post_group(post_id):
+    return f"post_{post_id}"
+
+
+def _send(group, message):
+    layer = get_channel_layer()
+    if layer is None:
+        return  # CHANNEL_LAYERS not configured (plain WSGI deploy)
+    try:
+        async_to_sync(layer.group_send)(group, message)
+    except Exception as e:
+        logger.warning(f"Realtime push to {group} failed: {str(e)}")
+
+
+def push(group, event, data):
+    """Send ``{"event": event, **data}`` to ``group`` once the transaction commits."""
+    message = {'type': 'push', 'event': event, 'data': data}
+    transaction.on_commit(lambda: _send(group, message))
+
+
+def push_notification(notification):
+    """Push a newly written Notification to its recipient's open tabs."""
+    html = render_to_string('components/notification_item.html', {'notification': notification})
+    push(user_group(notification.recipient_id), 'notification', {
+        'id': notification.pk,
+        'notification_type': notification.notification_type,
+        'html': html,
+    })
+
+
+def push_like_count(post_id, like_count):
+    push(post_group(post_id), 'like_count', {'post_id': str(post_id), 'like_count': like_count})
+
+
+def push_comment(post_id, comment_data):
+    push(post_group(post_id), 'comment', {'post_id': str(post_id), 'comment': comment_data})
@@ -0,0 +1,123 @@
+# retention.py
+"""
+Notification retention.
+
+Each notification type has a time-to-live measured from its last activity
+(``updated_at``); see ``NOTIFICATION_RETENTION_DAYS``. ``purge_expired``
+deletes expired rows in small primary-key batches, each in its own short
+transaction, so the table is never locked for long and unread counters stay
+right (rows go through ``delete_notifications``).
+
+With ``NOTIFICATION_ARCHIVE_DIR`` set, rows are appended to one gzipped
+JSON-lines file per month of ``created_at`` before they are deleted.
+
+The purge runs as a daily job that reschedules itself
+(``manage.py purge_notifications --schedule`` starts it), or by hand.
+"""
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .jobs import enqueue, task
+from .models import Notification
+from .notifications import delete_notifications
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = {
+    'post': 30,       # Fan-out makes these the bulk of the table
+    'like': 90,
+    'unlike': 14,
+    'comment': 180,
+    'follow': 180,
+    'unfollow': 14,
+}
+RETENTION_DAYS = {**DEFAULT_RETENTION_DAYS, **getattr(settings, 'NOTIFICATION_RETENTION_DAYS', {})}
+BATCH_SIZE = getattr(settings, 'NOTIFICATION_PURGE_BATCH_SIZE', 1000)
+ARCHIVE_DIR = getattr(settings, 'NOTIFICATION_ARCHIVE_DIR', None)
+PURGE_INTERVAL = 24 * 60 * 60  # seconds between scheduled purges
+
+ARCHIVE_FIELDS = (
+    'id', 'recipient_id', 'sender_id', 'notification_type', 'post_id', 'comment_id',
+    'is_read', 'actor_count', 'sample_actor_ids', 'created_at', 'updated_at',
+)
+
+
+def expired_filter(now=None, policy=None):
+    """Q matching notifications past their type's TTL. Types without a TTL never expire."""
+    now = now or timezone.now()
+    policy = RETENTION_DAYS if policy is None else policy
+    condition = Q(pk__in=[])
+    for notification_type, days in policy.items():
+        if days is None:
+            continue
+        condition |= Q(notification_type=notification_type, updated_at__lt=now - timedelta(days=days))
+    return condition
+
+
+def archive_rows(rows, archive_dir):
+    """Append rows (dicts of ARCHIVE_FIELDS) to ``<archive_dir>/notifications-YYYY-MM.jsonl.gz``."""
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(row['created_at'].strftime('%Y-%m'), []).append(row)
+    os.makedirs(archive_dir, exist_ok=True)
+    for month, month_rows in by_month.items():
+        path = os.path.join(archive_dir, f"notifications-{month}.jsonl.gz")
+        # Appending to gzip writes a new member; readers see one continuous stream
+        with gzip.open(path, 'at', encoding='utf-8') as f:
+            for row in month_rows:
+                f.write(json.dumps(row, default=str) + '\n')
+
+
+def purge_expired(batch_size=BATCH_SIZE, archive_dir=ARCHIVE_DIR, pause=0.0, dry_run=False, now=None,
+                  queryset=None):
+    """
+    Delete (and optionally archive) expired notifications in batches.
+
+    ``pause`` sleeps between batches to leave room for foreground writes;
+    ``queryset`` limits the purge to a subset of notifications.
+    Returns the number of rows purged (or that would be, with ``dry_run``).
+    """
+    base = Notification.objects.all() if queryset is None else queryset
+    expired = base.filter(expired_filter(now))
+    if dry_run:
+        return expired.count()
+
+    purged = 0
+    last_pk = 0
+    while True:
+        # Walk the primary key so each batch is a bounded index range
+        pks = list(expired.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        last_pk = pks[-1]
+        batch = expired.filter(pk__in=pks)  # Re-checked: a group may have had new activity
+        if archive_dir:
+            archive_rows(list(batch.values(*ARCHIVE_FIELDS)), archive_dir)
+        purged += delete_notifications(batch)
+        if pause:
+            time.sleep(pause)
+
+    logger.info(f"Purged {purged} expired notifications")
+    return purged
+
+
+def schedule_purge(delay=0):
+    """Queue the next daily purge; one per day however often this is called."""
+    run_day = (timezone.now() + timedelta(seconds=delay)).date()
+    enqueue('notifications.purge', key=f"notifications-purge:{run_day.isoformat()}", delay=delay)
+
+
+@task('notifications.purge')
+def purge_job():
+    try:
+        purge_expired()
+    finally:
+        schedule_purge(delay=PURGE_INTERVAL)
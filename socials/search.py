@@ -0,0 +1,264 @@
+# search.py
+"""
+Full-text search over people and posts.
+
+Every user and post has one SearchDocument row holding its searchable text:
+the username as ``title`` and the profile fields (occupation, works_at,
+location, bio) or the caption as ``body``. The signals in models.py rewrite a
+document whenever its profile or post is saved, so the index is always
+current; ``manage.py rebuild_search_index`` rebuilds it from scratch.
+
+Backends (``SEARCH_BACKEND``, chosen from the database vendor by default):
+    socials.search.SQLiteFTSBackend    FTS5 table keyed by document id,
+                                       ranked by bm25 (local development)
+    socials.search.PostgresBackend     generated ``tsvector`` column with a GIN
+                                       index plus a trigram index on usernames
+                                       for typos, ranked by ts_rank_cd + similarity
+    socials.search.ScanBackend         icontains over SearchDocument; no extra
+                                       schema, for any other database
+
+Query words are matched by prefix and must all appear ("ali lag" finds
+"alice" in "Lagos"). Results are ranked, paginated, and loaded together
+with their users and profiles in one query.
+"""
+import logging
+import re
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Post, Profile, SearchDocument
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = getattr(settings, 'SEARCH_PAGE_SIZE', 20)
+MAX_PAGE = 50  # Deep pages cost an ever larger OFFSET; nobody reads page 51
+MAX_TERMS = 8
+TITLE_WEIGHT = 10.0  # A username match outranks the same word in a bio or caption
+
+FTS_TABLE = 'socials_search_fts'
+
+SearchPage = namedtuple('SearchPage', ['results', 'number', 'has_next'])
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def terms(query):
+    """Lowercased words of ``query``; punctuation and operators are dropped."""
+    return _TERM_RE.findall((query or '').lower())[:MAX_TERMS]
+
+
+# ----------------------------
+#  Backends
+# ----------------------------
+class ScanBackend:
+    """No index: every word must appear somewhere in the document text."""
+
+    def index(self, documents):
+        pass
+
+    def remove(self, document_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, words, kind, limit, offset):
+        condition = Q(kind=kind)
+        for word in words:
+            condition &= Q(title__icontains=word) | Q(body__icontains=word)
+        return list(
+            SearchDocument.objects.filter(condition)
+            .order_by('-id')
+            .values_list('id', flat=True)[offset:offset + limit]
+        )
+
+
+class SQLiteFTSBackend:
+    """FTS5 virtual table whose rowid is the SearchDocument id."""
+
+    def index(self, documents):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+                [(document.pk, document.title, document.body) for document in documents],
+            )
+
+    def remove(self, document_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in document_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, body) "
+                f"SELECT id, title, body FROM {SearchDocument._meta.db_table}"
+            )
+
+    def search(self, words, kind, limit, offset):
+        # Each word is a quoted prefix token, so user input is never parsed as FTS syntax
+        match = ' '.join(f'"{word}"*' for word in words)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT d.id FROM {FTS_TABLE} f "
+                f"JOIN {SearchDocument._meta.db_table} d ON d.id = f.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND d.kind = %s "
+                f"ORDER BY bm25({FTS_TABLE}, %s, 1.0), d.id DESC LIMIT %s OFFSET %s",
+                [match, kind, TITLE_WEIGHT, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresBackend:
+    """``vector`` is a generated column, so Postgres keeps it current by itself."""
+
+    def index(self, documents):
+        pass
+
+    def remove(self, document_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, words, kind, limit, offset):
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        phrase = ' '.join(words)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM {SearchDocument._meta.db_table} "
+                f"WHERE kind = %s AND (vector @@ to_tsquery('simple', %s) OR title %% %s) "
+                f"ORDER BY ts_rank_cd(vector, to_tsquery('simple', %s)) + similarity(title, %s) DESC, id DESC "
+                f"LIMIT %s OFFSET %s",
+                [kind, tsquery, phrase, tsquery, phrase, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+VENDOR_BACKENDS = {
+    'sqlite': 'socials.search.SQLiteFTSBackend',
+    'postgresql': 'socials.search.PostgresBackend',
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'SEARCH_BACKEND', None) or VENDOR_BACKENDS.get(
+                    connection.vendor, 'socials.search.ScanBackend'
+                )
+                _backend = import_string(path)()
+    return _backend
+
+
+# ----------------------------
+#  Indexing
+# ----------------------------
+PROFILE_TEXT_FIELDS = ('occupation', 'works_at', 'location', 'bio')
+
+
+def profile_text(profile):
+    return ' '.join(filter(None, (getattr(profile, field) for field in PROFILE_TEXT_FIELDS)))
+
+
+def index_user(user, profile=None):
+    """Write ``user``'s search document from their username and profile."""
+    profile = profile or Profile.objects.get(user=user)
+    document, _ = SearchDocument.objects.update_or_create(
+        key=f"user:{user.pk}",
+        defaults={'kind': 'user', 'user': user, 'title': user.username, 'body': profile_text(profile)},
+    )
+    get_backend().index([document])
+    return document
+
+
+def index_post(post):
+    """Write ``post``'s search document from its caption."""
+    document, _ = SearchDocument.objects.update_or_create(
+        key=f"post:{post.pk}",
+        defaults={'kind': 'post', 'user_id': post.user_id, 'post': post, 'body': post.caption or ''},
+    )
+    get_backend().index([document])
+    return document
+
+
+def rebuild_index(batch_size=1000):
+    """
+    Recreate every SearchDocument from the Profile and Post tables, then
+    rebuild the backend index. Returns (users, posts) indexed.
+    """
+    with transaction.atomic():
+        # Plain DELETE: per-row signals would unindex documents the rebuild replaces anyway
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SearchDocument._meta.db_table}")
+        users, posts = _create_documents(batch_size)
+        get_backend().rebuild()
+    logger.info(f"Rebuilt search index: {users} users, {posts} posts")
+    return users, posts
+
+
+def _create_documents(batch_size):
+    users = posts = 0
+    profiles = Profile.objects.select_related('user').order_by('pk').iterator(chunk_size=batch_size)
+    batch = []
+    for profile in profiles:
+        batch.append(SearchDocument(
+            key=f"user:{profile.user_id}", kind='user', user_id=profile.user_id,
+            title=profile.user.username, body=profile_text(profile),
+        ))
+        if len(batch) >= batch_size:
+            users += len(SearchDocument.objects.bulk_create(batch))
+            batch = []
+    users += len(SearchDocument.objects.bulk_create(batch))
+
+    batch = []
+    for post_id, user_id, caption in Post.objects.order_by('pk').values_list('id', 'user_id', 'caption').iterator(
+        chunk_size=batch_size
+    ):
+        batch.append(SearchDocument(
+            key=f"post:{post_id}", kind='post', user_id=user_id, post_id=post_id, body=caption or '',
+        ))
+        if len(batch) >= batch_size:
+            posts += len(SearchDocument.objects.bulk_create(batch))
+            batch = []
+    posts += len(SearchDocument.objects.bulk_create(batch))
+    return users, posts
+
+
+# ----------------------------
+#  Querying
+# ----------------------------
+def search(query, kind='user', page=1, page_size=PAGE_SIZE):
+    """
+    One page of ranked matches for ``query``.
+
+    ``kind`` is 'user' (results are Profiles, with ``user`` loaded) or 'post'
+    (results are Posts, with ``user`` and ``user.profile`` loaded).
+    """
+    words = terms(query)
+    page = max(1, min(page, MAX_PAGE))
+    if not words:
+        return SearchPage([], page, False)
+
+    # One extra id tells us whether there is a next page
+    ids = get_backend().search(words, kind, page_size + 1, (page - 1) * page_size)
+    has_next = len(ids) > page_size and page < MAX_PAGE
+    ids = ids[:page_size]
+
+    related = ('user', 'user__profile') if kind == 'user' else ('post', 'post__user', 'post__user__profile')
+    documents = SearchDocument.objects.select_related(*related).in_bulk(ids)
+    if kind == 'user':
+        results = [documents[pk].user.profile for pk in ids if pk in documents]
+    else:
+        results = [documents[pk].post for pk in ids if pk in documents]
+    return SearchPage(results, page, has_next)
@@ -0,0 +1,241 @@
+# sidebar.py
+"""
+Per-user cache for the sidebar context (suggestions + recent notifications)
+rendered by layout.html on every page.
+
+Entries are invalidated after commit by the events that change them:
+follow/unfollow (the follower's suggestions), notification writes, reads and
+deletes (the recipient's list), and suggestion recomputes. ``SIDEBAR_CACHE_TTL``
+bounds staleness from anything else.
+
+Concurrent misses for one user are coalesced: the first request builds the
+entry while the others wait for it (single-flight in-process, plus an
+``add()`` lock on shared backends), so an invalidation on a busy account does
+not send every in-flight request to the database at once.
+
+Backends (``SIDEBAR_CACHE_BACKEND``):
+    socials.sidebar.LocalLRUCache  process-local LRU (default); invalidations
+                                   only reach the process that handled the event,
+                                   other processes catch up within the TTL
+    socials.sidebar.SharedCache    Django's cache framework (``SIDEBAR_CACHE_ALIAS``),
+                                   e.g. Redis, shared by every worker
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Notification
+from .suggestions import suggestions_for
+
+logger = logging.getLogger(__name__)
+
+TTL = getattr(settings, 'SIDEBAR_CACHE_TTL', 60)  # seconds
+MAX_ENTRIES = getattr(settings, 'SIDEBAR_CACHE_MAX_ENTRIES', 10000)
+LOCK_TIMEOUT = 5  # seconds a shared-cache builder may hold the rebuild lock
+SIDEBAR_NOTIFICATIONS = 10
+
+
+# ----------------------------
+#  Backends
+# ----------------------------
+class LocalLRUCache:
+    """Least-recently-used dict with per-entry expiry, safe across threads."""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def acquire(self, key):
+        return True  # In-process single-flight already covers a local cache
+
+    def release(self, key):
+        pass
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedCache:
+    """Django cache alias shared between processes."""
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or getattr(settings, 'SIDEBAR_CACHE_ALIAS', 'default')]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, ttl):
+        self.cache.set(key, value, ttl)
+
+    def delete_many(self, keys):
+        self.cache.delete_many(list(keys))
+
+    def acquire(self, key):
+        return self.cache.add(f"{key}:lock", 1, LOCK_TIMEOUT)
+
+    def release(self, key):
+        self.cache.delete(f"{key}:lock")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(
+                    getattr(settings, 'SIDEBAR_CACHE_BACKEND', 'socials.sidebar.LocalLRUCache')
+                )()
+    return _backend
+
+
+# ----------------------------
+#  Stats
+# ----------------------------
+_stats = {'hits': 0, 'misses': 0, 'waits': 0, 'invalidations': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def stats():
+    """Hit ratio and counters for this process since start."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    lookups = snapshot['hits'] + snapshot['misses']
+    snapshot['hit_ratio'] = round(snapshot['hits'] / lookups, 4) if lookups else None
+    snapshot['backend'] = type(get_backend()).__name__
+    return snapshot
+
+
+# ----------------------------
+#  Read + invalidate
+# ----------------------------
+_inflight = {}
+_inflight_lock = threading.Lock()
+_generations = {}  # key -> invalidations during an in-flight build, so a stale result is not stored
+
+
+def cache_key(user_id):
+    return f"socials:sidebar:{user_id}"
+
+
+def recent_notifications(user):
+    return list(
+        Notification.objects.filter(recipient=user)
+        .select_related('sender', 'sender__profile', 'post')
+        .order_by('-updated_at')[:SIDEBAR_NOTIFICATIONS]
+    )
+
+
+def build_shared_context(user):
+    return {
+        "suggestions": suggestions_for(user),
+        "notifications": recent_notifications(user),
+    }
+
+
+def shared_context(user):
+    """Sidebar context for ``user``, from cache when possible."""
+    backend = get_backend()
+    key = cache_key(user.pk)
+    value = backend.get(key)
+    if value is not None:
+        _count('hits')
+        return value
+    _count('misses')
+
+    # Single-flight within this process
+    with _inflight_lock:
+        event = _inflight.get(key)
+        leader = event is None
+        if leader:
+            event = _inflight[key] = threading.Event()
+    if not leader:
+        _count('waits')
+        event.wait(LOCK_TIMEOUT)
+        value = backend.get(key)
+        return value if value is not None else build_shared_context(user)
+
+    try:
+        # Across processes: wait briefly for another builder rather than piling on
+        acquired = backend.acquire(key)
+        if not acquired:
+            _count('waits')
+            deadline = time.monotonic() + LOCK_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                value = backend.get(key)
+                if value is not None:
+                    return value
+        try:
+            generation = _generations.get(key, 0)
+            value = build_shared_context(user)
+            if _generations.get(key, 0) == generation:
+                backend.set(key, value, TTL)
+            return value
+        finally:
+            if acquired:
+                backend.release(key)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+            _generations.pop(key, None)
+        event.set()
+
+
+def invalidate(*user_ids):
+    """Drop cached sidebars for ``user_ids`` once the current transaction commits."""
+    keys = [cache_key(user_id) for user_id in user_ids if user_id is not None]
+    if not keys:
+        return
+
+    def delete():
+        try:
+            with _inflight_lock:
+                for key in keys:
+                    if key in _inflight:
+                        _generations[key] = _generations.get(key, 0) + 1
+            get_backend().delete_many(keys)
+            _count('invalidations', len(keys))
+        except Exception as e:
+            logger.warning(f"Sidebar cache invalidation failed: {str(e)}")
+
+    transaction.on_commit(delete)
@@ -0,0 +1,408 @@
+# storage.py
+"""
+Where uploaded media lives: one interface over every store.
+
+``MEDIA_STORAGE`` picks the backend new uploads go to:
+
+    cloudinary  Cloudinary, the production store (account from cloudinary.config)
+    supabase    a Supabase Storage bucket, through utils.py's streaming and
+                resumable uploads
+    local       files under MEDIA_ROOT, served at MEDIA_URL: no network at
+                all, so the whole upload path (request, spool, ingest job,
+                derivatives) can be load tested offline
+    memory      fakestorage.MemoryStorage, for tests
+
+``Post.media``, ``Profile.profilepic`` and ``Profile.cover_photo`` are
+``MediaField``s holding a ``StoredFile``. A stored value names its backend
+(``local:post_media/3f2a.jpg``, ``supabase:<bucket>/post_media/3f2a.jpg``),
+except Cloudinary's, which keep the unprefixed format CloudinaryField wrote
+(``image/upload/v17/post_media/3f2a.jpg``), and absolute URLs, which are used
+as they are. Rows written under one backend keep resolving after
+MEDIA_STORAGE changes.
+
+Backends are created on first use. Cloudinary's SDK and the Supabase httpx
+client both keep pooled keep-alive connections, and every call is bounded by
+``MEDIA_STORAGE_TIMEOUT``. Saves and deletes are timed and counted per
+backend; ``stats()`` reports them (staff: ``/debug/storage``).
+"""
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from functools import cached_property
+
+import cloudinary.uploader
+from cloudinary import CloudinaryResource
+from cloudinary.models import CLOUDINARY_FIELD_DB_RE
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.storage import Storage as DjangoStorage
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = getattr(settings, 'MEDIA_STORAGE', 'cloudinary')
+TIMEOUT = getattr(settings, 'MEDIA_STORAGE_TIMEOUT', 60)  # Seconds per storage call
+BACKENDS = {
+    'cloudinary': 'socials.storage.CloudinaryStorage',
+    'supabase': 'socials.storage.SupabaseStorage',
+    'local': 'socials.storage.LocalStorage',
+    'memory': 'socials.fakestorage.MemoryStorage',
+    **getattr(settings, 'MEDIA_STORAGE_BACKENDS', {}),
+}
+LATENCY_SAMPLES = 1000  # Recent calls per backend and operation kept for percentiles
+
+# "<backend>:<name>"; not "https://...", which is an absolute URL
+PREFIX_RE = re.compile(r'^([a-z]+):(?!//)(.+)$', re.S)
+
+
+class StoredFile:
+    """An object in one of the backends, as a MediaField holds it."""
+
+    def __init__(self, storage, name):
+        self.storage = storage  # Backend name, None for an absolute URL
+        self.name = name
+
+    @cached_property
+    def url(self):
+        if self.storage is None:
+            return self.name
+        return get_storage(self.storage).url(self.name)
+
+    def get_prep_value(self):
+        """The string stored in the database."""
+        if self.storage in (None, 'cloudinary'):
+            return self.name
+        return f"{self.storage}:{self.name}"
+
+    def __str__(self):
+        return self.get_prep_value()
+
+    def __repr__(self):
+        return f"<StoredFile {self.get_prep_value()}>"
+
+    def __bool__(self):
+        return bool(self.name)
+
+    def __eq__(self, other):
+        if isinstance(other, StoredFile):
+            other = other.get_prep_value()
+        return isinstance(other, str) and self.get_prep_value() == other
+
+    def __hash__(self):
+        return hash(self.get_prep_value())
+
+
+def resolve(value):
+    """The StoredFile for a stored value, or None for an empty one."""
+    if isinstance(value, StoredFile) or not value:
+        return value or None
+    if value.startswith(('http://', 'https://')):
+        return StoredFile(None, value)
+    match = PREFIX_RE.match(value)
+    if match and match.group(1) in BACKENDS:
+        return StoredFile(match.group(1), match.group(2))
+    return StoredFile('cloudinary', value)  # Written by CloudinaryField before this module
+
+
+# ----------------------------
+#  Metrics
+# ----------------------------
+_stats = {}  # (backend, operation) -> counters and recent latencies
+_stats_lock = threading.Lock()
+
+
+@contextmanager
+def _measure(backend, operation, size=0):
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        with _stats_lock:
+            entry = _stats.get((backend, operation))
+            if entry is None:
+                entry = _stats[(backend, operation)] = {
+                    'calls': 0, 'errors': 0, 'bytes': 0, 'seconds': 0.0,
+                    'latencies': deque(maxlen=LATENCY_SAMPLES),
+                }
+            entry['calls'] += 1
+            entry['errors'] += failed
+            entry['bytes'] += 0 if failed else size
+            entry['seconds'] += elapsed
+            entry['latencies'].append(elapsed)
+
+
+def stats():
+    """Calls, errors, bytes and latency per backend and operation, for this process since start."""
+    with _stats_lock:
+        snapshot = {key: dict(entry, latencies=sorted(entry['latencies'])) for key, entry in _stats.items()}
+    report = {}
+    for (backend, operation), entry in sorted(snapshot.items()):
+        latencies = entry.pop('latencies')
+        entry['avg_ms'] = round(entry.pop('seconds') / entry['calls'] * 1000, 2)
+        entry['p50_ms'] = round(latencies[len(latencies) // 2] * 1000, 2)
+        entry['p99_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2)
+        report.setdefault(backend, {})[operation] = entry
+    return {'default': DEFAULT_BACKEND, 'backends': report}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# ----------------------------
+#  Backends
+# ----------------------------
+class Storage:
+    """
+    Base class: subclasses implement ``_save(file, folder, resource_type)``,
+    returning the name to keep, ``_delete(name)`` and ``url(name)``.
+    ``file`` is a Django File (an upload, a spooled file, a ContentFile).
+    """
+    name = None
+
+    def save(self, file, folder, resource_type='auto'):
+        """Store ``file`` under ``folder``; returns its StoredFile."""
+        with _measure(self.name, 'save', file.size or 0):
+            name = self._save(file, folder.strip('/'), resource_type)
+        return StoredFile(self.name, name)
+
+    def delete(self, stored):
+        with _measure(self.name, 'delete'):
+            self._delete(stored.name)
+
+    def _save(self, file, folder, resource_type):
+        raise NotImplementedError
+
+    def _delete(self, name):
+        raise NotImplementedError
+
+    def url(self, name):
+        raise NotImplementedError
+
+
+class CloudinaryStorage(Storage):
+    """
+    The account configured in settings (cloudinary.config). The SDK's
+    uploader sends every call through one module-level urllib3 pool.
+    """
+    name = 'cloudinary'
+
+    def _save(self, file, folder, resource_type):
+        resource = cloudinary.uploader.upload_resource(
+            file, folder=folder, resource_type=resource_type, timeout=TIMEOUT,
+        )
+        return resource.get_prep_value()
+
+    def _delete(self, name):
+        resource = self.resource(name)
+        cloudinary.uploader.destroy(
+            resource.public_id, resource_type=resource.resource_type, type=resource.type, timeout=TIMEOUT,
+        )
+
+    def resource(self, name):
+        """The CloudinaryResource for a stored value, parsed as CloudinaryField did."""
+        match = re.match(CLOUDINARY_FIELD_DB_RE, name)
+        return CloudinaryResource(
+            type=match.group('type') or 'upload',
+            resource_type=match.group('resource_type') or 'image',
+            version=match.group('version'),
+            public_id=match.group('public_id'),
+            format=match.group('format'),
+        )
+
+    def url(self, name):
+        return self.resource(name).url
+
+
+class SupabaseStorage(Storage):
+    """
+    A Supabase Storage bucket (SUPABASE_URL, SUPABASE_KEY,
+    SUPABASE_BUCKET_NAME). Uploads stream from the upload buffer, large ones
+    through the resumable protocol (see utils.py), over one shared client.
+    """
+    name = 'supabase'
+
+    def __init__(self, url=None, key=None, bucket=None):
+        from . import utils
+
+        self.utils = utils
+        self.base_url = url or settings.SUPABASE_URL
+        self.bucket = bucket or settings.SUPABASE_BUCKET_NAME
+        self._key = key
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    if self._key is None:
+                        self._client = self.utils.get_storage_client()
+                    else:
+                        self._client = self.utils.make_storage_client(self.base_url, self._key, timeout=TIMEOUT)
+        return self._client
+
+    def _save(self, file, folder, resource_type):
+        path = self.utils.put_object(self.client, self.bucket, f"{folder}/", file)
+        return f"{self.bucket}/{path}"
+
+    def _delete(self, name):
+        bucket, _, path = name.partition('/')
+        self.utils.delete_object(self.client, bucket, path)
+
+    def url(self, name):
+        bucket, _, path = name.partition('/')
+        return self.utils.public_url(path, bucket, base_url=self.base_url)
+
+
+class LocalStorage(Storage):
+    """
+    Files under MEDIA_ROOT, served at MEDIA_URL (by the DEBUG static view in
+    development). Nothing leaves the machine.
+    """
+    name = 'local'
+
+    def __init__(self, location=None, base_url=None):
+        self.files = FileSystemStorage(location=location or settings.MEDIA_ROOT, base_url=base_url)
+
+    def _save(self, file, folder, resource_type):
+        name = f"{uuid.uuid4().hex}{os.path.splitext(file.name or '')[1].lower()}"
+        return self.files.save(f"{folder}/{name}" if folder else name, file)
+
+    def _delete(self, name):
+        self.files.delete(name)
+
+    def url(self, name):
+        return self.files.url(name)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_storage(name=None):
+    """The backend called ``name`` (default: MEDIA_STORAGE), created on first use."""
+    name = name or DEFAULT_BACKEND
+    backend = _backends.get(name)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(name)
+            if backend is None:
+                backend = _backends[name] = import_string(BACKENDS[name])()
+    return backend
+
+
+def delete(stored):
+    """Delete ``stored`` from the backend that holds it; absolute URLs are left alone."""
+    if stored and stored.storage is not None:
+        get_storage(stored.storage).delete(stored)
+
+
+# ----------------------------
+#  Model field
+# ----------------------------
+class MediaDescriptor(DeferredAttribute):
+    """Turns assigned strings into StoredFiles; uploaded files are kept until the model is saved."""
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = self.field.to_python(value)
+
+
+class MediaField(models.Field):
+    """
+    A StoredFile, stored as its ``get_prep_value()`` string. Assigning an
+    uploaded file stores it in the default backend, under ``folder``, when
+    the model is saved.
+    """
+    descriptor_class = MediaDescriptor
+
+    def __init__(self, *args, folder='', resource_type='auto', **kwargs):
+        kwargs.setdefault('max_length', 255)
+        self.folder = folder
+        self.resource_type = resource_type
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get('max_length') == 255:
+            del kwargs['max_length']
+        if self.folder:
+            kwargs['folder'] = self.folder
+        if self.resource_type != 'auto':
+            kwargs['resource_type'] = self.resource_type
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        return 'CharField'
+
+    def from_db_value(self, value, expression, connection):
+        return resolve(value)
+
+    def to_python(self, value):
+        if isinstance(value, str):
+            return resolve(value)
+        return value
+
+    def get_prep_value(self, value):
+        if isinstance(value, StoredFile):
+            return value.get_prep_value()
+        return value
+
+    def upload(self, file):
+        """
+        Store ``file`` where this field keeps its uploads. Views call it before
+        opening a transaction, so the save does not hold one open over the network.
+        """
+        return get_storage().save(file, self.folder, self.resource_type)
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        if isinstance(value, File):
+            value = self.upload(value)
+            setattr(model_instance, self.attname, value)
+        return value
+
+    def value_to_string(self, obj):
+        return self.get_prep_value(self.value_from_object(obj)) or ''
+
+
+# ----------------------------
+#  Django storage API
+# ----------------------------
+class MediaStorage(DjangoStorage):
+    """
+    ``STORAGES['default']``: Django's file storage API (``default_storage``,
+    FileFields) over the MEDIA_STORAGE backend. Names are stored values.
+    """
+
+    def _save(self, name, content):
+        folder, filename = os.path.split(name)
+        if not getattr(content, 'name', None):
+            content.name = filename
+        return get_storage().save(content, folder).get_prep_value()
+
+    def delete(self, name):
+        delete(resolve(name))
+
+    def exists(self, name):
+        return False  # Every save gets a fresh name
+
+    def url(self, name):
+        stored = resolve(name)
+        return stored.url if stored else ''
+
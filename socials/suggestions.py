@@ -0,0 +1,82 @@
+# suggestions.py
+"""
+"People you may know" for the sidebar.
+
+Rankings are precomputed from the follow graph (graph.py) into the
+Suggestion table by a daily job or ``manage.py compute_suggestions``. Reading
+them is one index range scan per user; accounts followed since the last run
+are skipped with a NOT EXISTS probe. Users with no precomputed rows yet
+(e.g. new signups) get the most-followed accounts instead.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .jobs import enqueue, task
+from .models import Follow, Profile, Suggestion
+
+logger = logging.getLogger(__name__)
+
+SIDEBAR_SUGGESTIONS = 6
+REFRESH_INTERVAL = getattr(settings, 'SUGGESTIONS_REFRESH_INTERVAL', 24 * 60 * 60)  # seconds
+
+
+def suggestions_for(user, limit=SIDEBAR_SUGGESTIONS):
+    """
+    Users to suggest to ``user``, best first. Each carries ``mutual_count``
+    and ``follows_you`` attributes for the template.
+    """
+    already_followed = Follow.objects.filter(follower=user, following_id=OuterRef('suggested_id'))
+    ranked = list(
+        Suggestion.objects.filter(user=user)
+        .exclude(Exists(already_followed))
+        .select_related('suggested', 'suggested__profile')
+        .order_by('-score')[:limit]
+    )
+    suggestions = []
+    for row in ranked:
+        row.suggested.mutual_count = row.mutual_count
+        row.suggested.follows_you = row.follows_you
+        suggestions.append(row.suggested)
+    if suggestions:
+        return suggestions
+    return popular_users(user, limit)
+
+
+def popular_users(user, limit=SIDEBAR_SUGGESTIONS):
+    """Most-followed accounts ``user`` does not follow yet."""
+    already_followed = Follow.objects.filter(follower=user, following_id=OuterRef('user_id'))
+    profiles = (
+        Profile.objects.exclude(user=user)
+        .exclude(Exists(already_followed))
+        .select_related('user')
+        .order_by('-follower_count')[:limit]
+    )
+    users = []
+    for profile in profiles:
+        profile.user.mutual_count = 0
+        profile.user.follows_you = False
+        users.append(profile.user)
+    return users
+
+
+def schedule_refresh(delay=0):
+    """Queue the next full recompute; at most one per day."""
+    run_day = (timezone.now() + timedelta(seconds=delay)).date()
+    enqueue('suggestions.precompute', key=f"suggestions-precompute:{run_day.isoformat()}", delay=delay)
+
+
+@task('suggestions.precompute')
+def precompute_job():
+    from .graph import FollowGraph, describe, precompute_suggestions  # Needs NumPy; workers only
+
+    try:
+        graph = FollowGraph.from_db()
+        logger.info(f"Follow graph: {describe(graph)}")
+        done = precompute_suggestions(graph)
+        logger.info(f"Precomputed suggestions for {done} users")
+    finally:
+        schedule_refresh(delay=REFRESH_INTERVAL)
@@ -0,0 +1,133 @@
+# tags.py
+"""
+Hashtags and @mentions in post captions.
+
+``Post.save`` parses the caption once and stores one PostTag row per distinct
+tag, lowercased, together with a copy of the post's ``created_at``. A tag feed
+("posts tagged #x") is then a range scan of the (kind, tag, -created_at, -post)
+index, paginated with the same (created_at, id) cursors as the other feeds,
+instead of a LIKE over every caption.
+
+``manage.py backfill_post_tags`` indexes posts written before tags existed.
+"""
+import logging
+import re
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Post, PostTag
+from .pagination import keyset_before
+
+logger = logging.getLogger(__name__)
+
+MAX_TAG_LENGTH = 150
+
+# A hashtag needs at least one letter (#1 is a number, not a tag) and must not
+# follow a word character or slash (so URL fragments and "C#" are left alone)
+HASHTAG_RE = re.compile(r'(?<![\w&#/])#(\w*[^\W\d_]\w*)')
+# Usernames may contain . + - as well; trailing punctuation is trimmed below
+MENTION_RE = re.compile(r'(?<![\w@.])@(\w[\w.+-]*)')
+# Either, in one left-to-right pass: group 1 is a hashtag, group 2 a mention
+TAG_RE = re.compile(f'{HASHTAG_RE.pattern}|{MENTION_RE.pattern}')
+
+
+def normalize_tag(tag):
+    return tag.strip().lstrip('#@').lower()
+
+
+def tokenize(caption):
+    """
+    Split ``caption`` into ``(text, kind, tag)`` pieces that join back into
+    it: each tag as ``kind`` ('hashtag' or 'mention') and the lowercased
+    ``tag`` it is indexed under, and the text between tags with ``kind`` and
+    ``tag`` None. Rendering (``link_tags``) and indexing both go through
+    here, so every linked tag has a feed.
+    """
+    caption = caption or ''
+    position = 0
+    for match in TAG_RE.finditer(caption):
+        if match.group(1) is not None:
+            kind, name = 'hashtag', match.group(1)
+        else:
+            kind, name = 'mention', match.group(2).rstrip('.+-')
+        tag = name.lower()
+        if not 0 < len(tag) <= MAX_TAG_LENGTH:
+            continue  # Stays part of the surrounding text
+        if match.start() > position:
+            yield caption[position:match.start()], None, None
+        position = match.start() + 1 + len(name)
+        yield caption[match.start():position], kind, tag
+    if position < len(caption):
+        yield caption[position:], None, None
+
+
+def extract_tags(caption):
+    """Distinct ``(kind, tag)`` pairs in ``caption``, in order of appearance."""
+    found = {}
+    for _, kind, tag in tokenize(caption):
+        if kind is not None:
+            found.setdefault((kind, tag), None)
+    return list(found)
+
+
+def sync_post_tags(post):
+    """Make ``post``'s PostTag rows match its caption."""
+    wanted = set(extract_tags(post.caption))
+    with transaction.atomic():
+        existing = set(PostTag.objects.filter(post=post).values_list('kind', 'tag'))
+        stale = Q(pk__in=[])
+        for kind, tag in existing - wanted:
+            stale |= Q(kind=kind, tag=tag)
+        PostTag.objects.filter(post=post).filter(stale).delete()
+        PostTag.objects.bulk_create([
+            PostTag(post=post, kind=kind, tag=tag, created_at=post.created_at)
+            for kind, tag in wanted - existing
+        ], ignore_conflicts=True)
+
+
+def tagged_posts(kind, tag, limit, before=None, queryset=None):
+    """
+    Up to ``limit`` posts carrying ``tag``, newest first, loaded from
+    ``queryset`` (defaults to posts with their authors' profiles).
+    ``before`` is a decoded (created_at, post_id) cursor.
+    """
+    rows = PostTag.objects.filter(kind=kind, tag=normalize_tag(tag))
+    if before is not None:
+        rows = rows.filter(keyset_before(before, 'created_at', 'post'))
+    post_ids = list(rows.order_by('-created_at', '-post').values_list('post_id', flat=True)[:limit])
+    if not post_ids:
+        return []
+    if queryset is None:
+        queryset = Post.objects.select_related('user', 'user__profile')
+    posts = queryset.in_bulk(post_ids)
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+def backfill_post_tags(batch_size=1000):
+    """
+    (Re)index the tags of every post, ``batch_size`` posts per transaction,
+    walking the primary key. Returns (posts, tags) written.
+    """
+    posts_done = tags_done = 0
+    last_pk = None
+    while True:
+        batch = Post.objects.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        batch = list(batch.values_list('pk', 'caption', 'created_at')[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        rows = [
+            PostTag(post_id=pk, kind=kind, tag=tag, created_at=created_at)
+            for pk, caption, created_at in batch
+            for kind, tag in extract_tags(caption)
+        ]
+        with transaction.atomic():
+            PostTag.objects.filter(post_id__in=[pk for pk, _, _ in batch]).delete()
+            PostTag.objects.bulk_create(rows, batch_size=1000)
+        posts_done += len(batch)
+        tags_done += len(rows)
+    logger.info(f"Backfilled {tags_done} tags over {posts_done} posts")
+    return posts_done, tags_done
@@ -45,3 +45,62 @@ def short_timesince(value):
     else:  # more than 1 week
         weeks = int(seconds // 604800)
         return f"{weeks}w"
+
+@register.filter
+def link_tags(caption):
+    """
+    Escape a caption and link its #hashtags and @mentions to their feeds
+    Usage: {{ post.caption|link_tags }}
+    """
+    from django.urls import reverse
+    from django.utils.html import escape, format_html
+    from django.utils.safestring import mark_safe
+    from socials.tags import tokenize
+
+    # Tags are found in the raw caption, exactly as they are indexed, then each piece is escaped
+    pieces = []
+    for text, kind, tag in tokenize(caption):
+        if kind is None:
+            pieces.append(escape(text))
+        else:
+            url = reverse('tag_feed' if kind == 'hashtag' else 'mention_feed', args=[tag])
+            pieces.append(format_html('<a href="{}" class="text-blue-600 hover:underline">{}</a>', url, text))
+    return mark_safe(''.join(pieces))
+
+def _candidates(derivatives, variants, format):
+    """(url, width) pairs for the named derivatives, skipping missing ones and repeated widths"""
+    seen = set()
+    for name in variants:
+        entry = (derivatives or {}).get(name)
+        if entry and entry.get(format) and entry['width'] not in seen:
+            seen.add(entry['width'])
+            yield entry[format], entry['width']
+
+@register.simple_tag
+def srcset(derivatives, *variants, format='webp'):
+    """
+    A srcset value from an image's derivatives (see socials/images.py)
+    Usage: <img src="{{ url }}" srcset="{% srcset profile.profilepic_derivatives 'avatar' 'grid' %}" sizes="32px">
+    Empty when there are no derivatives, so the browser falls back to src
+    """
+    return ', '.join(f"{url} {width}w" for url, width in _candidates(derivatives, variants, format))
+
+@register.simple_tag
+def picture(src, derivatives, variants, sizes, **attrs):
+    """
+    A <picture> with a WebP srcset and a JPEG <img> fallback; a plain <img> of
+    ``src`` when the image has no derivatives
+    Usage: {% picture post.media.url post.media_derivatives 'card full' '640px' class="post-image" alt=post.caption %}
+    """
+    from django.utils.html import format_html, format_html_join
+
+    attributes = format_html_join('', ' {}="{}"', sorted(attrs.items()))
+    variants = variants.split()
+    jpeg = list(_candidates(derivatives, variants, 'jpeg'))
+    if not jpeg:
+        return format_html('<img src="{}"{}>', src, attributes)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}"><img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        srcset(derivatives, *variants), sizes, jpeg[0][0], srcset(derivatives, *variants, format='jpeg'), sizes,
+        attributes,
+    )
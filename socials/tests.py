@@ -1,3 +1,187 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from . import jobs
+from .likes import toggle_like
+from .models import Job, LikePost, Notification, Post
+from .notifications import mark_notifications_read, unread_notification_count, write_notification
+from .pagination import decode_cursor, encode_cursor, keyset_page
+
+
+@jobs.task('tests.flaky')
+def flaky(fail=True):
+    if fail:
+        raise RuntimeError("boom")
+
+
+class QueueTestMixin:
+    """Leave enqueued jobs in the table instead of waking an in-process worker."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(jobs, 'IN_PROCESS_WORKERS', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class ConcurrentLikeToggleTests(QueueTestMixin, TransactionTestCase):
+    """Toggles racing on one post must leave no_of_likes equal to the LikePost rows."""
+    THREADS = 8
+    TOGGLES = 5
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Needs a test database that threads can share (set TEST NAME for SQLite)")
+        self.author = User.objects.create_user('author', password='pw')
+        self.post = Post.objects.create(user=self.author, caption='race')
+
+    def race(self, users):
+        barrier = threading.Barrier(len(users))
+        errors = []
+
+        def toggle(user):
+            try:
+                post = Post.objects.get(pk=self.post.pk)
+                barrier.wait()
+                for _ in range(self.TOGGLES):
+                    toggle_like(post, user)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=toggle, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def assert_count_matches(self):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.no_of_likes, LikePost.objects.filter(post_id=self.post).count())
+
+    def test_many_users(self):
+        users = [User.objects.create_user(f'liker{i}', password='pw') for i in range(self.THREADS)]
+        self.race(users)
+        self.assert_count_matches()
+        # An odd number of toggles each leaves every user liking the post
+        self.assertEqual(self.post.no_of_likes, self.THREADS if self.TOGGLES % 2 else 0)
+
+    def test_one_user_many_requests(self):
+        user = User.objects.create_user('liker', password='pw')
+        self.race([user] * self.THREADS)
+        self.assert_count_matches()
+        self.assertIn(self.post.no_of_likes, (0, 1))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('poster', password='pw')
+        now = timezone.now()
+        posts = [Post.objects.create(user=self.user, caption=f'post {i}') for i in range(7)]
+        # Two pairs share a timestamp so the id tie-break is exercised
+        for i, post in enumerate(posts):
+            Post.objects.filter(pk=post.pk).update(created_at=now - timedelta(minutes=i // 2))
+
+    def test_cursor_round_trip(self):
+        created_at, pk = timezone.now(), Post.objects.first().pk
+        self.assertEqual(decode_cursor(encode_cursor(created_at, pk)), (created_at, pk))
+
+    def test_invalid_cursor(self):
+        for token in (None, '', 'not-a-cursor', '!!!'):
+            self.assertIsNone(decode_cursor(token))
+
+    def test_pages_cover_every_row_once(self):
+        queryset = Post.objects.filter(user=self.user)
+        seen, cursor = [], None
+        while True:
+            rows, token = keyset_page(queryset, cursor, limit=3)
+            seen.extend(rows)
+            if token is None:
+                break
+            cursor = decode_cursor(token)
+            self.assertIsNotNone(cursor)
+        expected = list(queryset.order_by('-created_at', '-id'))
+        self.assertEqual(seen, expected)
+
+
+class NotificationGroupingTests(QueueTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user('owner', password='pw')
+        self.post = Post.objects.create(user=self.owner, caption='liked')
+        self.likers = [User.objects.create_user(f'fan{i}', password='pw') for i in range(3)]
+
+    def like(self, user):
+        write_notification(self.owner.pk, user.pk, 'like', post_id=str(self.post.pk))
+
+    def test_likes_fold_into_one_group(self):
+        for user in self.likers:
+            self.like(user)
+        self.like(self.likers[0])  # A repeat actor is not counted twice
+
+        group = Notification.objects.get(recipient=self.owner)
+        self.assertEqual(group.actor_count, len(self.likers))
+        self.assertEqual(group.sender, self.likers[0])
+        self.assertEqual(group.sample_actor_ids[0], self.likers[0].pk)
+        self.assertEqual(unread_notification_count(self.owner), 1)
+
+    def test_unread_count(self):
+        self.like(self.likers[0])
+        write_notification(self.owner.pk, self.likers[1].pk, 'follow')
+        self.assertEqual(unread_notification_count(self.owner), 2)
+
+        self.assertEqual(mark_notifications_read(self.owner), 2)
+        self.assertEqual(unread_notification_count(self.owner), 0)
+
+        # New activity reopens the group that was already read
+        self.like(self.likers[1])
+        self.assertEqual(unread_notification_count(self.owner), 1)
+        self.assertEqual(Notification.objects.filter(recipient=self.owner, is_read=False).count(), 1)
+
+
+class JobQueueTests(QueueTestMixin, TestCase):
+    def run_next(self):
+        job, = jobs.claim('test-worker', 1)
+        return jobs.run_job(job)
+
+    def test_idempotency_key(self):
+        first = jobs.enqueue('tests.flaky', {'fail': False}, key='flaky:1')
+        second = jobs.enqueue('tests.flaky', {'fail': False}, key='flaky:1')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.filter(idempotency_key='flaky:1').count(), 1)
+
+    def test_unknown_job(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('tests.missing')
+
+    def test_success(self):
+        job = jobs.enqueue('tests.flaky', {'fail': False})
+        self.assertTrue(self.run_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.attempts, 1)
+
+    def test_retry_with_backoff_then_fail(self):
+        job = jobs.enqueue('tests.flaky', max_attempts=2)
+        self.assertFalse(self.run_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(job.last_error, "boom")
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(jobs.claim('test-worker', 1), [])  # Not due until the backoff passes
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertFalse(self.run_next())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
@@ -0,0 +1,380 @@
+# timeline.py
+"""
+Materialized home timelines.
+
+New posts are pushed into each follower's timeline when they are created
+(fan-out-on-write), so reading the home feed is a single range scan over the
+reader's own entries instead of a sort over the whole Post table.
+
+Authors with more than ``TIMELINE_FANOUT_MAX_FOLLOWERS`` followers are not
+fanned out; their posts are pulled and merged at read time instead
+(fan-out-on-read), which keeps a single upload from writing millions of rows.
+When such an author drops back to the threshold, their latest
+``BACKFILL_LENGTH`` posts are pushed to every follower (as a new follow
+would), since read-merging stops including them; older posts from the
+read-merged period are not restored.
+
+Timelines are capped at ``TIMELINE_MAX_LENGTH`` entries: writes trim the
+timelines they touched once they run ``TRIM_SLACK`` entries over, so the
+delete is amortized over many inserts.
+"""
+import bisect
+import heapq
+import logging
+import threading
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils.module_loading import import_string
+
+from .jobs import enqueue, task
+from .models import Follow, Post, Profile, TimelineEntry
+from .pagination import keyset_before
+
+logger = logging.getLogger(__name__)
+
+# Followers above which an author switches to fan-out-on-read
+FANOUT_MAX_FOLLOWERS = getattr(settings, 'TIMELINE_FANOUT_MAX_FOLLOWERS', 5000)
+# Entries kept per timeline; older posts drop off the end
+MAX_LENGTH = getattr(settings, 'TIMELINE_MAX_LENGTH', 800)
+# Entries a timeline may run over MAX_LENGTH before it is trimmed back
+TRIM_SLACK = MAX_LENGTH // 4
+# Rows per bulk insert during fan-out and rebuilds
+BATCH_SIZE = getattr(settings, 'TIMELINE_BATCH_SIZE', 1000)
+# An author's recent posts pushed to a timeline on follow
+BACKFILL_LENGTH = 50
+
+
+# ----------------------------
+#  Backends
+# ----------------------------
+class DatabaseTimelineBackend:
+    """Stores timelines in the TimelineEntry table."""
+
+    def add(self, owner_ids, post_id, created_at):
+        """Insert one post into many timelines."""
+        entries = [
+            TimelineEntry(owner_id=owner_id, post_id=post_id, created_at=created_at)
+            for owner_id in owner_ids
+        ]
+        TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    def extend(self, owner_id, items):
+        """Insert many (created_at, post_id) items into one timeline."""
+        entries = [
+            TimelineEntry(owner_id=owner_id, post_id=post_id, created_at=created_at)
+            for created_at, post_id in items
+        ]
+        TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    def fetch(self, owner_id, limit, before=None):
+        """Return up to ``limit`` (created_at, post_id) items, newest first."""
+        entries = TimelineEntry.objects.filter(owner_id=owner_id)
+        if before is not None:
+            entries = entries.filter(keyset_before(before, 'created_at', 'post_id'))
+        return list(
+            entries.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[:limit]
+        )
+
+    def remove_author(self, owner_id, author_id):
+        """Drop every post by ``author_id`` from one timeline (after unfollow)."""
+        TimelineEntry.objects.filter(owner_id=owner_id, post__user_id=author_id).delete()
+
+    def remove_post(self, post_id):
+        # Rows cascade with the Post, nothing else to do
+        pass
+
+    def trim(self, owner_id, length=MAX_LENGTH):
+        """Delete entries beyond the newest ``length`` for one timeline."""
+        boundary = list(
+            TimelineEntry.objects.filter(owner_id=owner_id)
+            .order_by('-created_at', '-post_id')
+            .values_list('created_at', 'post_id')[length:length + 1]
+        )
+        if boundary:
+            created_at, post_id = boundary[0]
+            TimelineEntry.objects.filter(owner_id=owner_id).filter(
+                keyset_before((created_at, post_id), 'created_at', 'post_id', inclusive=True)
+            ).delete()
+
+    def trim_many(self, owner_ids, length=MAX_LENGTH):
+        """Trim the timelines in ``owner_ids`` that have grown TRIM_SLACK past ``length``."""
+        over = (
+            TimelineEntry.objects.filter(owner_id__in=owner_ids)
+            .values('owner_id').annotate(entries=Count('pk')).order_by()
+            .filter(entries__gt=length + TRIM_SLACK)
+            .values_list('owner_id', flat=True)
+        )
+        for owner_id in list(over):
+            self.trim(owner_id, length)
+
+    def clear(self, owner_ids=None):
+        entries = TimelineEntry.objects.all()
+        if owner_ids is not None:
+            entries = entries.filter(owner_id__in=owner_ids)
+        entries.delete()
+
+
+class InMemoryTimelineBackend:
+    """
+    Process-local sorted-set stand-in, handy for tests and single-process
+    development. Each timeline is a list of (created_at, post_id) kept in
+    ascending order and capped at MAX_LENGTH.
+    """
+
+    def __init__(self):
+        self._timelines = {}
+        self._lock = threading.Lock()
+
+    def _insert(self, owner_id, item):
+        timeline = self._timelines.setdefault(owner_id, [])
+        index = bisect.bisect_left(timeline, item)
+        if index < len(timeline) and timeline[index] == item:
+            return
+        timeline.insert(index, item)
+        if len(timeline) > MAX_LENGTH:
+            del timeline[:len(timeline) - MAX_LENGTH]
+
+    def add(self, owner_ids, post_id, created_at):
+        with self._lock:
+            for owner_id in owner_ids:
+                self._insert(owner_id, (created_at, post_id))
+
+    def extend(self, owner_id, items):
+        with self._lock:
+            for item in items:
+                self._insert(owner_id, tuple(item))
+
+    def fetch(self, owner_id, limit, before=None):
+        with self._lock:
+            timeline = self._timelines.get(owner_id, [])
+            end = bisect.bisect_left(timeline, tuple(before)) if before is not None else len(timeline)
+            return timeline[max(0, end - limit):end][::-1]
+
+    def remove_author(self, owner_id, author_id):
+        post_ids = set(Post.objects.filter(user_id=author_id).values_list('id', flat=True))
+        with self._lock:
+            timeline = self._timelines.get(owner_id, [])
+            timeline[:] = [item for item in timeline if item[1] not in post_ids]
+
+    def remove_post(self, post_id):
+        with self._lock:
+            for timeline in self._timelines.values():
+                timeline[:] = [item for item in timeline if item[1] != post_id]
+
+    def trim(self, owner_id, length=MAX_LENGTH):
+        with self._lock:
+            timeline = self._timelines.get(owner_id, [])
+            if len(timeline) > length:
+                del timeline[:len(timeline) - length]
+
+    def trim_many(self, owner_ids, length=MAX_LENGTH):
+        for owner_id in owner_ids:
+            self.trim(owner_id, length)
+
+    def clear(self, owner_ids=None):
+        with self._lock:
+            if owner_ids is None:
+                self._timelines.clear()
+            else:
+                for owner_id in owner_ids:
+                    self._timelines.pop(owner_id, None)
+
+
+_backend = None
+
+
+def get_backend():
+    """Return the configured timeline backend (``TIMELINE_BACKEND`` setting)."""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'TIMELINE_BACKEND', 'socials.timeline.DatabaseTimelineBackend')
+        _backend = import_string(path)()
+    return _backend
+
+
+# ----------------------------
+#  Helpers
+# ----------------------------
+def pull_author_ids(user_id):
+    """IDs of followed authors whose posts are merged in at read time."""
+    followed = Follow.objects.filter(follower_id=user_id).values('following_id')
+    return list(
+        Profile.objects.filter(user_id__in=followed, follower_count__gt=FANOUT_MAX_FOLLOWERS)
+        .values_list('user_id', flat=True)
+    )
+
+
+def is_pull_author(author_id):
+    return Profile.objects.filter(user_id=author_id, follower_count__gt=FANOUT_MAX_FOLLOWERS).exists()
+
+
+# ----------------------------
+#  Write path
+# ----------------------------
+def _follower_batches(author_id):
+    """The author's follower ids, BATCH_SIZE at a time."""
+    follower_ids = Follow.objects.filter(following_id=author_id).values_list('follower_id', flat=True)
+    batch = []
+    for follower_id in follower_ids.iterator(chunk_size=BATCH_SIZE):
+        batch.append(follower_id)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def fan_out_post(post):
+    """Push a new post into its author's followers' timelines."""
+    if is_pull_author(post.user_id):
+        logger.debug(f"Skipping fan-out for {post.id}: author {post.user_id} is read-merged")
+        return 0
+
+    backend = get_backend()
+    written = 0
+    for batch in _follower_batches(post.user_id):
+        backend.add(batch, post.id, post.created_at)
+        backend.trim_many(batch)
+        written += len(batch)
+
+    logger.info(f"Fanned out post {post.id} to {written} timelines")
+    return written
+
+
+@task('timeline.fan_out_post')
+def fan_out_post_job(post_id):
+    post = Post.objects.filter(pk=post_id).only('id', 'user_id', 'created_at').first()
+    if post is not None:  # Deleted before the job ran
+        fan_out_post(post)
+
+
+def schedule_fan_out(post):
+    """Queue ``fan_out_post`` so the upload request does not wait on it."""
+    enqueue('timeline.fan_out_post', {'post_id': str(post.pk)}, key=f"timeline-fanout:{post.pk}")
+
+
+@task('timeline.reconcile_follow')
+@task('timeline.backfill_follow')  # Names queued before reconcile_follow existed
+@task('timeline.remove_follow')
+def reconcile_follow(follower_id, author_id, limit=BACKFILL_LENGTH):
+    """
+    Bring a follower's timeline in line with whether they follow the author
+    now: seed it with the author's recent posts, or drop them.
+
+    Follow and unfollow jobs can run in any order (retries, parallel
+    workers), so this reads the Follow row instead of trusting the job that
+    queued it. The row is checked again after seeding, so an unfollow that
+    commits while a backfill runs still ends with the posts removed.
+    """
+    follows = Follow.objects.filter(follower_id=follower_id, following_id=author_id)
+    if follows.exists():
+        if is_pull_author(author_id):
+            return
+        recent = Post.objects.filter(user_id=author_id).order_by('-created_at', '-id').values_list(
+            'created_at', 'id'
+        )[:limit]
+        backend = get_backend()
+        backend.extend(follower_id, list(recent))
+        backend.trim_many([follower_id])
+        if follows.exists():
+            return
+    get_backend().remove_author(follower_id, author_id)
+
+
+def schedule_follow_change(follower_id, author_id):
+    """Queue the timeline update after a follow or unfollow."""
+    enqueue('timeline.reconcile_follow', {'follower_id': follower_id, 'author_id': author_id})
+
+
+@task('timeline.materialize_author')
+def materialize_author(author_id, limit=BACKFILL_LENGTH):
+    """
+    Push an author's latest posts to every follower once they are no longer
+    read-merged, so posts from while they were do not drop out of timelines.
+    """
+    if is_pull_author(author_id):
+        return  # Back over the threshold already; reads merge the posts in
+    recent = list(
+        Post.objects.filter(user_id=author_id).order_by('-created_at', '-id').values_list('created_at', 'id')[:limit]
+    )
+    backend = get_backend()
+    for batch in _follower_batches(author_id):
+        for created_at, post_id in recent:
+            backend.add(batch, post_id, created_at)
+        backend.trim_many(batch)
+
+
+def follower_removed(author_id):
+    """
+    Called after each unfollow: when it takes the author down to
+    FANOUT_MAX_FOLLOWERS, the posts read-merging covered are materialized.
+    """
+    if not Profile.objects.filter(user_id=author_id, follower_count=FANOUT_MAX_FOLLOWERS).exists():
+        return
+    latest = Post.objects.filter(user_id=author_id).order_by('-created_at', '-id').values_list('id', flat=True).first()
+    if latest is not None:
+        # Keyed by the latest post: crossing again without new posts has nothing to add
+        enqueue('timeline.materialize_author', {'author_id': author_id}, key=f"timeline-materialize:{latest}")
+
+
+def remove_post(post_id):
+    get_backend().remove_post(post_id)
+
+
+def rebuild_timeline(user_id, length=MAX_LENGTH):
+    """Recompute one user's timeline from Follow and Post."""
+    backend = get_backend()
+    backend.clear([user_id])
+    pulled = set(pull_author_ids(user_id))
+    followed = Follow.objects.filter(follower_id=user_id).exclude(following_id__in=pulled).values('following_id')
+    recent = Post.objects.filter(user_id__in=followed).order_by('-created_at', '-id').values_list(
+        'created_at', 'id'
+    )[:length]
+    items = list(recent)
+    backend.extend(user_id, items)
+    return len(items)
+
+
+# ----------------------------
+#  Read path
+# ----------------------------
+def read_timeline(user, limit=20, before=None):
+    """
+    Return up to ``limit`` (created_at, post_id) items for the user's home
+    feed, merging pushed entries with posts from read-merged authors.
+    """
+    pushed = get_backend().fetch(user.id, limit, before=before)
+
+    pulled = []
+    pull_ids = pull_author_ids(user.id)
+    if pull_ids:
+        posts = Post.objects.filter(user_id__in=pull_ids)
+        if before is not None:
+            posts = posts.filter(keyset_before(before, 'created_at', 'id'))
+        pulled = list(posts.order_by('-created_at', '-id').values_list('created_at', 'id')[:limit])
+
+    items = []
+    seen = set()
+    # An author may have crossed the threshold after some posts were pushed
+    for item in heapq.merge(pushed, pulled, reverse=True):
+        if item[1] not in seen:
+            seen.add(item[1])
+            items.append(item)
+    return items[:limit]
+
+
+def timeline_posts(user, limit=20, before=None, queryset=None):
+    """
+    Resolve ``read_timeline`` into Post objects in timeline order, loaded
+    from ``queryset`` (defaults to posts with their authors' profiles).
+    """
+    items = read_timeline(user, limit=limit, before=before)
+    if not items:
+        return []
+    post_ids = [post_id for _, post_id in items]
+    if queryset is None:
+        queryset = Post.objects.select_related('user', 'user__profile')
+    posts = queryset.in_bulk(post_ids)
+    # Posts deleted since they were pushed simply drop out
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
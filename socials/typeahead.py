@@ -0,0 +1,220 @@
+# typeahead.py
+"""
+Username typeahead for the search box (``/search/suggest?q=``).
+
+An in-process prefix index over every username, ranked by follower count:
+
+    * lowercased usernames are kept sorted, with user ids, display names and
+      follower counts in parallel arrays, so the users under any prefix are
+      one contiguous slice found with two bisects
+    * every prefix covering more than ``LEAF_SIZE`` users (a heavy trie
+      node) caches its best ``MAX_RESULTS`` entries; lighter subtrees are
+      collapsed into their sorted slice and ranked on the fly
+
+A lookup is therefore a dict probe for short, busy prefixes and a partial
+sort of at most LEAF_SIZE entries otherwise, whatever the number of users.
+
+The index is built on first use from a streaming ``values_list`` scan and
+kept current by the User signals in models.py (signups, renames, deletes).
+Follower counts only move on the periodic rebuild (``TYPEAHEAD_REFRESH_INTERVAL``),
+which runs on a background thread while the old index keeps serving (see
+liveindex.py). Each process holds its own copy; changes made in another
+process show up at its next rebuild.
+"""
+import heapq
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .liveindex import LiveIndex
+
+MAX_RESULTS = 10
+LEAF_SIZE = getattr(settings, 'TYPEAHEAD_LEAF_SIZE', 256)
+REFRESH_INTERVAL = getattr(settings, 'TYPEAHEAD_REFRESH_INTERVAL', 10 * 60)  # seconds
+
+_MAX_CHAR = '\U0010ffff'  # Sorts after every character a prefix can be followed by
+
+
+class PrefixIndex:
+    """Sorted username arrays plus cached rankings for heavy prefixes."""
+
+    def __init__(self, rows=()):
+        """``rows`` is an iterable of (user_id, username, follower_count)."""
+        entries = sorted((username.lower(), user_id, username, count or 0) for user_id, username, count in rows)
+        self.keys = [key for key, _, _, _ in entries]
+        self.user_ids = array('q', (user_id for _, user_id, _, _ in entries))
+        # Most usernames are already lowercase; share the key string for those
+        self.names = [key if name == key else name for key, _, name, _ in entries]
+        self.counts = array('q', (count for _, _, _, count in entries))
+        self.key_by_id = {user_id: key for key, user_id, _, _ in entries}
+        self.cache = {}
+        self._lock = threading.Lock()
+        if self.keys:
+            self._cache_heavy(0, len(self.keys), 0)
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Entries sort best first: most followers, then alphabetically
+    def _entry(self, i):
+        return (-self.counts[i], self.keys[i], self.user_ids[i], self.names[i])
+
+    def _range(self, prefix):
+        lo = bisect_left(self.keys, prefix)
+        return lo, bisect_left(self.keys, prefix + _MAX_CHAR, lo)
+
+    def _rank(self, lo, hi):
+        return heapq.nsmallest(MAX_RESULTS, map(self._entry, range(lo, hi)))
+
+    def _cache_heavy(self, lo, hi, depth):
+        """
+        Cache the ranking of every heavy prefix within ``keys[lo:hi]`` (which
+        share their first ``depth`` characters). Returns the slice's ranking.
+        """
+        if hi - lo <= LEAF_SIZE:
+            return self._rank(lo, hi)
+        prefix = self.keys[lo][:depth]
+        candidates = []
+        i = lo
+        while i < hi and len(self.keys[i]) == depth:  # The prefix itself sorts first
+            candidates.append(self._entry(i))
+            i += 1
+        while i < hi:
+            j = bisect_left(self.keys, self.keys[i][:depth + 1] + _MAX_CHAR, i, hi)
+            candidates.extend(self._cache_heavy(i, j, depth + 1))
+            i = j
+        ranking = heapq.nsmallest(MAX_RESULTS, candidates)
+        if depth:
+            self.cache[prefix] = ranking
+        return ranking
+
+    # ----------------------------
+    #  Reads
+    # ----------------------------
+    def suggest(self, prefix, limit=MAX_RESULTS):
+        """``[(user_id, username, follower_count), ...]`` for usernames starting with ``prefix``."""
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        with self._lock:
+            ranking = self.cache.get(prefix)
+            if ranking is None:
+                ranking = self._rank(*self._range(prefix))
+            ranking = ranking[:limit]
+            # Someone typing a full username wants that user first
+            i = bisect_left(self.keys, prefix)
+            if i < len(self.keys) and self.keys[i] == prefix:
+                exact = self._entry(i)
+                ranking = [exact] + [entry for entry in ranking if entry != exact][:limit - 1]
+        return [(user_id, name, -negative_count) for negative_count, _, user_id, name in ranking]
+
+    # ----------------------------
+    #  Incremental updates
+    # ----------------------------
+    def add(self, user_id, username, count=0):
+        with self._lock:
+            self._remove(user_id)
+            key = username.lower()
+            i = bisect_right(self.keys, key)
+            self.keys.insert(i, key)
+            self.user_ids.insert(i, user_id)
+            self.names.insert(i, key if username == key else username)
+            self.counts.insert(i, count)
+            self.key_by_id[user_id] = key
+
+            entry = self._entry(i)
+            for depth in range(1, len(key) + 1):
+                prefix = key[:depth]
+                ranking = self.cache.get(prefix)
+                if ranking is not None:
+                    if len(ranking) < MAX_RESULTS or entry < ranking[-1]:
+                        insort(ranking, entry)
+                        del ranking[MAX_RESULTS:]
+                    continue
+                lo, hi = self._range(prefix)
+                if hi - lo <= LEAF_SIZE:
+                    break  # Longer prefixes cover even fewer users
+                self.cache[prefix] = self._rank(lo, hi)
+
+    def remove(self, user_id):
+        with self._lock:
+            self._remove(user_id)
+
+    def _remove(self, user_id):
+        key = self.key_by_id.pop(user_id, None)
+        if key is None:
+            return None
+        i = bisect_left(self.keys, key)
+        while self.user_ids[i] != user_id:  # Usernames differing only in case share a key
+            i += 1
+        count = self.counts[i]
+        del self.keys[i], self.user_ids[i], self.names[i], self.counts[i]
+
+        for depth in range(1, len(key) + 1):
+            prefix = key[:depth]
+            ranking = self.cache.get(prefix)
+            if ranking is None:
+                break
+            if any(entry[2] == user_id for entry in ranking):
+                # Rare (a top account left): rescan the prefix's slice
+                self.cache[prefix] = self._rank(*self._range(prefix))
+        return count
+
+    def rename(self, user_id, username):
+        """Re-key ``user_id`` under ``username``, or add it if new."""
+        if self.key_by_id.get(user_id) == username.lower():
+            with self._lock:
+                i = bisect_left(self.keys, username.lower())
+                while self.user_ids[i] != user_id:
+                    i += 1
+                self.names[i] = username
+            return
+        with self._lock:
+            count = self._remove(user_id)
+        self.add(user_id, username, count or 0)
+
+    @classmethod
+    def from_db(cls, chunk_size=10000):
+        rows = (
+            User.objects.order_by()
+            .values_list('id', 'username', 'profile__follower_count')
+            .iterator(chunk_size=chunk_size)
+        )
+        return cls(rows)
+
+
+# ----------------------------
+#  Process-wide index
+# ----------------------------
+def _apply(index, user_id, username):
+    if username is None:
+        index.remove(user_id)
+    else:
+        index.rename(user_id, username)
+
+
+_live = LiveIndex('typeahead', PrefixIndex.from_db, _apply, REFRESH_INTERVAL)
+
+
+def get_index():
+    """The process's index, building it on first use and refreshing it in the background."""
+    return _live.get()
+
+
+def user_saved(user):
+    _live.record(user.pk, user.username)
+
+
+def user_deleted(user_id):
+    _live.record(user_id, None)
+
+
+def suggest(query, limit=MAX_RESULTS):
+    """Up to ``limit`` users whose username starts with ``query``, most followed first."""
+    query = (query or '').strip()
+    if not query:
+        return []
+    return get_index().suggest(query, max(1, min(limit, MAX_RESULTS)))
@@ -0,0 +1,39 @@
+# uploadhandlers.py
+"""
+Upload handlers that hash each file while Django parses the request body.
+
+Django hands every chunk of an uploaded file to its upload handlers as it
+reads the multipart stream. These subclasses of the stock handlers feed the
+chunks they keep into SHA-256 as well, so ``upload.sha256`` is ready when the
+view runs, with no second pass over a 12 MB video. media.py uses it to find
+an already-uploaded copy of the same bytes (see MediaBlob).
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashingMixin:
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()  # Before super(): the memory handler raises StopFutureHandlers
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        passed_on = super().receive_data_chunk(raw_data, start)
+        if passed_on is None:  # This handler kept the chunk
+            self.sha256.update(raw_data)
+        return passed_on
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingMixin, TemporaryFileUploadHandler):
+    pass
@@ -9,6 +9,7 @@ urlpatterns = [
     path("logout", views.logout, name="logout"),
     path("profile/<str:pk>", views.profile, name="profile"),
     path("upload", views.upload, name="upload"),
+    path("feed", views.feed, name="feed"),
     path("post/<uuid:post_id>", views.post, name="post"),
     path("delete/<uuid:post_id>", views.delete, name="delete"),
     path("like_post/", views.like_post, name="like_post"),
@@ -16,11 +17,21 @@ urlpatterns = [
     path("comment/", views.comment, name="comment"),
     path("settings", views.settings, name="settings"),
     path("search", views.search, name="search"),
+    path("search/suggest", views.search_suggest, name="search_suggest"),
     path("debug/users", views.debug_users, name="debug_users"),
+    path("debug/jobs", views.job_metrics, name="job_metrics"),
+    path("debug/cache", views.cache_metrics, name="cache_metrics"),
+    path("debug/storage", views.storage_metrics, name="storage_metrics"),
+    path("debug/similar/<uuid:post_id>", views.similar_images, name="similar_images"),
     path("follow", views.follow, name="follow"),
+    path("follow/<int:user_id>", views.follow_toggle, name="follow_toggle"),
     path("notifications/delete/<int:notification_id>/", views.delete_notification, name="delete_notification"),
+    path("notifications/read/", views.read_notifications, name="mark_notifications_read"),
+    path("notifications/unread/", views.unread_notifications, name="unread_notifications"),
     path("layout", views.layout, name="layout"),
     path("saved/", views.saved, name="saved"),
+    path("tags/<str:tag>", views.tag_feed, name="tag_feed"),
+    path("mentions/<str:tag>", views.tag_feed, {"kind": "mention"}, name="mention_feed"),
     path("verify-otp/", views.verify_otp, name="verify_otp"),
     # path("auto-login/", views.auto_login, name="auto_login"),
     # path("resend-otp/", views.resend_otp, name="resend_otp"),
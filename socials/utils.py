@@ -1,16 +1,22 @@
 # utils.py
+import base64
+import mimetypes
 import os
+import threading
+import time
 import uuid
 import logging
-import tempfile
+
+import httpx
 from django.conf import settings
-from supabase import create_client, Client
 
 logger = logging.getLogger(__name__)
 
-# ✅ Initialize Supabase client
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-
+UPLOAD_TIMEOUT = getattr(settings, 'SUPABASE_UPLOAD_TIMEOUT', 60)  # seconds per request
+RESUMABLE_THRESHOLD = getattr(settings, 'SUPABASE_RESUMABLE_THRESHOLD', 6 * 1024 * 1024)  # bytes
+RESUMABLE_CHUNK_SIZE = 6 * 1024 * 1024  # Supabase's TUS endpoint requires 6 MB chunks
+RESUMABLE_MAX_RETRIES = 5
+STREAM_PIECE_SIZE = 64 * 1024  # Same as UploadedFile.chunks()
 
 # ----------------------------
 #  Filename + Folder Utilities
@@ -31,67 +37,229 @@ def get_bucket_folder(file_type: str) -> str:
     return mapping.get(file_type, "misc/")  # fallback folder
 
 
-def cleanup_temp_file(path: str) -> None:
-    """Remove temporary file if it exists."""
-    try:
-        if os.path.exists(path):
-            os.remove(path)
-            logger.debug(f"Deleted temp file: {path}")
-    except Exception as e:
-        logger.warning(f"Could not delete temp file {path}: {str(e)}")
+def public_url(path_in_bucket: str, bucket: str = None, base_url: str = None) -> str:
+    """Public URL of an object in the Supabase bucket."""
+    return (
+        f"{base_url or settings.SUPABASE_URL}/storage/v1/object/public/"
+        f"{bucket or settings.SUPABASE_BUCKET_NAME}/{path_in_bucket}"
+    )
+
+
+def guess_content_type(file) -> str:
+    return (
+        getattr(file, "content_type", None)
+        or mimetypes.guess_type(file.name)[0]
+        or "application/octet-stream"
+    )
+
+
+# ----------------------------
+#  Storage HTTP client
+# ----------------------------
+def make_storage_client(base_url: str, key: str, timeout: float = None) -> httpx.Client:
+    """HTTP client for the Supabase Storage API rooted at ``<base_url>/storage/v1``."""
+    return httpx.Client(
+        base_url=f"{base_url.rstrip('/')}/storage/v1",
+        headers={"apikey": key, "Authorization": f"Bearer {key}"},
+        timeout=httpx.Timeout(timeout or UPLOAD_TIMEOUT, connect=10.0),
+    )
+
+
+_storage_client = None
+_storage_client_lock = threading.Lock()
+
+
+def get_storage_client() -> httpx.Client:
+    """Shared client, created on first use, so uploads reuse pooled keep-alive connections."""
+    global _storage_client
+    if _storage_client is None:
+        with _storage_client_lock:
+            if _storage_client is None:
+                _storage_client = make_storage_client(
+                    settings.SUPABASE_URL, settings.SUPABASE_KEY,
+                    timeout=getattr(settings, 'MEDIA_STORAGE_TIMEOUT', None),
+                )
+    return _storage_client
 
 
 # ----------------------------
 #  Upload to Supabase
 # ----------------------------
-def upload_to_supabase(file, folder_key: str) -> str:
+def stream_upload(client: httpx.Client, bucket: str, path_in_bucket: str, file, content_type: str) -> None:
     """
-    Upload a file to Supabase storage and return its public URL.
-    
-    Args:
-        file: Django InMemoryUploadedFile (from request.FILES)
-        folder_key: 'profile', 'cover', or 'post'
-    
-    Returns:
-        str: Public URL of uploaded file
+    One request whose body is ``file.chunks()``: bytes go from Django's
+    upload buffer (memory or its own spooled temp file) straight to the socket.
     """
-    folder = get_bucket_folder(folder_key)
-    unique_name = generate_unique_filename(file.name)
-    path_in_bucket = f"{folder}{unique_name}"
+    response = client.post(
+        f"/object/{bucket}/{path_in_bucket}",
+        content=file.chunks(),
+        headers={
+            "Content-Type": content_type,
+            "Content-Length": str(file.size),
+            "Cache-Control": "max-age=3600",
+            "x-upsert": "false",
+        },
+    )
+    response.raise_for_status()
 
-    logger.debug(f"Uploading {file.name} -> {path_in_bucket}")
 
-    # Save temporarily
-    temp_dir = tempfile.gettempdir()
-    temp_path = os.path.join(temp_dir, unique_name)
+def object_exists(client: httpx.Client, bucket: str, path_in_bucket: str) -> bool:
+    response = client.head(f"/object/{bucket}/{path_in_bucket}")
+    return response.status_code == 200
 
-    try:
-        # Write file temporarily
-        with open(temp_path, "wb+") as temp_file:
-            for chunk in file.chunks():
-                temp_file.write(chunk)
 
-        # Upload to Supabase
-        res = supabase.storage.from_(settings.SUPABASE_BUCKET_NAME).upload(
-            path_in_bucket, temp_path, {"upsert": False}
-        )
+def delete_object(client: httpx.Client, bucket: str, path_in_bucket: str) -> None:
+    response = client.delete(f"/object/{bucket}/{path_in_bucket}")
+    if response.status_code != 404:  # Already gone is fine
+        response.raise_for_status()
+
 
-        if res is None:
-            raise Exception("Supabase upload failed, got None response")
+class ResumableUpload:
+    """
+    TUS 1.0.0 upload against Supabase's ``/upload/resumable`` endpoint.
+
+    The file is sent as RESUMABLE_CHUNK_SIZE requests, each streamed from the
+    upload buffer.
+    When a chunk fails (dropped connection, 5xx, offset conflict) the server
+    is asked how much it has (HEAD) and the upload continues from there, so
+    a flaky network never restarts a large video from zero.
+    """
 
-        logger.info(f"Uploaded file to Supabase: {path_in_bucket}")
+    def __init__(self, client, bucket, path_in_bucket, file, content_type,
+                 chunk_size=None, max_retries=None):
+        self.client = client
+        self.bucket = bucket
+        self.path = path_in_bucket
+        self.file = file
+        self.content_type = content_type
+        self.chunk_size = chunk_size or RESUMABLE_CHUNK_SIZE
+        self.max_retries = RESUMABLE_MAX_RETRIES if max_retries is None else max_retries
+        self.location = None
+        self.offset = 0
+        self.retries = 0
 
-        # Build public URL
-        public_url = (
-            f"{settings.SUPABASE_URL}/storage/v1/object/public/"
-            f"{settings.SUPABASE_BUCKET_NAME}/{path_in_bucket}"
-        )
+    def _metadata(self):
+        fields = {
+            "bucketName": self.bucket,
+            "objectName": self.path,
+            "contentType": self.content_type,
+            "cacheControl": "3600",
+        }
+        return ",".join(f"{name} {base64.b64encode(value.encode()).decode()}" for name, value in fields.items())
 
-        return public_url
+    def create(self):
+        response = self.client.post("/upload/resumable", headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": str(self.file.size),
+            "Upload-Metadata": self._metadata(),
+            "x-upsert": "false",
+        })
+        response.raise_for_status()
+        self.location = response.headers["Location"]
 
+    def server_offset(self):
+        response = self.client.head(self.location, headers={"Tus-Resumable": "1.0.0"})
+        response.raise_for_status()
+        return int(response.headers["Upload-Offset"])
+
+    def _read(self, length):
+        # Fed to the request piece by piece, so not even one chunk is held in memory
+        self.file.seek(self.offset)
+        while length > 0:
+            piece = self.file.read(min(length, STREAM_PIECE_SIZE))
+            if not piece:
+                break
+            length -= len(piece)
+            yield piece
+
+    def send_chunk(self):
+        length = min(self.chunk_size, self.file.size - self.offset)
+        response = self.client.patch(self.location, content=self._read(length), headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Offset": str(self.offset),
+            "Content-Length": str(length),
+            "Content-Type": "application/offset+octet-stream",
+        })
+        response.raise_for_status()
+        self.offset = int(response.headers["Upload-Offset"])
+
+    def run(self):
+        if self.location is None:
+            self.create()
+        while self.offset < self.file.size:
+            try:
+                self.send_chunk()
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                self.retries += 1
+                if self.retries > self.max_retries:
+                    raise
+                logger.warning(f"Resumable upload of {self.path} failed at {self.offset} bytes, resuming: {str(e)}")
+                time.sleep(min(2 ** self.retries * 0.25, 5))
+                self.offset = self.server_offset()
+        return self.path
+
+
+def put_object(client: httpx.Client, bucket: str, folder: str, file, resumable: bool = None) -> str:
+    """
+    Upload ``file`` into ``folder`` ("post_media/") of ``bucket`` and return
+    its path in the bucket.
+
+    Nothing is copied to local disk: small files stream from the request's
+    upload buffer in one request, files of RESUMABLE_THRESHOLD bytes or more
+    (or with ``resumable=True``) go through the resumable chunked protocol.
+
+    Files hashed by the upload handlers (``file.sha256``) are stored under
+    their hash, so the same bytes uploaded again cost one HEAD request.
+    """
+    sha256 = getattr(file, "sha256", None)
+    if sha256:
+        filename = f"{sha256}{os.path.splitext(file.name)[1].lower()}"
+    else:
+        filename = generate_unique_filename(file.name)
+    path_in_bucket = f"{folder}{filename}"
+    content_type = guess_content_type(file)
+    if resumable is None:
+        resumable = file.size >= RESUMABLE_THRESHOLD
+
+    if sha256 and object_exists(client, bucket, path_in_bucket):
+        logger.info(f"Supabase already has {path_in_bucket}; skipped upload of {file.size} bytes")
+        return path_in_bucket
+
+    logger.debug(f"Uploading {file.name} -> {path_in_bucket} ({file.size} bytes, resumable={resumable})")
+    try:
+        if resumable:
+            ResumableUpload(client, bucket, path_in_bucket, file, content_type).run()
+        else:
+            stream_upload(client, bucket, path_in_bucket, file, content_type)
+    except httpx.HTTPStatusError as e:
+        if not (sha256 and e.response.status_code == 409):
+            logger.error(f"Supabase upload failed: {str(e)}")
+            raise
+        # A concurrent upload of the same bytes finished first; its object is ours too
     except Exception as e:
         logger.error(f"Supabase upload failed: {str(e)}")
         raise
 
-    finally:
-        cleanup_temp_file(temp_path)
+    logger.info(f"Uploaded file to Supabase: {path_in_bucket}")
+    return path_in_bucket
+
+
+def upload_to_supabase(file, folder_key: str, resumable: bool = None, client: httpx.Client = None) -> str:
+    """
+    Upload a file to Supabase storage and return its public URL (see
+    put_object; storage.SupabaseStorage is the MEDIA_STORAGE backend).
+
+    Args:
+        file: Django UploadedFile (from request.FILES)
+        folder_key: 'profile', 'cover', or 'post'
+        resumable: force (True) or disable (False) chunked mode
+        client: storage HTTP client (defaults to the shared one)
+
+    Returns:
+        str: Public URL of uploaded file
+    """
+    bucket = settings.SUPABASE_BUCKET_NAME
+    path_in_bucket = put_object(
+        client or get_storage_client(), bucket, get_bucket_folder(folder_key), file, resumable=resumable,
+    )
+    return public_url(path_in_bucket, bucket)
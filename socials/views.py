@@ -3,115 +3,73 @@ from django.http import JsonResponse
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout as auth_logout
 from django.contrib.auth.models import User
-from .models import Profile, Post, LikePost, Comment, Follow, Notification
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .models import Profile, Post, Comment, Follow, Notification, media_type_for, validate_media_file
 from django.contrib.auth.decorators import login_required
 import random
 from .utils import logger
+from . import counters, media, neardup, realtime, sidebar, storage, tags, timeline, typeahead
+from . import search as search_index
+from .comments import attach_comment_previews
+from .emails import queue_otp_email
+from .jobs import queue_metrics
+from .notifications import (
+    create_comment_notification, create_like_notification, create_post_notification,
+    create_unlike_notification,
+    delete_notifications, mark_notifications_read, unread_notification_count,
+)
+from .follows import toggle_follow
+from .likes import toggle_like
+from .querysets import with_viewer_state
+from .suggestions import suggestions_for
+from .pagination import PAGE_SIZE, clamp_page_size, decode_cursor, keyset_page, page_from_rows
 from django.views.decorators.csrf import csrf_exempt
-# Send OTP
 from django.template.loader import render_to_string
-from django.core.mail import EmailMessage
 
 def get_shared_context(user):
     """Get shared context data for suggestions and notifications."""
-    # Get suggested users (optimized version)
-    followed_users = Follow.objects.filter(follower=user).values_list('following', flat=True)
-    suggestions = User.objects.select_related('profile').exclude(
-        id=user.id
-    ).exclude(id__in=followed_users)[:5]
-
-    # Get recent notifications for the sidebar
-    notifications = Notification.objects.filter(
-        recipient=user
-    ).select_related('sender', 'sender__profile', 'post').order_by('-created_at')[:10]
-
-    return {
-        "suggestions": suggestions,
-        "notifications": notifications
-    }
-
-# Notification Helper Functions
-def create_notification(recipient, sender, notification_type, post=None, comment=None):
-    """Create a notification with automatic duplicate prevention."""
-    if recipient == sender:
-        return  # Don't notify users about their own actions
-    
-    # Remove existing notification of the same type for the same post (if applicable)
-    if post:
-        Notification.objects.filter(
-            recipient=recipient,
-            sender=sender,
-            notification_type=notification_type,
-            post=post
-        ).delete()
-    
-    # Create new notification
-    Notification.objects.create(
-        recipient=recipient,
-        sender=sender,
-        notification_type=notification_type,
-        post=post,
-        comment=comment
-    )
-
-def create_post_notification(post):
-    """Create notification when a new post is created - notify followers."""
-    # Get all followers of the post author
-    followers = Follow.objects.filter(following=post.user).select_related('follower')
-    
-    # Create notifications for each follower
-    for follow_relationship in followers:
-        create_notification(
-            recipient=follow_relationship.follower,  # The follower gets notified
-            sender=post.user,                       # The post author is the sender
-            notification_type='post',
-            post=post
-        )
-
-def create_like_notification(post, user):
-    """Create notification when someone likes a post."""
-    create_notification(
-        recipient=post.user,
-        sender=user,
-        notification_type='like',
-        post=post
-    )
-
-def create_unlike_notification(post, user):
-    """Create notification when someone unlikes a post."""
-    create_notification(
-        recipient=post.user,
-        sender=user,
-        notification_type='unlike',
-        post=post
-    )
-
-def create_comment_notification(post, user, comment):
-    """Create notification when someone comments on a post."""
-    create_notification(
-        recipient=post.user,
-        sender=user,
-        notification_type='comment',
-        post=post,
-        comment=comment
-    )
-
-def create_follow_notification(following_user, follower_user):
-    """Create notification when someone follows a user."""
-    create_notification(
-        recipient=following_user,
-        sender=follower_user,
-        notification_type='follow'
-    )
+    # Cached per user and invalidated on follow/notification events (see sidebar.py)
+    return sidebar.shared_context(user)
+
+# Post lists that support cursor pagination (see get_feed_page)
+FEED_SOURCES = ('home', 'discover', 'profile', 'saved', 'tag')
+TAG_KINDS = {'hashtag': '#', 'mention': '@'}  # Kind -> prefix shown in captions
+
+def get_feed_page(user, source, cursor=None, limit=PAGE_SIZE, owner=None, tag=None):
+    """
+    Return one page of posts as (posts, next_cursor), newest first.
+
+    ``source`` is one of FEED_SOURCES; ``owner`` is the profile owner for 'profile'
+    and ``tag`` a (kind, tag) pair for 'tag'.
+    """
+    # is_liked / is_saved are EXISTS probes for just the rows on this page
+    base = with_viewer_state(Post.objects.select_related('user', 'user__profile'), user)
+
+    if source == 'home':
+        # The materialized timeline already yields (created_at, id) order
+        posts = timeline.timeline_posts(user, limit=limit + 1, before=cursor, queryset=base)
+        posts, next_cursor = page_from_rows(posts, limit)
+    elif source == 'tag':
+        # Walks the (kind, tag, -created_at) index instead of scanning captions
+        posts = tags.tagged_posts(*tag, limit=limit + 1, before=cursor, queryset=base)
+        posts, next_cursor = page_from_rows(posts, limit)
+    else:
+        if source == 'discover':
+            queryset = base.exclude(user=user)
+        elif source == 'profile':
+            queryset = base.filter(user=owner)
+        elif source == 'saved':
+            queryset = base.filter(saved_by__user=user)
+        else:
+            raise ValueError(f"Unknown feed source: {source}")
+        posts, next_cursor = keyset_page(queryset, cursor, limit)
 
-def create_unfollow_notification(following_user, follower_user):
-    """Create notification when someone unfollows a user."""
-    create_notification(
-        recipient=following_user,
-        sender=follower_user,
-        notification_type='unfollow'
-    )
+    # Only the latest few comments per post, in one query for the whole page
+    attach_comment_previews(posts)
+    counters.merge_pending(posts)  # Include like/comment deltas not flushed yet
 
+    return posts, next_cursor
 
 def signup(request):
     signup_errors = []
@@ -167,16 +125,8 @@ def signup(request):
         )
         request.session['otp_email'] = email
 
-        # Send OTP email
-        html_message = render_to_string('emails/otp_email.html', {'otp': otp_code})
-        email_message = EmailMessage(
-            subject="Your OTP Code",
-            body=html_message,
-            from_email=None,  # Uses DEFAULT_FROM_EMAIL from settings
-            to=[email]
-        )
-        email_message.content_subtype = "html"  # Send as HTML
-        email_message.send()
+        # Send OTP email (queued, so a slow SMTP relay doesn't hold the request)
+        queue_otp_email(email, otp_code)
 
         # Redirect to verify_otp page
         return render(request, "verify_otp.html", {"email": email})
@@ -262,17 +212,13 @@ def new_home(request):
     # Get or create user profile (handles case where profile doesn't exist)
     user_profile, created = Profile.objects.select_related('user').get_or_create(user=request.user)
 
-    # Get posts with optimized queries using select_related and prefetch_related
-    posts = Post.objects.exclude(user=request.user).select_related('user', 'user__profile').prefetch_related(
-        'comments__username__profile'  # Prefetch comments and their authors to avoid N+1 queries
-    ).order_by('-created_at')[:20]  # Limit to 20 posts for better performance
-    
-    # Get the list of post IDs that the current user has liked
-    liked_post_ids = LikePost.objects.filter(username=request.user).values_list('post_id', flat=True)
-    
-    # Add post_comments attribute for template compatibility
-    for post in posts:
-        post.post_comments = post.comments.all()  # Use prefetched data
+    # Read the user's materialized timeline (one range scan over their own entries)
+    feed_source = 'home'
+    posts, next_cursor = get_feed_page(request.user, feed_source)
+    if not posts:
+        # Cold start: nobody followed yet, show the global recent feed instead
+        feed_source = 'discover'
+        posts, next_cursor = get_feed_page(request.user, feed_source)
     
     # Get shared context data (suggestions and notifications)
     shared_context = get_shared_context(request.user)
@@ -280,8 +226,9 @@ def new_home(request):
     context_data = {
         "user_profile": user_profile, 
         "posts": posts, 
-        "liked_post_ids": liked_post_ids,
-        "created_at": posts[0].created_at.strftime("%Y-%m-%d %H:%M:%S") if posts else None
+        "created_at": posts[0].created_at.strftime("%Y-%m-%d %H:%M:%S") if posts else None,
+        "feed_source": feed_source,
+        "next_cursor": next_cursor,
     }
     # Add shared context data
     context_data.update(shared_context)
@@ -291,16 +238,18 @@ def new_home(request):
 #View a single post with its details
 @login_required(login_url='signin')
 def post(request, post_id):
-    post = get_object_or_404(Post.objects.select_related('user', 'user__profile').prefetch_related(
-        'comments__username__profile',  # Prefetch comments and their authors
-        'likes'  # Prefetch likes to optimize like count retrieval
-    ), id=post_id)
+    post = get_object_or_404(
+        with_viewer_state(Post.objects.select_related('user', 'user__profile'), request.user),
+        id=post_id,
+    )
     
-    # Check if the current user has liked this post
-    liked = LikePost.objects.filter(post_id=post, username=request.user).exists()
+    # Whether the current user has liked this post (annotated EXISTS, no like rows loaded)
+    liked = post.is_liked
     
     # Get all comments for the post
     comments = post.comments.all().select_related('username', 'username__profile').order_by('created_at')
+    post.post_comments = comments  # The detail page shows the full thread
+    counters.merge_pending([post])
     
     # Get or create user profile (handles case where profile doesn't exist)
     user_profile, created = Profile.objects.select_related('user').get_or_create(user=request.user)
@@ -321,6 +270,44 @@ def post(request, post_id):
 
     return render(request, "post_detail.html", context)
 
+@login_required(login_url='signin')
+def feed(request):
+    """Return the next page of a post list as rendered cards (infinite scroll)."""
+    source = request.GET.get("source", "home")
+    if source not in FEED_SOURCES:
+        return JsonResponse({"success": False, "error": "Unknown feed"}, status=400)
+
+    token = request.GET.get("cursor")
+    cursor = decode_cursor(token)
+    if token and cursor is None:
+        return JsonResponse({"success": False, "error": "Invalid cursor"}, status=400)
+
+    owner = tag = None
+    if source == "profile":
+        owner = get_object_or_404(User, username=request.GET.get("username"))
+    elif source == "tag":
+        kind = request.GET.get("kind", "hashtag")
+        if kind not in TAG_KINDS or not request.GET.get("tag"):
+            return JsonResponse({"success": False, "error": "Unknown tag"}, status=400)
+        tag = (kind, request.GET["tag"])
+
+    limit = clamp_page_size(request.GET.get("limit"))
+    posts, next_cursor = get_feed_page(request.user, source, cursor=cursor, limit=limit, owner=owner, tag=tag)
+    html = "".join(
+        render_to_string("components/post_card.html", {
+            "post": post,
+            "show_delete_option": source != "saved",
+            "show_comments": True,
+        }, request=request)
+        for post in posts
+    )
+    return JsonResponse({
+        "success": True,
+        "html": html,
+        "count": len(posts),
+        "next_cursor": next_cursor,
+    })
+
 @login_required(login_url='signin')
 def logout(request):
     auth_logout(request)
@@ -338,22 +325,46 @@ def upload(request):
             messages.error(request, "File size too large. Please select a file smaller than 12MB.")
             return redirect("new_home")
 
+        if media_file:
+            try:
+                validate_media_file(media_file)
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
+                return redirect("new_home")
+
         # Check if there’s content
         if caption or media_file:
+            spooled = None
             try:
-                new_post = Post.objects.create(
-                    user=request.user,
-                    caption=caption,
-                    media=media_file if media_file else None,
-                )
-
-                logger.info(f"Post created: {new_post.id}, Media: {new_post.media}")
-
-                create_post_notification(new_post)
-
-                messages.success(request, "Post uploaded successfully!")
+                # The remote upload happens in a media.ingest job (see media.py);
+                # the request only copies the file to the local spool
+                if media_file:
+                    sha256 = media.content_hash(media_file)  # Usually already computed by the upload handler
+                    spooled = media.spool(media_file)
+
+                # Post row, author's post_count and the fan-out jobs commit together
+                with transaction.atomic():
+                    new_post = Post.objects.create(
+                        user=request.user,
+                        caption=caption,
+                        media_type=media_type_for(media_file.name) if media_file else "",
+                        media_status="pending" if media_file else "ready",
+                    )
+                    if spooled:
+                        media.schedule_ingest(new_post, spooled, media_file.name, sha256)
+
+                    logger.info(f"Post created: {new_post.id}, Media: {media_file.name if media_file else None}")
+
+                    timeline.schedule_fan_out(new_post)
+                    create_post_notification(new_post)
+
+                if media_file:
+                    messages.success(request, "Post shared! Your media will appear once it finishes uploading.")
+                else:
+                    messages.success(request, "Post uploaded successfully!")
 
             except Exception as e:
+                media.discard(spooled)
                 logger.error(f"Upload failed: {str(e)}")
                 messages.error(request, "An error occurred while uploading. Please try again.")
         else:
@@ -368,7 +379,10 @@ def delete(request, post_id):
     """Delete a post created by the user."""
     if request.method == "POST":  
         post = get_object_or_404(Post, id=post_id, user=request.user)
-        post.delete()
+        with transaction.atomic():
+            timeline.remove_post(post.id)
+            delete_notifications(Notification.objects.filter(post=post))  # Keeps unread counters right
+            post.delete()
         messages.success(request, "Post deleted successfully.")
     return redirect('profile', pk=request.user.username)
 
@@ -376,10 +390,11 @@ def delete(request, post_id):
 def profile(request, pk):
     user_object = get_object_or_404(User, username=pk)
     user_profile, created = Profile.objects.get_or_create(user=user_object)
-    posts = Post.objects.filter(user=user_object).order_by('-created_at')
-    post_count = posts.count()
-    follower_count = Follow.objects.filter(following=user_object).count()
-    following_count = Follow.objects.filter(follower=user_object).count()
+    posts, next_cursor = get_feed_page(request.user, 'profile', owner=user_object)
+    # Denormalized on Profile (kept by signals), so no COUNT(*) per view
+    post_count = user_profile.post_count
+    follower_count = user_profile.follower_count
+    following_count = user_profile.following_count
     is_following = False
     if request.user.is_authenticated:
         is_following = Follow.objects.filter(follower=request.user, following=user_object).exists()
@@ -393,6 +408,8 @@ def profile(request, pk):
         'follower_count': follower_count,
         'following_count': following_count,
         'is_following': is_following,
+        'feed_source': 'profile',
+        'next_cursor': next_cursor,
     }
     context.update(shared_context)
     return render(request, 'profile.html', context)
@@ -402,17 +419,8 @@ def saved(request):
     """Display all saved posts for the current user."""
     user_profile, created = Profile.objects.get_or_create(user=request.user)
     
-    # Get all saved posts with optimized queries
-    saved_posts = user_profile.saved_posts.select_related('user', 'user__profile').prefetch_related(
-        'comments__username__profile'
-    ).order_by('-created_at')
-    
-    # Add post_comments attribute for template compatibility
-    for post in saved_posts:
-        post.post_comments = post.comments.all()
-    
-    # Get liked posts for current user
-    liked_post_ids = LikePost.objects.filter(username=request.user).values_list('post_id', flat=True)
+    # Get the first page of saved posts; later pages come from the feed endpoint
+    saved_posts, next_cursor = get_feed_page(request.user, 'saved')
     
     # Get shared context data (suggestions and notifications)
     shared_context = get_shared_context(request.user)
@@ -420,8 +428,9 @@ def saved(request):
     context = {
         "user_profile": user_profile,
         "posts": saved_posts,
-        "liked_post_ids": liked_post_ids,
-        "page_title": "Saved Posts"
+        "page_title": "Saved Posts",
+        "feed_source": "saved",
+        "next_cursor": next_cursor,
     }
     
     # Add shared context data
@@ -429,6 +438,25 @@ def saved(request):
     
     return render(request, "saved.html", context)
 
+@login_required(login_url='signin')
+def tag_feed(request, tag, kind='hashtag'):
+    """Posts tagged #tag (or mentioning @tag), newest first."""
+    user_profile, created = Profile.objects.get_or_create(user=request.user)
+    tag = tags.normalize_tag(tag)
+    posts, next_cursor = get_feed_page(request.user, 'tag', tag=(kind, tag))
+
+    context = {
+        "user_profile": user_profile,
+        "posts": posts,
+        "page_title": f"{TAG_KINDS[kind]}{tag}",
+        "feed_source": "tag",
+        "tag": tag,
+        "tag_kind": kind,
+        "next_cursor": next_cursor,
+    }
+    context.update(get_shared_context(request.user))
+    return render(request, "tag.html", context)
+
 @login_required(login_url='signin')
 def settings(request):
     try:
@@ -444,28 +472,43 @@ def settings(request):
         profilepic = request.FILES.get("image")
         cover_photo = request.FILES.get("cover_photo")
 
-        # a user creating a new profile if it doesn't exist
-        if not user_profile:
-            user_profile = Profile.objects.create(
-                user=request.user,
-                works_at=works_at,
-                occupation=occupation,
-                bio=bio,
-                location=location,
-                profilepic=profilepic if profilepic else "blank-profile-picture.png",
-                cover_photo=cover_photo if cover_photo else ""
-            )
-        # If the profile already exists, update the fields
-        else:
-            if profilepic:
-                user_profile.profilepic = profilepic
+        # Uploads happen before the transaction, which then only links them
+        if cover_photo:
+            cover_photo = Profile._meta.get_field('cover_photo').upload(cover_photo)
+        # Reuses the stored copy when these bytes were uploaded before
+        profilepic_blob = media.prepare_profile_picture(profilepic) if profilepic else None
+
+        try:
+            with transaction.atomic():
+                # a user creating a new profile if it doesn't exist
+                if not user_profile:
+                    user_profile = Profile(
+                        user=request.user,
+                        works_at=works_at,
+                        occupation=occupation,
+                        bio=bio,
+                        location=location,
+                        profilepic="blank-profile-picture.png",
+                        cover_photo=cover_photo if cover_photo else ""
+                    )
+                # If the profile already exists, update the fields
+                else:
+                    if cover_photo:
+                        user_profile.cover_photo = cover_photo
+                    user_profile.works_at = works_at
+                    user_profile.occupation = occupation
+                    user_profile.bio = bio
+                    user_profile.location = location
+                if profilepic_blob:
+                    media.assign_profile_picture(user_profile, profilepic_blob, profilepic)
+                user_profile.save()
+        except Exception:
+            # Nothing points at the new uploads; drop them
+            if profilepic_blob:
+                media.release(profilepic_blob.pk)
             if cover_photo:
-                user_profile.cover_photo = cover_photo
-            user_profile.works_at = works_at
-            user_profile.occupation = occupation
-            user_profile.bio = bio
-            user_profile.location = location
-            user_profile.save()
+                media.destroy(cover_photo)
+            raise
         messages.success(request, "Profile updated successfully!")
         return redirect('settings')
     return render(request, "setting.html", {"user_profile": user_profile})
@@ -475,32 +518,24 @@ def like_post(request):
     if request.method == "POST":
         post_id = request.POST.get("post_id")
         try:
-            post = Post.objects.get(id=post_id)
-        except Post.DoesNotExist:
+            post = Post.objects.only('id', 'user_id', 'no_of_likes').get(id=post_id)
+        except (Post.DoesNotExist, ValidationError):
             return JsonResponse({"success": False, "error": "Post not found"}, status=404)
-            
-        liked = LikePost.objects.filter(post_id=post, username=request.user).exists()
-        if liked:
-            # Unlike the post
-            LikePost.objects.filter(post_id=post, username=request.user).delete()
-            post.no_of_likes = max(0, post.no_of_likes - 1)
-            
-            # Create unlike notification
-            create_unlike_notification(post, request.user)
-        else:
-            # Like the post
-            LikePost.objects.create(post_id=post, username=request.user)
-            post.no_of_likes += 1
-            
-            # Create like notification
-            create_like_notification(post, request.user)
-        
-        post.save()
+
+        # Single transaction, conflict-tolerant insert/delete and an F() counter update
+        result = toggle_like(post, request.user)
+
+        if result.changed:
+            if result.liked:
+                create_like_notification(post, request.user)
+            else:
+                create_unlike_notification(post, request.user)
+            realtime.push_like_count(post.id, result.like_count)
         
         return JsonResponse({
             "success": True, 
-            "liked": not liked, 
-            "like_count": post.no_of_likes
+            "liked": result.liked, 
+            "like_count": result.like_count
         })
     return JsonResponse({"success": False, "error": "Invalid request"}, status=400)
 
@@ -545,6 +580,7 @@ def comment(request):
                 "profile_pic": profile_pic_url
             }
         }
+        realtime.push_comment(post.id, comment_data["comment"])
         return JsonResponse(comment_data)
     return JsonResponse({"success": False, "error": "Invalid request method"}, status=405)
 
@@ -583,59 +619,86 @@ def save_post(request):
 
 @login_required(login_url='signin')
 def suggested_users(request):
-    user = request.user
-    
-    # Get users who are not the current user and not already followed
-    followed_users = Follow.objects.filter(follower=user).values_list('following', flat=True)
-    potential_users = User.objects.exclude(id=user.id).exclude(id__in=followed_users).select_related('profile')
-    
-    # Limit to 5 suggestions
-    suggestions = list(potential_users[:5])
-    random.shuffle(suggestions)  # Shuffle to randomize suggestions
-
+    suggestions = suggestions_for(request.user)
     return render(request, "new_home.html", {"suggestions": suggestions})
 
+SEARCH_TYPES = {'people': 'user', 'posts': 'post'}
+
 @login_required(login_url='signin')
 def search(request):
-    user_object = User.objects.get(username=request.user.username)
+    user_profile, _ = Profile.objects.get_or_create(user=request.user)
+
+    # GET ?q= is the search form; POST username= is kept for old links and forms
+    query = (request.GET.get('q') or request.POST.get('username') or '').strip()
+    search_type = request.GET.get('type') if request.GET.get('type') in SEARCH_TYPES else 'people'
     try:
-        user_profile = Profile.objects.get(user=user_object)
-    except Profile.DoesNotExist:
-        user_profile = Profile.objects.create(user=user_object)
-    
-    username_profile_list = []
-    username = ""
+        page_number = int(request.GET.get('page', 1))
+    except ValueError:
+        page_number = 1
 
-    # Get shared context data (suggestions and notifications)
-    shared_context = get_shared_context(request.user)
+    # Ranked through the full-text index; profiles (or posts) arrive in one query
+    results = search_index.search(query, SEARCH_TYPES[search_type], page_number)
 
     context_data = {
-        "user_profile": user_profile, 
-        "username_profile_list": username_profile_list,
-        "username": username,
+        "user_profile": user_profile,
+        "username_profile_list": results.results if search_type == 'people' else [],
+        "post_results": results.results if search_type == 'posts' else [],
+        "username": query,
+        "search_type": search_type,
+        "page_number": results.number,
+        "has_next": results.has_next,
     }
-    
-    # Add shared context data
-    context_data.update(shared_context)
-    
-    if request.method == "POST":
-        username = request.POST.get("username")
-        
-        if username:
-            # Get users whose username contains the search term
-            username_object = User.objects.filter(username__icontains=username)
-            
-            # Get profiles for these users
-            for user in username_object:
-                try:
-                    profile = Profile.objects.get(user=user)
-                    username_profile_list.append(profile)
-                except Profile.DoesNotExist:
-                    # Skip users without profiles
-                    continue
-
+    context_data.update(get_shared_context(request.user))
     return render(request, "search.html", context_data)
 
+@login_required(login_url='signin')
+def search_suggest(request):
+    """Username typeahead: ``?q=`` prefix, most-followed matches first."""
+    results = [
+        {"id": user_id, "username": username, "follower_count": follower_count, "url": f"/profile/{username}"}
+        for user_id, username, follower_count in typeahead.suggest(request.GET.get('q', ''))
+    ]
+    return JsonResponse({"success": True, "results": results})
+
+@login_required(login_url='signin')
+def job_metrics(request):
+    """Queue depth and latency for the background job queue (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse({"success": False, "error": "Forbidden"}, status=403)
+    return JsonResponse({"success": True, "metrics": queue_metrics()})
+
+@login_required(login_url='signin')
+def cache_metrics(request):
+    """Sidebar cache hit ratio for this process (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse({"success": False, "error": "Forbidden"}, status=403)
+    return JsonResponse({"success": True, "sidebar": sidebar.stats()})
+
+@login_required(login_url='signin')
+def storage_metrics(request):
+    """Media storage call counts and latency for this process (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse({"success": False, "error": "Forbidden"}, status=403)
+    return JsonResponse({"success": True, "storage": storage.stats()})
+
+@login_required(login_url='signin')
+def similar_images(request, post_id):
+    """Posts whose image looks like this post's, for moderators (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse({"success": False, "error": "Forbidden"}, status=403)
+    post = get_object_or_404(Post, pk=post_id)
+    try:
+        distance = int(request.GET.get("distance", neardup.DISTANCE))
+        matches = neardup.similar_posts(post, k=distance)
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    results = [
+        {"post_id": str(match.pk), "username": match.user.username, "distance": d,
+         "url": match.media.url if match.media else "", "created_at": match.created_at.isoformat()}
+        for d, match in matches
+    ]
+    return JsonResponse({"success": True, "hashed": post.media_phash is not None, "results": results})
+
 def debug_users(request):
     users = User.objects.all()
     user_list = [{"username": user.username, "email": user.email} for user in users]
@@ -643,48 +706,67 @@ def debug_users(request):
 
 @login_required(login_url='signin')
 def follow(request):
-    if request.method == "POST":
-        following = request.POST.get("following")
-        follower = request.POST.get("follower")
-
-        following_user = User.objects.get(username=following)
-        follower_user = User.objects.get(username=follower)
-
-        if not Follow.objects.filter(follower__username=follower, following__username=following).exists():
-            # Follow the user
-            engage, created = Follow.objects.get_or_create(
-                follower=follower_user,
-                following=following_user
-            )
-            
-            # Create follow notification
-            create_follow_notification(following_user, follower_user)
-            
-            return redirect('profile', pk=following)
-        else:
-            # Unfollow the user
-            disengage = Follow.objects.filter(follower__username=follower, following__username=following)
-            disengage.delete()
-            
-            # Create unfollow notification
-            create_unfollow_notification(following_user, follower_user)
-            
-            return redirect('profile', pk=following)
-
+    """Form-based follow/unfollow (kept for non-JS clients); redirects back to the profile."""
+    following = request.POST.get("following") if request.method == "POST" else None
+    if not following:
+        return redirect('new_home')
+
+    following_user = get_object_or_404(User, username=following)
+    # The follower is always the signed-in user, whatever the form says
+    if following_user.pk != request.user.pk:
+        toggle_follow(request.user, following_user.pk)
     return redirect('profile', pk=following)
 
+@login_required(login_url='signin')
+def follow_toggle(request, user_id):
+    """Follow or unfollow ``user_id`` and return the new state as JSON."""
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "Invalid request"}, status=405)
+    try:
+        result = toggle_follow(request.user, user_id)
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    if result is None:
+        return JsonResponse({"success": False, "error": "User not found"}, status=404)
+    return JsonResponse({
+        "success": True,
+        "following": result.following,
+        "follower_count": result.follower_count,
+    })
+
 @login_required(login_url='signin')
 def delete_notification(request, notification_id):
     """Delete a specific notification."""
     if request.method == 'POST':
         try:
-            notification = Notification.objects.get(
+            deleted = delete_notifications(Notification.objects.filter(
                 id=notification_id,
                 recipient=request.user  # Ensure user can only delete their own notifications
-            )
-            notification.delete()
+            ))
+            if not deleted:
+                raise Notification.DoesNotExist
             return JsonResponse({'success': True, 'message': 'Notification deleted successfully.'})
         except Notification.DoesNotExist:
             return JsonResponse({'success': False, 'message': 'Notification not found.'}, status=404)
     
-    return JsonResponse({'success': False, 'message': 'Invalid request method.'}, status=405)
\ No newline at end of file
+    return JsonResponse({'success': False, 'message': 'Invalid request method.'}, status=405)
+
+@login_required(login_url='signin')
+def read_notifications(request):
+    """Mark all notifications read, or just ``notification_id`` when given."""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Invalid request method.'}, status=405)
+    notification_id = request.POST.get('notification_id')
+    if notification_id is not None and not notification_id.isdigit():
+        return JsonResponse({'success': False, 'message': 'Invalid notification.'}, status=400)
+    marked = mark_notifications_read(request.user, int(notification_id) if notification_id else None)
+    return JsonResponse({
+        'success': True,
+        'marked': marked,
+        'unread': unread_notification_count(request.user),
+    })
+
+@login_required(login_url='signin')
+def unread_notifications(request):
+    """Unread count for the bell badge; cheap enough to poll (no notifications query)."""
+    return JsonResponse({'success': True, 'unread': unread_notification_count(request.user)})
\ No newline at end of file
@@ -328,7 +328,7 @@ document.addEventListener("DOMContentLoaded", function () {
   });
 
   // Like button functionality
-  document.querySelectorAll(".like-btn").forEach(function (button) {
+  function bindLikeButton(button) {
     // Set initial color based on data-liked attribute
     const isLiked = button.getAttribute("data-liked") === "True";
     button.style.color = isLiked ? "#5a7ad1" : "#65676b";
@@ -377,10 +377,11 @@ document.addEventListener("DOMContentLoaded", function () {
           button.style.opacity = "1";
         });
     });
-  });
+  }
+  document.querySelectorAll(".like-btn").forEach(bindLikeButton);
 
   // Save Post functionality
-  document.querySelectorAll(".save-post-btn").forEach(function (button) {
+  function bindSaveButton(button) {
     button.addEventListener("click", function (e) {
       e.preventDefault();
       const postId = button.getAttribute("data-post-id");
@@ -440,7 +441,8 @@ document.addEventListener("DOMContentLoaded", function () {
           button.style.pointerEvents = "auto";
         });
     });
-  });
+  }
+  document.querySelectorAll(".save-post-btn").forEach(bindSaveButton);
 
   // Comment SECTION
   const CommentHandler = {
@@ -771,6 +773,308 @@ document.addEventListener("DOMContentLoaded", function () {
   // Make function available globally for testing
   window.testTruncation = initTextTruncation;
 
+  // Follow button: toggle over JSON instead of a full form post + reload
+  document.querySelectorAll(".follow-form[data-user-id]").forEach((form) => {
+    form.addEventListener("submit", function (e) {
+      e.preventDefault();
+      const button = form.querySelector("button");
+      const csrfToken = form.querySelector('input[name="csrfmiddlewaretoken"]').value;
+      button.disabled = true;
+
+      fetch(`/follow/${form.dataset.userId}`, {
+        method: "POST",
+        headers: { "X-CSRFToken": csrfToken },
+      })
+        .then((response) => {
+          if (!response.ok) throw new Error(`HTTP ${response.status}`);
+          return response.json();
+        })
+        .then(
+          (data) => {
+            if (!data.success) throw new Error(data.error);
+            form.querySelector(".follow-text").textContent = data.following ? "Unfollow" : "Follow";
+            const icon = form.querySelector(".follow-icon");
+            icon.classList.toggle("fa-user-minus", data.following);
+            icon.classList.toggle("fa-user-plus", !data.following);
+            const count = document.getElementById("follower-count");
+            if (count) count.textContent = data.follower_count;
+          },
+          (error) => {
+            // No usable response, so the toggle did not apply here: fall back to the form flow.
+            // Errors while applying a response are only logged below; resubmitting would toggle again.
+            console.error("Error toggling follow:", error);
+            form.submit();
+          }
+        )
+        .catch((error) => {
+          console.error("Error updating follow button:", error);
+        })
+        .finally(() => {
+          button.disabled = false;
+        });
+    });
+  });
+
+  // Username typeahead under the search boxes
+  document.querySelectorAll('form[action="/search"] input[name="q"]').forEach((input) => {
+    const form = input.form;
+    form.classList.add("relative");
+    const menu = document.createElement("ul");
+    menu.className =
+      "absolute left-0 right-0 top-full mt-1 bg-white rounded-lg shadow-lg z-50 hidden text-[14px] text-left";
+    form.appendChild(menu);
+    let timer = null;
+    let latest = 0;
+
+    input.setAttribute("autocomplete", "off");
+    input.addEventListener("input", () => {
+      clearTimeout(timer);
+      const query = input.value.trim();
+      if (!query) {
+        menu.classList.add("hidden");
+        return;
+      }
+      timer = setTimeout(() => {
+        const request = ++latest;
+        fetch(`/search/suggest?q=${encodeURIComponent(query)}`)
+          .then((response) => response.json())
+          .then((data) => {
+            if (request !== latest || !data.success) return; // A newer keystroke won
+            menu.replaceChildren(
+              ...data.results.map((user) => {
+                const item = document.createElement("li");
+                const link = document.createElement("a");
+                link.href = user.url;
+                link.className = "flex justify-between px-3 py-2 hover:bg-gray-100 text-gray-800 no-underline";
+                link.textContent = user.username;
+                const followers = document.createElement("span");
+                followers.className = "text-gray-500 text-[12px] ml-3";
+                followers.textContent = `${user.follower_count} followers`;
+                link.appendChild(followers);
+                item.appendChild(link);
+                return item;
+              })
+            );
+            menu.classList.toggle("hidden", data.results.length === 0);
+          })
+          .catch((error) => console.error("Error loading suggestions:", error));
+      }, 150);
+    });
+    input.addEventListener("blur", () => setTimeout(() => menu.classList.add("hidden"), 200));
+  });
+
+  // Live updates: notifications, like counts and comments pushed over a WebSocket
+  const LiveUpdates = {
+    socket: null,
+    postIds: new Set(),
+    retryDelay: 1000,
+
+    init() {
+      this.list = document.getElementById("notification-list");
+      if (!this.list) return;
+      this.badge = document.getElementById("notification-badge");
+      document
+        .getElementById("mark-all-read")
+        ?.addEventListener("click", () => this.markAllRead());
+      // Poll the badge (a single Profile read) as a fallback to the socket
+      setInterval(() => {
+        if (!this.socket || this.socket.readyState !== WebSocket.OPEN) this.refreshBadge();
+      }, 60000);
+      if (!("WebSocket" in window)) return;
+      this.username = this.list.dataset.username;
+      document
+        .querySelectorAll(".like-btn[data-post-id]")
+        .forEach((button) => this.postIds.add(button.dataset.postId));
+      this.connect();
+    },
+
+    connect() {
+      const scheme = window.location.protocol === "https:" ? "wss" : "ws";
+      this.socket = new WebSocket(`${scheme}://${window.location.host}/ws/notifications/`);
+      this.socket.addEventListener("open", () => {
+        this.retryDelay = 1000;
+        this.send({ action: "subscribe", post_ids: [...this.postIds] });
+      });
+      this.socket.addEventListener("message", (e) => this.handle(JSON.parse(e.data)));
+      this.socket.addEventListener("close", () => {
+        // Plain WSGI deployments have no socket endpoint; back off instead of hammering
+        setTimeout(() => this.connect(), this.retryDelay);
+        this.retryDelay = Math.min(this.retryDelay * 2, 60000);
+      });
+    },
+
+    setBadge(unread) {
+      if (!this.badge) return;
+      this.badge.textContent = unread;
+      this.badge.classList.toggle("hidden", !unread);
+    },
+
+    refreshBadge() {
+      fetch("/notifications/unread/")
+        .then((response) => response.json())
+        .then((data) => data.success && this.setBadge(data.unread))
+        .catch(() => {});
+    },
+
+    markAllRead() {
+      const csrfToken = document.querySelector('input[name="csrfmiddlewaretoken"]')?.value;
+      fetch("/notifications/read/", {
+        method: "POST",
+        headers: { "X-CSRFToken": csrfToken },
+      })
+        .then((response) => response.json())
+        .then((data) => {
+          if (!data.success) return;
+          this.setBadge(data.unread);
+          this.list
+            .querySelectorAll(".bg-blue-50")
+            .forEach((item) => item.classList.remove("bg-blue-50"));
+        })
+        .catch((error) => console.error("Error marking notifications read:", error));
+    },
+
+    send(message) {
+      if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+        this.socket.send(JSON.stringify(message));
+      }
+    },
+
+    // Follow the posts in a freshly loaded feed page
+    subscribe(html) {
+      const page = document.createElement("div");
+      page.innerHTML = html;
+      const ids = [...page.querySelectorAll(".like-btn[data-post-id]")]
+        .map((button) => button.dataset.postId)
+        .filter((id) => !this.postIds.has(id));
+      ids.forEach((id) => this.postIds.add(id));
+      if (ids.length) this.send({ action: "subscribe", post_ids: ids });
+    },
+
+    // Replace an upload placeholder once the post's media.ingest job finishes
+    showMedia(placeholder, message) {
+      if (message.media_status !== "ready") {
+        placeholder.innerHTML = `<i class="fas fa-exclamation-circle"></i>
+          <span>This ${message.media_type || "file"} could not be uploaded.</span>`;
+        return;
+      }
+      const link = document.createElement("a");
+      link.href = placeholder.dataset.postUrl;
+      link.className = "post-media-link";
+      if (message.media_type === "video") {
+        const video = document.createElement("video");
+        video.className = "post-video";
+        video.controls = true;
+        video.preload = "metadata";
+        video.src = message.url;
+        link.appendChild(video);
+      } else {
+        const img = document.createElement("img");
+        img.className = "post-image";
+        img.src = message.url;
+        link.appendChild(img);
+      }
+      placeholder.replaceWith(link);
+    },
+
+    handle(message) {
+      if (message.event === "notification") {
+        // Aggregated groups are re-pushed as actors join; move them to the top
+        this.list.querySelector(`[data-notification-id="${message.id}"]`)?.remove();
+        this.list.insertAdjacentHTML("afterbegin", message.html);
+        document.getElementById("notification-empty")?.remove();
+        const count = document.getElementById("notification-count");
+        if (count) count.textContent = this.list.children.length;
+        this.refreshBadge();
+      } else if (message.event === "like_count") {
+        document
+          .querySelectorAll(`.like-count[data-post-id="${message.post_id}"]`)
+          .forEach((el) => (el.textContent = message.like_count));
+      } else if (message.event === "media") {
+        document
+          .querySelectorAll(`.post-media-pending[data-post-id="${message.post_id}"]`)
+          .forEach((placeholder) => this.showMedia(placeholder, message));
+      } else if (message.event === "comment") {
+        // Our own comments were already added by submitComment
+        if (message.comment.username === this.username) return;
+        const escape = (text) => {
+          const el = document.createElement("span");
+          el.textContent = text;
+          return el.innerHTML;
+        };
+        CommentHandler.addComment(CommentHandler.getElements(message.post_id), {
+          ...message.comment,
+          username: escape(message.comment.username),
+          comment: escape(message.comment.comment),
+        });
+      }
+    },
+  };
+  LiveUpdates.init();
+
+  // Infinite scroll: fetch the next cursor page when the sentinel is visible
+  const feedSentinel = document.getElementById("feed-sentinel");
+  const feedPosts = document.getElementById("feed-posts");
+  if (feedSentinel && feedPosts && "IntersectionObserver" in window) {
+    let loading = false;
+
+    const loadNextPage = () => {
+      const cursor = feedSentinel.dataset.nextCursor;
+      if (loading || !cursor) return;
+      loading = true;
+      feedSentinel.textContent = "Loading...";
+
+      const params = new URLSearchParams({
+        source: feedSentinel.dataset.source,
+        cursor: cursor,
+      });
+      if (feedSentinel.dataset.username) {
+        params.set("username", feedSentinel.dataset.username);
+      }
+      if (feedSentinel.dataset.tag) {
+        params.set("tag", feedSentinel.dataset.tag);
+        params.set("kind", feedSentinel.dataset.kind);
+      }
+
+      fetch(`/feed?${params.toString()}`, {
+        headers: { "X-Requested-With": "XMLHttpRequest" },
+      })
+        .then((response) => response.json())
+        .then((data) => {
+          if (!data.success) throw new Error(data.error);
+
+          const page = document.createElement("div");
+          page.innerHTML = data.html;
+          // Wire up like/save buttons on the new cards (comments use delegation)
+          page.querySelectorAll(".like-btn").forEach(bindLikeButton);
+          page.querySelectorAll(".save-post-btn").forEach(bindSaveButton);
+          while (page.firstChild) {
+            feedPosts.appendChild(page.firstChild);
+          }
+          initTextTruncation();
+          LiveUpdates.subscribe(data.html);
+
+          feedSentinel.dataset.nextCursor = data.next_cursor || "";
+          feedSentinel.textContent = data.next_cursor ? "" : "You're all caught up";
+          if (!data.next_cursor) observer.disconnect();
+        })
+        .catch((error) => {
+          console.error("Error loading feed:", error);
+          feedSentinel.textContent = "";
+        })
+        .finally(() => {
+          loading = false;
+        });
+    };
+
+    const observer = new IntersectionObserver(
+      (entries) => {
+        if (entries.some((entry) => entry.isIntersecting)) loadNextPage();
+      },
+      { rootMargin: "600px" }
+    );
+    if (feedSentinel.dataset.nextCursor) observer.observe(feedSentinel);
+  }
+
   // Delete notification function
   function deleteNotification(notificationId) {
     if (confirm("Are you sure you want to delete this notification?")) {